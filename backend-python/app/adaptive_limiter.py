@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveConcurrencyLimiter:
+    """Concurrency limit for upstream calls, adjusted AIMD-style from their latency and errors
+
+    The limit grows by one per limit successful calls made while it was fully
+    used (additive increase). It is multiplied by error_backoff when a call fails
+    and by latency_backoff when the recent average latency exceeds
+    latency_tolerance times the long-run average (multiplicative decrease). Calls
+    started before the last decrease do not decrease it again, so one incident
+    shrinks the limit once rather than once per call in flight. With
+    min_limit == max_limit the limit is fixed.
+    """
+
+    def __init__(self, name: str, max_limit: int, min_limit: int = 1, initial_limit: Optional[int] = None,
+                 error_backoff: float = 0.5, latency_backoff: float = 0.9, latency_tolerance: float = 2.0):
+        self.name = name
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.error_backoff = error_backoff
+        self.latency_backoff = latency_backoff
+        self.latency_tolerance = latency_tolerance
+
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial_limit or self.max_limit)))
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+        # Short- and long-run latency averages of successful calls (seconds)
+        self._recent_latency = None
+        self._baseline_latency = None
+
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the call's start time, to pass to on_success or on_failure"""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return time.monotonic()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as it was cancelled: hand it on
+                self.release()
+            raise
+        return time.monotonic()
+
+    def release(self):
+        self.in_flight -= 1
+        self._grant()
+
+    def _grant(self):
+        # Slots are handed over directly, so a new caller cannot overtake a waiting one
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def on_success(self, started: float):
+        latency = time.monotonic() - started
+        if self._recent_latency is None:
+            self._recent_latency = self._baseline_latency = latency
+        else:
+            self._recent_latency += 0.2 * (latency - self._recent_latency)
+            self._baseline_latency += 0.02 * (latency - self._baseline_latency)
+
+        if self._recent_latency > self.latency_tolerance * self._baseline_latency:
+            self._decrease(started, self.latency_backoff, "latency")
+        elif self.in_flight >= self.limit and self._limit < self.max_limit:
+            self._limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+            self.increases += 1
+            self._grant()
+
+    def on_failure(self, started: float):
+        self._decrease(started, self.error_backoff, "errors")
+
+    def _decrease(self, started: float, factor: float, reason: str):
+        if started < self._last_decrease or self._limit <= self.min_limit:
+            return
+        previous = self.limit
+        self._limit = max(float(self.min_limit), self._limit * factor)
+        self._last_decrease = time.monotonic()
+        self.decreases += 1
+        if self.limit != previous:
+            logger.info(f"Concurrency limit for {self.name} lowered to {self.limit} ({reason})")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'limit': self.limit,
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'in_flight': self.in_flight,
+            'waiting': sum(not waiter.done() for waiter in self._waiters),
+            'recent_latency_ms': round(self._recent_latency * 1000, 1) if self._recent_latency is not None else None,
+            'baseline_latency_ms': round(self._baseline_latency * 1000, 1) if self._baseline_latency is not None else None,
+            'increases': self.increases,
+            'decreases': self.decreases,
+        }
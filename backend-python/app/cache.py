@@ -0,0 +1,397 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Byte-valued key/value store with per-entry TTL and LRU eviction
+
+    Backends whose calls block on disk or network I/O set blocking; async code
+    reaches them through offload() so they do not stall the event loop.
+    """
+
+    name = "base"
+    blocking = False
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.name, 'evictions': self.evictions, 'expirations': self.expirations}
+
+    def _count(self, evictions: int = 0, expirations: int = 0):
+        with self._stats_lock:
+            self.evictions += evictions
+            self.expirations += expirations
+
+    def close(self):
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU: O(1) get/set/evict via an OrderedDict, bounded by item count and bytes"""
+
+    name = "memory"
+
+    def __init__(self, max_items: int = 500, max_bytes: int = 64 * 1024 * 1024):
+        super().__init__()
+        self.max_items = max(1, max_items)
+        self.max_bytes = max(1, max_bytes)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() > expires_at:
+                self._remove(key)
+                self._count(expirations=1)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            evicted = 0
+            while self._entries and (len(self._entries) >= self.max_items or self._bytes + size > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                evicted += 1
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._bytes += size
+        if evicted:
+            self._count(evictions=evicted)
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(key) + len(value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**super().stats(), 'items': len(self._entries), 'bytes': self._bytes,
+                    'max_items': self.max_items, 'max_bytes': self.max_bytes}
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cross-process cache in a local SQLite file (WAL mode), shared by all workers on a host"""
+
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str = ".cache/response_cache.sqlite3", max_items: int = 500,
+                 max_bytes: int = 64 * 1024 * 1024):
+        super().__init__()
+        self.path = path
+        self.max_items = max(1, max_items)
+        self.max_bytes = max(1, max_bytes)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now > row[1]:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._count(expirations=1)
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now + ttl_seconds, now)
+                )
+                evicted = self._evict()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if evicted:
+            self._count(evictions=evicted)
+
+    def _evict(self) -> int:
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        evicted = 0
+        while count > self.max_items or total > self.max_bytes:
+            # Least recently used first, via the accessed_at index
+            rows = self._conn.execute(
+                "SELECT key, size FROM cache ORDER BY accessed_at LIMIT ?", (max(1, count - self.max_items),)
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                count -= 1
+                total -= size
+                evicted += 1
+                if count <= self.max_items and total <= self.max_bytes:
+                    break
+        return evicted
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {**super().stats(), 'items': count, 'bytes': total,
+                'max_items': self.max_items, 'max_bytes': self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache in Redis (or any server speaking the Redis protocol), shared across replicas
+
+    Eviction is left to the server's maxmemory policy (allkeys-lru), so evictions
+    are the server's evicted_keys (all keys, not only this cache's); TTLs use PX.
+    """
+
+    name = "redis"
+    blocking = True
+
+    def __init__(self, url: str = "redis://localhost:6379/0", socket_timeout: float = 0.5):
+        super().__init__()
+        import redis  # in requirements.txt, but only imported when this backend is selected
+
+        self._client = redis.Redis.from_url(url, socket_timeout=socket_timeout, socket_connect_timeout=socket_timeout)
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._client.get(key)
+        except Exception as e:
+            self._error(e)
+            return None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        try:
+            self._client.set(key, value, px=max(1, int(ttl_seconds * 1000)))
+        except Exception as e:
+            self._error(e)
+
+    def delete(self, key: str):
+        try:
+            self._client.delete(key)
+        except Exception as e:
+            self._error(e)
+
+    def clear(self):
+        try:
+            self._client.flushdb()
+        except Exception as e:
+            self._error(e)
+
+    def _error(self, error: Exception):
+        # A cache outage must never fail the request; count it and carry on
+        with self._stats_lock:
+            self.errors += 1
+        logger.warning(f"Redis cache error: {error}")
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            evictions = self._client.info('stats').get('evicted_keys', 0)
+        except Exception as e:
+            logger.debug(f"Redis INFO unavailable: {e}")
+            evictions = None
+        return {**super().stats(), 'evictions': evictions, 'errors': self.errors}
+
+    def close(self):
+        self._client.close()
+
+
+async def offload(backend: CacheBackend, fn: Callable, *args):
+    """fn(*args), run in a worker thread if backend blocks on I/O"""
+    if backend.blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+def create_cache_backend() -> CacheBackend:
+    """Build the cache backend selected by CACHE_BACKEND (memory, sqlite or redis)"""
+    backend = os.getenv("CACHE_BACKEND", "memory").lower()
+    max_items = int(os.getenv("MAX_CACHE_ITEMS", "200"))
+    max_bytes = int(os.getenv("MAX_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+    if backend == "sqlite":
+        return SQLiteCacheBackend(os.getenv("CACHE_SQLITE_PATH", ".cache/response_cache.sqlite3"), max_items, max_bytes)
+    if backend == "redis":
+        return RedisCacheBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    if backend != "memory":
+        logger.warning(f"Unknown cache backend '{backend}', using in-process memory cache")
+    return MemoryCacheBackend(max_items, max_bytes)
+
+
+class ResponseCache:
+    """Namespaced JSON response cache over a shared backend, with hit/miss counters
+
+    Entries can be tagged on put (e.g. with the FAQ they were answered from) and
+    later dropped by tag. Tags are tracked in-process for the most recent
+    max_tagged_keys entries only, so other workers sharing the backend must
+    invalidate their own entries.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str, ttl_seconds: float = 3600,
+                 max_tagged_keys: int = 10000):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_tagged_keys = max(1, max_tagged_keys)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._tags_by_key: "OrderedDict[str, tuple]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self._tags_lock = threading.Lock()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get item from cache if it exists and is not expired"""
+        value = self.backend.get(self._key(key))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def get_async(self, key: str) -> Optional[Dict[str, Any]]:
+        """get() that does not block the event loop on the backend"""
+        return await offload(self.backend, self.get, key)
+
+    def put_soon(self, key: str, value: Dict[str, Any], tags: Iterable[str] = ()):
+        """put(), in a worker thread if the backend blocks; for callers on the event loop"""
+        if not self.backend.blocking:
+            self.put(key, value, tags)
+            return
+        write = asyncio.get_running_loop().run_in_executor(None, self.put, key, value, tuple(tags))
+        write.add_done_callback(self._log_failed_put)
+
+    @staticmethod
+    def _log_failed_put(write: asyncio.Future):
+        if not write.cancelled() and write.exception() is not None:
+            logger.warning(f"Cache write failed: {write.exception()}")
+
+    def put(self, key: str, value: Dict[str, Any], tags: Iterable[str] = ()):
+        """Add item to cache with the namespace TTL"""
+        self.backend.set(self._key(key), json.dumps(value, separators=(',', ':')).encode('utf-8'), self.ttl_seconds)
+        tags = tuple(tags)
+        if tags:
+            self._track(key, tags)
+
+    def delete(self, key: str):
+        self.backend.delete(self._key(key))
+        with self._tags_lock:
+            self._untrack(key)
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Delete every tracked entry put with any of the given tags; returns how many"""
+        with self._tags_lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._keys_by_tag.get(tag, set())
+            for key in keys:
+                self._untrack(key)
+        for key in keys:
+            self.backend.delete(self._key(key))
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def _track(self, key: str, tags: tuple):
+        with self._tags_lock:
+            self._untrack(key)
+            self._tags_by_key[key] = tags
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._tags_by_key) > self.max_tagged_keys:
+                self._untrack(next(iter(self._tags_by_key)))
+
+    def _untrack(self, key: str):
+        for tag in self._tags_by_key.pop(key, ()):
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'namespace': self.namespace,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,61 @@
+import hashlib
+import re
+from typing import List, Optional
+
+# Polynomial rolling hash over per-line digests, modulo a Mersenne prime
+_MODULUS = (1 << 61) - 1
+_BASE = 1_000_003
+
+_WORD = re.compile(r"\w+(?:'\w+)*")
+
+
+def canonicalize(text: str) -> str:
+    """Lowercase words without punctuation or extra whitespace: the form cache keys are built from"""
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def message_key(message: str, conversation_key: str = "") -> str:
+    """Cache key of a message and the conversation its prompt shows (conversation_key)"""
+    return hashlib.md5(f"{canonicalize(message)}|{conversation_key}".encode('utf-8')).hexdigest()
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(canonicalize(text).encode('utf-8'), digest_size=8).digest(), 'big') % _MODULUS
+
+
+class RollingTurnHash:
+    """Hash of the last max_turns lines of a conversation, updated in O(1) per line
+
+    Lines are hashed in canonical form; the value is the sum of
+    digest * BASE^(age), so adding the newest line or dropping the oldest one
+    does not rehash the others. digests are those of the lines kept, oldest first.
+    """
+
+    __slots__ = ('max_turns', 'digests', 'value')
+
+    def __init__(self, max_turns: int, digests: Optional[List[int]] = None, value: int = 0):
+        self.max_turns = max(1, max_turns)
+        self.digests: List[int] = digests or []
+        self.value = value
+
+    def push(self, text: str):
+        digest = _digest(text)
+        self.digests.append(digest)
+        self.value = (self.value * _BASE + digest) % _MODULUS
+        while len(self.digests) > self.max_turns:
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        digest = self.digests.pop(0)
+        self.value = (self.value - digest * pow(_BASE, len(self.digests), _MODULUS)) % _MODULUS
+
+    def key(self) -> str:
+        """"" when no lines are kept"""
+        return f"{self.value:x}" if self.digests else ""
+
+
+def context_key(lines: RollingTurnHash, summary: str = "") -> str:
+    """Key of a conversation block: the rolling hash of its lines and the canonical summary shown above them"""
+    if not summary:
+        return lines.key()
+    return f"{lines.key()}:{_digest(summary):x}"
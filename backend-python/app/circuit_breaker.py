@@ -0,0 +1,105 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+logger = logging.getLogger(__name__)
+
+# Breaker states: closed (calls pass) -> open (calls fail fast) -> half_open (probe calls decide)
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that the breaker considers down"""
+
+
+class CircuitBreaker:
+    """Fail fast while an upstream is failing, instead of waiting for each failure
+
+    The breaker opens when at least failure_rate of the last window calls failed
+    (once min_calls have been seen). After open_seconds it lets up to
+    half_open_max_calls probe calls through: a success closes it, a failure
+    opens it again.
+    """
+
+    def __init__(self, name: str, failure_rate: float = 0.5, window: int = 20, min_calls: int = 10,
+                 open_seconds: float = 10.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = max(1, min_calls)
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+
+        # Outcomes of recent calls while closed, True for a failure
+        self._outcomes: Deque[bool] = deque(maxlen=max(self.min_calls, window))
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info(f"Circuit {self.name} half-open, probing upstream")
+        return self._state
+
+    def acquire(self) -> bool:
+        """Admit one call or raise CircuitOpenError; returns whether the call is a half-open probe
+
+        Every admitted call must end with record_success, record_failure or release.
+        """
+        state = self.state
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        raise CircuitOpenError(f"Circuit {self.name} is {state}, not calling upstream")
+
+    def release(self, probe: bool):
+        """End an admitted call that neither succeeded nor failed (e.g. cancelled)"""
+        if probe and self._state == HALF_OPEN:
+            self._probes -= 1
+
+    def record_success(self, probe: bool):
+        if probe and self._state == HALF_OPEN:
+            self._state = CLOSED
+            self._outcomes.clear()
+            logger.info(f"Circuit {self.name} closed, upstream recovered")
+        elif self._state == CLOSED:
+            self._outcomes.append(False)
+
+    def record_failure(self, probe: bool):
+        if probe and self._state == HALF_OPEN:
+            self._open()
+        elif self._state == CLOSED:
+            self._outcomes.append(True)
+            failures = sum(self._outcomes)
+            if len(self._outcomes) >= self.min_calls and failures >= self.failure_rate * len(self._outcomes):
+                self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+        logger.warning(f"Circuit {self.name} opened for {self.open_seconds}s, failing fast")
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            'name': self.name,
+            'state': state,
+            'recent_failure_rate': round(sum(self._outcomes) / len(self._outcomes), 3) if self._outcomes else 0.0,
+            'recent_calls': len(self._outcomes),
+            'open_for_seconds': round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 2) if state == OPEN else 0.0,
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,30 @@
+import math
+import time
+from typing import Optional
+
+
+class Deadline:
+    """Time budget of one request; stages check what is left before starting"""
+
+    __slots__ = ('expires_at',)
+
+    def __init__(self, seconds: Optional[float] = None):
+        # No budget (None or <= 0) never expires
+        self.expires_at = time.monotonic() + seconds if seconds and seconds > 0 else None
+
+    @classmethod
+    def after_ms(cls, milliseconds: Optional[float]) -> "Deadline":
+        return cls(milliseconds / 1000 if milliseconds else None)
+
+    @property
+    def bounded(self) -> bool:
+        return self.expires_at is not None
+
+    def remaining(self) -> float:
+        """Seconds left, negative once expired; infinite without a budget"""
+        if self.expires_at is None:
+            return math.inf
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
@@ -0,0 +1,191 @@
+import logging
+import os
+import re
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoModel, AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+# Selectable with EMBEDDING_BACKEND; all produce the same mean-pooled embeddings up to small drift
+EMBEDDING_BACKENDS = ('fp32', 'int8', 'torchscript', 'onnx')
+
+
+def mean_pool(last_hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    """Mean pooling over real tokens only (padding positions are masked out)"""
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(dim=1)
+    counts = mask.sum(dim=1).clamp(min=1e-9)
+    return summed / counts
+
+
+class BatchedEncoder:
+    """Encode texts with a transformer model in padded batches"""
+
+    backend = 'fp32'
+
+    def __init__(self, tokenizer, model, batch_size: int = 32, max_length: int = 512,
+                 hidden_size: Optional[int] = None):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_length = max_length
+        self.hidden_size = hidden_size or model.config.hidden_size
+
+    def encode(self, texts: List[str], batch_size: Optional[int] = None) -> torch.Tensor:
+        """Compute mean-pooled embeddings for texts, preserving input order"""
+        batch_size = max(1, batch_size or self.batch_size)
+        if not texts:
+            return torch.empty((0, self.hidden_size))
+
+        # Sort by length so each batch pads to a similar size, then restore order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            batch_embeddings = self._encode_batch([texts[i] for i in batch_indices])
+            for position, index in enumerate(batch_indices):
+                embeddings[index] = batch_embeddings[position]
+
+        return torch.stack(embeddings)
+
+    def _encode_batch(self, texts: List[str]) -> torch.Tensor:
+        """Run a single padded forward pass"""
+        inputs = self.tokenizer(
+            texts,
+            return_tensors='pt',
+            truncation=True,
+            max_length=self.max_length,
+            padding=True
+        )
+
+        with torch.inference_mode():
+            hidden_states = self._forward(inputs['input_ids'], inputs['attention_mask'])
+            return mean_pool(hidden_states, inputs['attention_mask'])
+
+    def _forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        """Last hidden state for one padded batch"""
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+
+class Int8Encoder(BatchedEncoder):
+    """Linear layers dynamically quantized to int8: weights stored as int8, activations quantized per batch"""
+
+    backend = 'int8'
+
+    def __init__(self, tokenizer, model, **kwargs):
+        if torch.backends.quantized.engine == 'none':
+            torch.backends.quantized.engine = torch.backends.quantized.supported_engines[-1]
+        # In place, so the fp32 Linear weights are released rather than kept alongside a quantized copy
+        quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        super().__init__(tokenizer, quantized, hidden_size=model.config.hidden_size, **kwargs)
+
+
+class _HiddenStates(torch.nn.Module):
+    """Positional (input_ids, attention_mask) -> last hidden state, so the model can be traced and exported"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+
+def _example_inputs(tokenizer):
+    # Padded, so the traced graph keeps the attention-mask path
+    inputs = tokenizer(["how do i track my order", "hi"], return_tensors='pt', padding=True)
+    return inputs['input_ids'], inputs['attention_mask']
+
+
+class TorchScriptEncoder(BatchedEncoder):
+    """Traced, frozen TorchScript graph of the model: no Python module dispatch per forward pass"""
+
+    backend = 'torchscript'
+
+    def __init__(self, tokenizer, model, **kwargs):
+        wrapper = _HiddenStates(model).eval()
+        with torch.inference_mode():
+            traced = torch.jit.trace(wrapper, _example_inputs(tokenizer), check_trace=False)
+        graph = torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+        super().__init__(tokenizer, graph, hidden_size=model.config.hidden_size, **kwargs)
+
+    def _forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids, attention_mask)
+
+
+class OnnxEncoder(BatchedEncoder):
+    """Model exported to ONNX once (cached in export_dir) and run with onnxruntime
+
+    Once exported, the PyTorch weights are not loaded at all.
+    """
+
+    backend = 'onnx'
+
+    def __init__(self, tokenizer, model_name: str, export_dir: str = ".model_cache", **kwargs):
+        import onnxruntime  # optional dependency, only needed for this backend
+
+        self._onnxruntime = onnxruntime
+        self.path = os.path.join(export_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name), "model.onnx")
+        if not os.path.exists(self.path):
+            self._export(tokenizer, AutoModel.from_pretrained(model_name).eval())
+        self._pid = None
+        super().__init__(tokenizer, None, hidden_size=AutoConfig.from_pretrained(model_name).hidden_size, **kwargs)
+
+    def _export(self, tokenizer, model):
+        logger.info(f"Exporting embedding model to {self.path}")
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".onnx")
+        os.close(fd)
+        try:
+            dynamic = {0: 'batch', 1: 'sequence'}
+            torch.onnx.export(
+                _HiddenStates(model).eval(), _example_inputs(tokenizer), tmp_path,
+                input_names=['input_ids', 'attention_mask'], output_names=['last_hidden_state'],
+                dynamic_axes={'input_ids': dynamic, 'attention_mask': dynamic, 'last_hidden_state': dynamic},
+                opset_version=17, dynamo=False
+            )
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    @property
+    def session(self):
+        # onnxruntime's thread pool does not survive fork, so each process opens its own session
+        if self._pid != os.getpid():
+            options = self._onnxruntime.SessionOptions()
+            options.graph_optimization_level = self._onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = torch.get_num_threads()
+            self.model = self._onnxruntime.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+            self._pid = os.getpid()
+        return self.model
+
+    def _forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        outputs = self.session.run(None, {
+            'input_ids': input_ids.numpy().astype(np.int64, copy=False),
+            'attention_mask': attention_mask.numpy().astype(np.int64, copy=False),
+        })
+        return torch.from_numpy(outputs[0])
+
+
+def load_encoder(model_name: str, backend: str = 'fp32', batch_size: int = 32,
+                 export_dir: str = ".model_cache") -> BatchedEncoder:
+    """Load tokenizer and model and wrap them in the encoder for backend (see EMBEDDING_BACKENDS)"""
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(EMBEDDING_BACKENDS)}")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if backend == 'onnx':
+        return OnnxEncoder(tokenizer, model_name, export_dir=export_dir, batch_size=batch_size)
+
+    model = AutoModel.from_pretrained(model_name).eval()
+    if backend == 'int8':
+        return Int8Encoder(tokenizer, model, batch_size=batch_size)
+    if backend == 'torchscript':
+        return TorchScriptEncoder(tokenizer, model, batch_size=batch_size)
+    return BatchedEncoder(tokenizer, model, batch_size=batch_size)
@@ -1,56 +1,513 @@
+import asyncio
 import json
-import csv
-import aiofiles
+import os
 import numpy as np
-from typing import Dict, List, Optional, Any
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Any
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import AutoTokenizer, AutoModel
-import torch
 import logging
+import threading
+import time
+from collections import OrderedDict
+
+from .deadline import Deadline
+from .index_cache import IndexCache
+from .inference_executor import InferenceExecutor, InferenceQueueFullError
+from .keyword_index import KeywordIndex, KeywordMatch
+from .metrics import STAGE_LATENCY
+from .faq_store import FAQMatch, FAQStore, FAQStoreBuilder
+from .kb_loader import KnowledgeBaseReader, faq_key, validate_faq, write_knowledge_base
+from .micro_batcher import MicroBatcher
+from .tfidf_index import TfidfIndex, TfidfScores, fit_tfidf
+from .vector_index import VectorIndex, create_vector_index, normalize_rows
+
+if TYPE_CHECKING:
+    import torch
+    from .embeddings import BatchedEncoder
 
 logger = logging.getLogger(__name__)
 
+# Matching stages in the order find_best_match tries them; 'none' counts lookups with no match
+MATCH_STAGES = ('exact', 'keyword', 'tfidf', 'combined', 'tfidf_fallback', 'none')
+
+
+class FAQIndex:
+    """Immutable snapshot of the knowledge base and every index built over it
+    
+    Updates build a new snapshot and swap it in with one assignment, so a lookup
+    that started on the old one sees consistent entries, rows and embeddings.
+    """
+    
+    def __init__(self, store: FAQStore, tfidf_index: Optional[TfidfIndex] = None,
+                 keyword_index: Optional[KeywordIndex] = None, embeddings: Optional[np.ndarray] = None, vector_index: Optional[VectorIndex] = None,
+                 intent_centroids: Optional[np.ndarray] = None, version: int = 0):
+        self.store = store
+        self.tfidf_index = tfidf_index
+        self.keyword_index = keyword_index
+        self.embeddings = embeddings
+        self.vector_index = vector_index
+        self.intent_centroids = intent_centroids
+        self.version = version
+
 class FAQMatcher:
     """FAQ matching using both TF-IDF and semantic embeddings"""
     
-    def __init__(self, knowledge_base_path: str = "app/knowledge_base.json"):
+    def __init__(self, knowledge_base_path: str = "app/knowledge_base.json", inference_executor: Optional[InferenceExecutor] = None):
         self.knowledge_base_path = knowledge_base_path
-        self.knowledge_base: List[Dict] = []
+        self.index = FAQIndex(FAQStore.from_entries([]))
+        # Unfitted template; every index snapshot fits its own clone
         self.tfidf_vectorizer = TfidfVectorizer(
             stop_words='english',
             ngram_range=(1, 2),
             max_features=1000,
             lowercase=True
         )
-        self.tfidf_matrix = None
+        
+        # Large knowledge bases are read and indexed in chunks to bound peak memory
+        self.load_chunk_size = int(os.getenv("KB_LOAD_CHUNK_SIZE", "10000"))
+        self.strict_loading = os.getenv("KB_STRICT_LOADING", "false").lower() == "true"
+        self.tfidf_chunk_size = int(os.getenv("TFIDF_CHUNK_SIZE", "50000"))
+        self.tfidf_max_fit_documents = int(os.getenv("TFIDF_MAX_FIT_DOCUMENTS", "200000"))
+        self.embedding_chunk_size = int(os.getenv("EMBEDDING_CHUNK_SIZE", "4096"))
         
         # Semantic similarity model
+        self.semantic_model_name = os.getenv("SEMANTIC_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+        self.embedding_backend = os.getenv("EMBEDDING_BACKEND", "fp32").lower()  # fp32, int8, torchscript or onnx
+        self.embedding_export_dir = os.getenv("EMBEDDING_EXPORT_DIR", ".model_cache")
         self.semantic_tokenizer = None
         self.semantic_model = None
-        self.semantic_embeddings = None
+        self.semantic_encoder: Optional["BatchedEncoder"] = None
+        
+        # Vector index over the (normalized) FAQ embeddings
+        self.vector_index_type = os.getenv("VECTOR_INDEX_TYPE", "exact")
+        self.ivf_nlist = int(os.getenv("IVF_NLIST", "0"))  # 0 = sqrt(number of entries)
+        self.ivf_nprobe = int(os.getenv("IVF_NPROBE", "8"))
+        self.semantic_top_k = int(os.getenv("SEMANTIC_TOP_K", "5"))
+        
+        # Keyword fast path (off by default): answer without scoring every entry or embedding when
+        # an entry matches at least min_hits of its keywords, leads every other entry by at least
+        # margin, and its own TF-IDF score, the reported confidence, is at least min_tfidf
+        self.keyword_fast_path_enabled = os.getenv("KEYWORD_FAST_PATH_ENABLED", "false").lower() == "true"
+        self.keyword_min_hits = int(os.getenv("KEYWORD_FAST_PATH_MIN_HITS", "2"))
+        self.keyword_margin = int(os.getenv("KEYWORD_FAST_PATH_MARGIN", "2"))
+        self.keyword_min_tfidf = float(os.getenv("KEYWORD_FAST_PATH_MIN_TFIDF", "0.4"))
+        self.keyword_candidates = int(os.getenv("KEYWORD_CANDIDATES", "3"))  # extra semantic candidates
+        
+        # find_best_matches works through large batches this many messages per inference job
+        self.batch_chunk_size = max(1, int(os.getenv("BATCH_MATCH_CHUNK_SIZE", "256")))
+        
+        # Which matching stage answered each lookup, cheapest first
+        self._stage_hits = {stage: 0 for stage in MATCH_STAGES}
+        self._lookups = 0
+        self._tfidf_candidates = 0
+        
+        # Under a deadline the semantic stage is skipped (TF-IDF decides alone) when less time
+        # is left than it usually takes: a running average of single-message stages, starting here
+        self._semantic_stage_seconds = float(os.getenv("SEMANTIC_STAGE_ESTIMATE_MS", "50")) / 1000
+        self._semantic_skipped = 0
+        
+        # Nearest-centroid intent classification over the FAQ embeddings
+        self.intent_min_similarity = float(os.getenv("LOCAL_INTENT_MIN_SIMILARITY", "0.5"))
+        
+        # Recent query embeddings, so later stages (e.g. the semantic cache) reuse them
+        self._query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_embeddings_lock = threading.Lock()
+        self.max_query_embeddings = 1024
+        
+        # On-disk cache of fitted indexes, keyed by knowledge base content and model
+        self.index_cache_enabled = os.getenv("INDEX_CACHE_ENABLED", "true").lower() == "true"
+        self.index_cache = IndexCache(os.getenv("INDEX_CACHE_DIR", ".index_cache"))
+        
+        # Runtime knowledge base updates are applied one at a time
+        self._update_lock = asyncio.Lock()
+        self._file_signature: Optional[Tuple[int, int]] = None
+        
+        # Tokenizer, forward passes and similarity scoring run here, not on the event loop
+        self.inference_executor = inference_executor or self._create_inference_executor()
+        
+        # Concurrent queries are embedded together in one padded forward pass
+        self.micro_batcher = self._create_micro_batcher()
+        
+    def _create_inference_executor(self) -> InferenceExecutor:
+        return InferenceExecutor(
+            max_workers=int(os.getenv("INFERENCE_WORKERS", "2")),
+            max_queue_size=int(os.getenv("INFERENCE_QUEUE_SIZE", "64")),
+            torch_threads=int(os.getenv("INFERENCE_TORCH_THREADS", "0"))
+        )
+        
+    def _create_micro_batcher(self) -> Optional[MicroBatcher]:
+        if os.getenv("MICRO_BATCH_ENABLED", "true").lower() != "true":
+            return None
+        return MicroBatcher(
+            self._semantic_search_batch,
+            self.inference_executor,
+            max_batch_size=int(os.getenv("MICRO_BATCH_MAX_SIZE", "16")),
+            max_wait_ms=float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5"))
+        )
+        
+    def prepare_fork(self):
+        """Stop the inference threads so the process can be forked safely"""
+        self.inference_executor.shutdown(wait=True)
+        
+    def after_fork(self):
+        """Give a forked worker its own threads and locks; model weights and indexes stay shared"""
+        self.inference_executor = self._create_inference_executor()
+        self.micro_batcher = self._create_micro_batcher()
+        self._update_lock = asyncio.Lock()
+        self._query_embeddings_lock = threading.Lock()
+        
+    @property
+    def knowledge_base(self) -> FAQStore:
+        return self.index.store
+    
+    @property
+    def semantic_embeddings(self) -> Optional[np.ndarray]:
+        return self.index.embeddings
+    
+    @property
+    def semantic_ready(self) -> bool:
+        """Whether the current snapshot was built with the semantic model"""
+        return self.semantic_encoder is not None and (self.index.embeddings is not None or not len(self.index.store))
+    
+    @property
+    def version(self) -> int:
+        """Incremented every time a new index snapshot is swapped in"""
+        return self.index.version
         
-    async def load_knowledge_base(self):
-        """Load FAQ knowledge base from JSON or CSV"""
+    async def load_knowledge_base(self, load_semantic: bool = True):
+        """Load FAQ knowledge base from JSON, JSON Lines or CSV
+        
+        With load_semantic=False only the TF-IDF and keyword indexes are built, so
+        matching can start at once; build_semantic_index adds embeddings later.
+        """
+        self._file_signature = self._stat_knowledge_base()
         try:
-            # Try JSON first
-            async with aiofiles.open(self.knowledge_base_path, 'r') as f:
-                content = await f.read()
-                self.knowledge_base = json.loads(content)
+            store = await self._read_knowledge_base()
                 
         except (FileNotFoundError, json.JSONDecodeError):
             # Fall back to creating default knowledge base
             logger.info("Creating default knowledge base...")
-            await self._create_default_knowledge_base()
+            store = FAQStore.from_entries(self._validate_entries(await self._create_default_knowledge_base()))
+            self._file_signature = self._stat_knowledge_base()
+            
+        cached = {}
+        if self.index_cache_enabled:
+            cached = self.index_cache.load(self._index_cache_key(store))
+            if 'vectorizer' in cached:
+                logger.info("Loaded TF-IDF index from cache")
+        
+        if load_semantic:
+            try:
+                await self.load_semantic_model()
+            except Exception as e:
+                logger.warning(f"Failed to load semantic model: {e}")
+        
+        self.index, _ = await self._build_index(store, cached=cached)
+        
+        logger.info(f"Loaded {len(store)} FAQ entries")
+        
+    async def update_knowledge_base(self, upserts: Iterable[Dict] = (), deletes: Iterable[str] = (),
+                                    persist: bool = True) -> Dict[str, Any]:
+        """Add, update or delete FAQ entries and atomically swap in the rebuilt indexes
+        
+        Entries are identified by question (see faq_key). Only new or reworded
+        questions are embedded. Returns the added, updated and deleted questions, plus
+        'embeddings' of the old and new versions of every changed question (None
+        without a semantic model).
+        """
+        upserts = self._validate_entries(upserts)
+        deletes = list(deletes)
+        async with self._update_lock:
+            current = self.index
+            diff = await asyncio.to_thread(self._diff_update, current.store, upserts, deletes)
+            return await self._swap_in(current, *diff, persist=persist)
+        
+    async def reload_knowledge_base(self) -> Dict[str, Any]:
+        """Re-read the knowledge base file and apply whatever changed in it"""
+        signature = self._stat_knowledge_base()
+        store = await self._read_knowledge_base()
+        async with self._update_lock:
+            current = self.index
+            diff = await asyncio.to_thread(self._diff_replacement, current.store, store)
+            changes = await self._swap_in(current, *diff, persist=False)
+        # Only once applied, so a reload that failed (e.g. on a full inference queue) is retried
+        self._file_signature = signature
+        return changes
+        
+    @staticmethod
+    def _diff_update(store: FAQStore, upserts: List[Dict], deletes: List[str]):
+        """New store with upserts and deletes applied, plus which old rows each new row carries over"""
+        removed, replacements, appended = set(), {}, []
+        added, updated, deleted, changed_questions = [], [], [], []
+        
+        for question in deletes:
+            position = store.find(question)
+            if position is not None and position not in removed:
+                removed.add(position)
+                deleted.append(store.questions[position])
+                changed_questions.append(store.questions[position])
+                
+        for faq in upserts:
+            position = store.find(faq['question'])
+            if position is None or position in removed:
+                appended.append(faq)
+                added.append(faq['question'])
+                changed_questions.append(faq['question'])
+            elif store[position] != faq:
+                replacements[position] = faq
+                updated.append(faq['question'])
+                changed_questions += [store.questions[position], faq['question']]
+                
+        carried = []
+        builder = FAQStoreBuilder()
+        for position in range(len(store)):
+            if position in removed:
+                continue
+            faq = replacements.get(position)
+            if faq is None:
+                builder.append_from(store, position)
+                carried.append(position)
+            else:
+                builder.append(faq)
+                carried.append(position if faq['question'] == store.questions[position] else -1)
+        for faq in appended:
+            builder.append(faq)
+            carried.append(-1)
+            
+        return builder.build(), np.array(carried, dtype=np.int64), added, updated, deleted, changed_questions
+        
+    @staticmethod
+    def _diff_replacement(store: FAQStore, new_store: FAQStore):
+        """Compare a complete new store against the current one"""
+        added, updated, deleted, changed_questions = [], [], [], []
+        carried = np.full(len(new_store), -1, dtype=np.int64)
+        old_positions = store.positions_of(new_store)
+        kept = np.zeros(len(store), dtype=bool)
+        kept[old_positions[old_positions >= 0]] = True
+        
+        for position, old_position in enumerate(old_positions.tolist()):
+            question = new_store.questions[position]
+            if old_position < 0:
+                added.append(question)
+                changed_questions.append(question)
+                continue
+            if not store.same_entry(old_position, new_store, position):
+                updated.append(question)
+                changed_questions += [store.questions[old_position], question]
+            if store.questions.raw(old_position) == new_store.questions.raw(position):
+                carried[position] = old_position
+                
+        for old_position in np.flatnonzero(~kept).tolist():
+            deleted.append(store.questions[old_position])
+            changed_questions.append(store.questions[old_position])
+            
+        return new_store, carried, added, updated, deleted, changed_questions
+        
+    async def _swap_in(self, current: FAQIndex, store: FAQStore, carried: np.ndarray, added: List[str],
+                       updated: List[str], deleted: List[str], changed_questions: List[str],
+                       persist: bool) -> Dict[str, Any]:
+        """Build indexes for store, reusing current's embeddings for carried rows, and swap them in"""
+        changes = {
+            'added': added,
+            'updated': updated,
+            'deleted': deleted,
+            'reembedded': 0,
+            'entries': len(store),
+            'version': current.version,
+            'embeddings': None,
+        }
+        if not (added or updated or deleted):
+            return changes
+            
+        cached = self.index_cache.load(self._index_cache_key(store)) if self.index_cache_enabled else {}
+        index, changes['reembedded'] = await self._build_index(store, previous=current, carried=carried, cached=cached)
+        changes['embeddings'] = self._question_embeddings(changed_questions, current, index)
+        
+        if persist:
+            await self._write_knowledge_base(store)
+        self.index = index
+        changes['version'] = index.version
+        
+        logger.info(
+            f"Knowledge base updated to version {index.version}: {len(added)} added, {len(updated)} updated, "
+            f"{len(deleted)} deleted, {changes['reembedded']} re-embedded"
+        )
+        return changes
+        
+    async def _read_knowledge_base(self) -> FAQStore:
+        """Stream validated entries from the knowledge base file into a store, parsing off the event loop"""
+        reader = KnowledgeBaseReader(self.knowledge_base_path, self.load_chunk_size, self.strict_loading)
+        chunks = reader.chunks()
+        builder = FAQStoreBuilder()
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            builder.extend(chunk)
+            
+        if reader.skipped:
+            logger.warning(f"Skipped {reader.skipped} of {reader.rows} knowledge base rows")
+        return builder.build()
+        
+    async def watch_knowledge_base(self, interval_seconds: float = 2.0,
+                                   on_change: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """Poll the knowledge base file and apply edits to it until cancelled"""
+        logger.info(f"Watching {self.knowledge_base_path} for changes every {interval_seconds}s")
+        while True:
+            await asyncio.sleep(interval_seconds)
+            if not self.knowledge_base_changed():
+                continue
+            signature = self._stat_knowledge_base()
+                
+            try:
+                changes = await self.reload_knowledge_base()
+            except InferenceQueueFullError as e:
+                logger.warning(f"Deferring knowledge base reload, inference queue is full: {e}")
+                continue
+            except Exception as e:
+                # Likely a partial write; the next modification triggers another attempt
+                self._file_signature = signature
+                logger.warning(f"Ignoring unreadable knowledge base edit: {e}")
+                continue
+                
+            if on_change and (changes['added'] or changes['updated'] or changes['deleted']):
+                on_change(changes)
+                
+    def knowledge_base_changed(self) -> bool:
+        """Whether the knowledge base file changed since it was last read or written here"""
+        signature = self._stat_knowledge_base()
+        return signature is not None and signature != self._file_signature
+        
+    def _stat_knowledge_base(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.knowledge_base_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+        
+    async def _write_knowledge_base(self, entries: Iterable[Mapping]):
+        """Replace the knowledge base file atomically, so the watcher never reads a partial file"""
+        await asyncio.to_thread(write_knowledge_base, self.knowledge_base_path, entries)
+        self._file_signature = self._stat_knowledge_base()
+        
+    @staticmethod
+    def _validate_entries(entries: Iterable[Any]) -> List[Dict]:
+        if not isinstance(entries, (list, tuple)):
+            entries = list(entries)
+        faqs = [validate_faq(entry) for entry in entries]
+        keys = [faq_key(faq['question']) for faq in faqs]
+        if len(set(keys)) != len(keys):
+            raise ValueError("FAQ questions must be unique")
+        return faqs
+        
+    def _index_cache_key(self, store: FAQStore) -> str:
+        # Backends other than fp32 produce slightly different embeddings, so they get their own entries
+        model = self.semantic_model_name
+        if self.embedding_backend != 'fp32':
+            model = f"{model}:{self.embedding_backend}"
+        return IndexCache.make_key(store.content_digest(), model, self.tfidf_vectorizer.get_params())
+        
+    async def _build_index(self, store: FAQStore, previous: Optional[FAQIndex] = None,
+                           carried: Optional[np.ndarray] = None,
+                           cached: Optional[Dict[str, Any]] = None) -> Tuple[FAQIndex, int]:
+        """Build a new index snapshot for store; returns it with the number of questions embedded
+        
+        carried[i] is the row in previous holding the same question as row i, or -1.
+        """
+        version = (previous or self.index).version + 1
+        if not len(store):
+            return FAQIndex(store, version=version), 0
             
-        # Prepare TF-IDF vectors
-        questions = [faq['question'] for faq in self.knowledge_base]
-        self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(questions)
+        cached = cached or {}
+        to_save = {}
+        
+        # Prepare TF-IDF vectors; refitting is cheap next to embedding
+        if previous is not None and previous.store is store and previous.tfidf_index is not None:
+            # Same entries, only adding embeddings: the lexical indexes carry over as they are
+            tfidf_index, keyword_index = previous.tfidf_index, previous.keyword_index
+        else:
+            if 'vectorizer' in cached:
+                vectorizer, tfidf_matrix = cached['vectorizer'], cached['tfidf_matrix']
+            else:
+                vectorizer, tfidf_matrix = await self.inference_executor.run(
+                    fit_tfidf,
+                    self.tfidf_vectorizer,
+                    store.questions,
+                    chunk_size=self.tfidf_chunk_size,
+                    max_fit_documents=self.tfidf_max_fit_documents
+                )
+                to_save.update(vectorizer=vectorizer, tfidf_matrix=tfidf_matrix)
+            tfidf_index = await self.inference_executor.run(TfidfIndex, vectorizer, tfidf_matrix)
+            keyword_index = await self.inference_executor.run(KeywordIndex, store)
+            
+        embeddings, vector_index, intent_centroids = None, None, None
+        reembedded = 0
+        if self.semantic_encoder:
+            embeddings = cached.get('embeddings')
+            if embeddings is not None and len(embeddings) == len(store):
+                # Memory-mapped embeddings from the index cache, no inference needed
+                logger.info("Loaded FAQ embeddings from cache")
+            else:
+                embeddings, reembedded = await self._embed_questions(store, previous, carried)
+                to_save['embeddings'] = embeddings
+                
+            vector_index = await self.inference_executor.run(
+                create_vector_index,
+                embeddings,
+                index_type=self.vector_index_type,
+                assume_normalized=True,
+                nlist=self.ivf_nlist,
+                nprobe=self.ivf_nprobe
+            )
+            intent_centroids = self._build_intent_centroids(store, embeddings)
+            
+        if to_save and self.index_cache_enabled:
+            key = self._index_cache_key(store)
+            await self.inference_executor.run(self._save_index_cache, key, to_save)
+            
+        index = FAQIndex(store, tfidf_index, keyword_index, embeddings, vector_index, intent_centroids, version=version)
+        return index, reembedded
+        
+    def _save_index_cache(self, key: str, parts: Dict[str, Any]):
+        self.index_cache.prune(key)
+        self.index_cache.save(key, **parts)
+        
+    async def _embed_questions(self, store: FAQStore, previous: Optional[FAQIndex] = None,
+                               carried: Optional[np.ndarray] = None) -> Tuple[np.ndarray, int]:
+        """Normalized question embeddings, copying carried rows from previous
         
-        # Load semantic model
-        await self._load_semantic_model()
+        New questions are embedded one chunk per executor job straight into the
+        preallocated result, so queries keep being served during large builds.
+        """
+        embeddings = None
+        missing = np.arange(len(store))
+        if carried is not None and previous is not None and previous.embeddings is not None:
+            reused = carried >= 0
+            embeddings = np.empty((len(store), previous.embeddings.shape[1]), dtype=np.float32)
+            embeddings[reused] = previous.embeddings[carried[reused]]
+            missing = np.flatnonzero(~reused)
+            
+        for start in range(0, len(missing), self.embedding_chunk_size):
+            positions = missing[start:start + self.embedding_chunk_size]
+            chunk = (await self._compute_embeddings([store.questions[i] for i in positions])).numpy()
+            if embeddings is None:
+                embeddings = np.empty((len(store), chunk.shape[1]), dtype=np.float32)
+            embeddings[positions] = normalize_rows(chunk)
+            
+        return embeddings, len(missing)
         
-        logger.info(f"Loaded {len(self.knowledge_base)} FAQ entries")
+    @staticmethod
+    def _question_embeddings(questions: List[str], *indexes: FAQIndex) -> Optional[np.ndarray]:
+        """Embedding rows of the given questions found in any of the indexes"""
+        rows = []
+        for index in indexes:
+            if index.embeddings is None:
+                continue
+            for question in questions:
+                position = index.store.find(question)
+                if position is not None and index.store.questions[position] == question:
+                    rows.append(index.embeddings[position])
+        return np.stack(rows) if rows else None
         
     async def _create_default_knowledge_base(self):
         """Create a default knowledge base for demonstration"""
@@ -93,143 +550,299 @@ class FAQMatcher:
             }
         ]
         
-        self.knowledge_base = default_faqs
-        
         # Save to file
-        async with aiofiles.open(self.knowledge_base_path, 'w') as f:
-            await f.write(json.dumps(default_faqs, indent=2))
-            
-    async def _load_semantic_model(self):
-        """Load semantic similarity model for better matching"""
-        try:
-            model_name = "sentence-transformers/all-MiniLM-L6-v2"
-            self.semantic_tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.semantic_model = AutoModel.from_pretrained(model_name)
-            
-            # Pre-compute embeddings for all FAQ questions
-            questions = [faq['question'] for faq in self.knowledge_base]
-            self.semantic_embeddings = await self._compute_embeddings(questions)
+        await asyncio.to_thread(write_knowledge_base, self.knowledge_base_path, default_faqs)
             
-            logger.info("Semantic similarity model loaded successfully")
+        return default_faqs
             
-        except Exception as e:
-            logger.warning(f"Failed to load semantic model: {e}")
+    async def load_semantic_model(self):
+        """Load semantic similarity model for better matching
+        
+        Runs in a thread: importing torch and transformers and reading the weights
+        take seconds, and the event loop keeps serving meanwhile.
+        """
+        from .embeddings import load_encoder  # deferred: imports torch and transformers
+        
+        self.semantic_encoder = await asyncio.to_thread(
+            load_encoder,
+            self.semantic_model_name,
+            backend=self.embedding_backend,
+            batch_size=self.embedding_batch_size,
+            export_dir=self.embedding_export_dir
+        )
+        self.semantic_tokenizer = self.semantic_encoder.tokenizer
+        self.semantic_model = self.semantic_encoder.model
+        
+        logger.info(f"Semantic similarity model loaded successfully ({self.embedding_backend} backend)")
+        
+    async def build_semantic_index(self):
+        """Swap in a snapshot of the current knowledge base with embeddings, once the model is loaded"""
+        async with self._update_lock:
+            if not self.semantic_encoder or self.semantic_ready:
+                return
+            current = self.index
+            cached = self.index_cache.load(self._index_cache_key(current.store)) if self.index_cache_enabled else {}
+            self.index, reembedded = await self._build_index(current.store, previous=current, cached=cached)
+            logger.info(f"Semantic index ready for {len(current.store)} FAQ entries ({reembedded} embedded)")
             
-    async def _compute_embeddings(self, texts: List[str]) -> torch.Tensor:
-        """Compute semantic embeddings for texts"""
-        if not self.semantic_model:
+    def semantic_fits(self, deadline: Optional[Deadline]) -> bool:
+        """Whether an embedding stage is expected to finish before deadline"""
+        return deadline is None or deadline.remaining() >= self._semantic_stage_seconds
+    
+    async def get_query_embedding(self, user_message: str) -> Optional[np.ndarray]:
+        """Normalized embedding of a query, reusing the one computed during matching if any"""
+        if not self.semantic_encoder:
             return None
             
-        embeddings = []
+        key = user_message.lower().strip()
+        with self._query_embeddings_lock:
+            embedding = self._query_embeddings.get(key)
+        if embedding is not None:
+            return embedding
+            
+        embeddings = await self._compute_embeddings([key])
+        embedding = normalize_rows(embeddings[0].numpy())
+        self._remember_query_embedding(key, embedding)
+        return embedding
+    
+    def _remember_query_embedding(self, key: str, embedding: np.ndarray):
+        with self._query_embeddings_lock:
+            self._query_embeddings[key] = embedding
+            self._query_embeddings.move_to_end(key)
+            if len(self._query_embeddings) > self.max_query_embeddings:
+                self._query_embeddings.popitem(last=False)
+    
+    @staticmethod
+    def _build_intent_centroids(store: FAQStore, embeddings: np.ndarray) -> np.ndarray:
+        """Average the normalized FAQ embeddings of each intent into a unit centroid, in intent code order"""
+        centroids = np.zeros((len(store.intent_names), embeddings.shape[1]), dtype=np.float32)
+        np.add.at(centroids, store.intent_codes, embeddings)
+        return normalize_rows(centroids)
         
-        for text in texts:
-            inputs = self.semantic_tokenizer(
-                text, 
-                return_tensors='pt', 
-                truncation=True, 
-                max_length=512,
-                padding=True
-            )
+    async def classify_intent(self, user_message: str) -> Optional[Tuple[str, float]]:
+        """Return (intent, similarity) of the nearest FAQ intent centroid, if close enough"""
+        index = self.index
+        if index.intent_centroids is None or not self.semantic_encoder:
+            return None
             
-            with torch.no_grad():
-                outputs = self.semantic_model(**inputs)
-                # Mean pooling
-                embeddings.append(outputs.last_hidden_state.mean(dim=1).squeeze())
-                
-        return torch.stack(embeddings)
+        return await self.inference_executor.run(self._classify_intent, index, user_message.lower().strip())
+    
+    def _classify_intent(self, index: FAQIndex, user_message: str) -> Optional[Tuple[str, float]]:
+        user_embedding = normalize_rows(self.semantic_encoder.encode([user_message])[0].numpy())
+        similarities = index.intent_centroids @ user_embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.intent_min_similarity:
+            return None
+        return index.store.intent_names[best], float(similarities[best])
     
-    async def find_best_match(self, user_message: str) -> Optional[Dict[str, Any]]:
-        """Find best matching FAQ using combined TF-IDF and semantic similarity"""
-        if not self.knowledge_base:
+    async def _compute_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> "torch.Tensor":
+        """Compute semantic embeddings for texts in padded batches"""
+        if not self.semantic_encoder:
             return None
             
-        user_message = user_message.lower().strip()
+        return await self.inference_executor.run(self.semantic_encoder.encode, texts, batch_size=batch_size)
+    
+    async def find_best_match(self, user_message: str, deadline: Optional[Deadline] = None) -> Optional[FAQMatch]:
+        """Find best matching FAQ, running the cheapest matching stages first
         
-        # Method 1: TF-IDF similarity - Fast initial filtering
-        tfidf_scores = self._compute_tfidf_similarity(user_message)
+        Stages: exact question, keyword fast path (if enabled), TF-IDF, semantic re-ranking of
+        the TF-IDF and keyword candidates, then a lower TF-IDF threshold. The
+        result is a read-only mapping view (question, response, intent, confidence,
+        match_type) over the store, not a copy of the entry. Semantic re-ranking is
+        skipped if deadline leaves too little time for it.
+        """
+        return (await self.find_best_matches([user_message], deadline))[0]
         
-        # Find top candidates with TF-IDF for performance optimization
-        # Only compute expensive semantic similarity for the most promising candidates
-        top_tfidf_threshold = 0.4  # High TF-IDF score threshold for direct match
+    async def find_best_matches(self, user_messages: List[str], deadline: Optional[Deadline] = None) -> List[Optional[FAQMatch]]:
+        """find_best_match for many messages, each stage running over all messages still unmatched
         
-        # Find best TF-IDF match
-        best_tfidf_idx = np.argmax(tfidf_scores)
-        best_tfidf_score = tfidf_scores[best_tfidf_idx]
-        
-        # If we have a very good TF-IDF match, return it immediately
-        if best_tfidf_score >= top_tfidf_threshold:
-            best_faq = self.knowledge_base[best_tfidf_idx]
-            return {
-                'question': best_faq['question'],
-                'response': best_faq['response'],
-                'intent': best_faq['intent'],
-                'confidence': min(float(best_tfidf_score), 1.0),
-                'match_type': 'tfidf'
-            }
+        Per chunk of batch_chunk_size messages, TF-IDF scoring is one sparse
+        product and the semantic stage one forward pass and one similarity product.
+        """
+        # One snapshot for the whole lookup, even if an update swaps in a new one meanwhile
+        index = self.index
+        results: List[Optional[FAQMatch]] = [None] * len(user_messages)
+        if not len(index.store):
+            return results
+            
+        messages = [user_message.lower().strip() for user_message in user_messages]
+        self._lookups += len(messages)
         
-        # Otherwise, get top 3 candidates for semantic analysis
-        top_indices = np.argsort(tfidf_scores)[-3:]  # Get indices of top 3 scores
-        
-        # Only process semantic similarity if the model is available
-        semantic_scores = None
-        if self.semantic_embeddings is not None:
-            # Only compute semantic similarity for top candidates
-            semantic_scores = await self._compute_semantic_similarity(user_message)
-            if semantic_scores is not None:
-                # Only keep scores for top TF-IDF candidates to save computation
-                filtered_semantic_scores = [semantic_scores[i] for i in top_indices]
+        # Stage 1: the message is one of the questions
+        unmatched = []
+        for position, user_message in enumerate(messages):
+            exact = index.store.find(user_message)
+            if exact is None:
+                unmatched.append(position)
+            else:
+                results[position] = self._stage_result('exact', FAQMatch(index.store, exact, 1.0, 'exact'))
+                
+        # Stages 2 and 3: keywords, then TF-IDF only if no keyword hit is decisive
+        top_tfidf_threshold = 0.4  # High TF-IDF score threshold for direct match
+        semantic = []
+        for start in range(0, len(unmatched), self.batch_chunk_size):
+            chunk = unmatched[start:start + self.batch_chunk_size]
+            lexical = await self.inference_executor.run(self._lexical_match, index, [messages[p] for p in chunk])
+            for position, (keywords, tfidf_scores, keyword_score) in zip(chunk, lexical):
+                if keyword_score is not None:
+                    results[position] = self._stage_result('keyword', FAQMatch(index.store, keywords.best()[0], min(keyword_score, 1.0), 'keyword'))
+                    continue
+                self._tfidf_candidates += len(tfidf_scores)
                 
-                # Find best semantic match among top TF-IDF candidates
-                best_semantic_idx = np.argmax(filtered_semantic_scores)
-                best_idx = top_indices[best_semantic_idx]
+                # Top 3 TF-IDF candidates, best first; entries sharing no term with the message have no score
+                top_scores, top_indices = tfidf_scores.top(3)
+                best_tfidf_idx = int(top_indices[0]) if len(top_indices) else 0
+                best_tfidf_score = float(top_scores[0]) if len(top_scores) else 0.0
                 
-                # Calculate combined score
-                best_score = 0.6 * semantic_scores[best_idx] + 0.4 * tfidf_scores[best_idx]
+                # If we have a very good TF-IDF match, return it immediately
+                if best_tfidf_score >= top_tfidf_threshold:
+                    results[position] = self._stage_result('tfidf', FAQMatch(index.store, best_tfidf_idx, min(best_tfidf_score, 1.0), 'tfidf'))
+                    continue
+                    
+                # The top TF-IDF and keyword candidates go to semantic analysis
+                candidates = np.union1d(top_indices, keywords.top(self.keyword_candidates))
+                semantic.append((position, tfidf_scores, best_tfidf_idx, best_tfidf_score, candidates))
                 
-                if best_score >= 0.3:  # Minimum threshold
-                    best_faq = self.knowledge_base[best_idx]
-                    return {
-                        'question': best_faq['question'],
-                        'response': best_faq['response'],
-                        'intent': best_faq['intent'],
-                        'confidence': min(float(best_score), 1.0),  # Ensure confidence is at most 1.0
-                        'match_type': 'combined'
-                    }
-        
-        # If semantic matching didn't find a good match, fall back to TF-IDF
+        # Stages 4 and 5: semantic re-ranking if there is time left for it, then a lower TF-IDF threshold
+        if semantic and not self.semantic_fits(deadline):
+            self._semantic_skipped += len(semantic)
+            all_scores = [None] * len(semantic)
+        else:
+            start = time.perf_counter()
+            all_scores = await self._compute_semantic_similarities(
+                index, [(messages[position], candidates) for position, *_, candidates in semantic]
+            )
+            if len(semantic) == 1 and all_scores[0] is not None:
+                self._semantic_stage_seconds += 0.1 * (time.perf_counter() - start - self._semantic_stage_seconds)
+        for (position, tfidf_scores, best_tfidf_idx, best_tfidf_score, _), semantic_scores in zip(semantic, all_scores):
+            results[position] = self._combined_match(index, tfidf_scores, semantic_scores, best_tfidf_idx, best_tfidf_score)
+            
+        return results
+        
+    def _combined_match(self, index: FAQIndex, tfidf_scores: TfidfScores, semantic_scores: Optional[Dict[int, float]],
+                        best_tfidf_idx: int, best_tfidf_score: float) -> Optional[FAQMatch]:
+        """Stages 4 and 5 for one message"""
+        if semantic_scores:
+            # Pick the candidate with the best combined score
+            best_idx, best_score = max(
+                ((idx, 0.6 * score + 0.4 * tfidf_scores[idx]) for idx, score in semantic_scores.items()),
+                key=lambda item: item[1]
+            )
+            
+            if best_score >= 0.3:  # Minimum threshold
+                # Ensure confidence is at most 1.0
+                return self._stage_result('combined', FAQMatch(index.store, int(best_idx), min(float(best_score), 1.0), 'combined'))
+        
+        # Stage 5: if semantic matching didn't find a good match, fall back to TF-IDF
         if best_tfidf_score >= 0.3:  # Lower threshold for fallback
-            best_faq = self.knowledge_base[best_tfidf_idx]
-            return {
-                'question': best_faq['question'],
-                'response': best_faq['response'],
-                'intent': best_faq['intent'],
-                'confidence': min(float(best_tfidf_score), 1.0),
-                'match_type': 'tfidf'
-            }
+            return self._stage_result('tfidf_fallback', FAQMatch(index.store, best_tfidf_idx, min(best_tfidf_score, 1.0), 'tfidf'))
             
         # No good match found
-        return None
+        return self._stage_result('none', None)
+    
+    def _lexical_match(self, index: FAQIndex, user_messages: List[str]) -> List[Tuple[KeywordMatch, Optional[TfidfScores], Optional[float]]]:
+        """Keyword matches, then TF-IDF: the keyword fast path's answer scored alone, other messages against every entry"""
+        with STAGE_LATENCY.time('keyword'):
+            keyword_matches = [index.keyword_index.match(user_message) for user_message in user_messages]
+            decided = [position for position, keywords in enumerate(keyword_matches) if self._keywords_decide(keywords)]
+        
+        with STAGE_LATENCY.time('tfidf'):
+            queries = index.tfidf_index.vectorize(user_messages)
+            keyword_scores: List[Optional[float]] = [None] * len(user_messages)
+            if decided:
+                # TF-IDF must agree with the keywords: the leading entry is scored alone
+                agreement = index.tfidf_index.entry_scores(queries[decided],
+                                                           [keyword_matches[position].best()[0] for position in decided])
+                for position, score in zip(decided, agreement):
+                    if score >= self.keyword_min_tfidf:
+                        keyword_scores[position] = float(score)
+                        
+            undecided = [position for position, score in enumerate(keyword_scores) if score is None]
+            tfidf_scores: List[Optional[TfidfScores]] = [None] * len(user_messages)
+            if undecided:
+                for position, message_scores in zip(undecided, self._compute_tfidf_similarity(index, queries[undecided])):
+                    tfidf_scores[position] = message_scores
+        return list(zip(keyword_matches, tfidf_scores, keyword_scores))
+    
+    def _keywords_decide(self, keywords: KeywordMatch) -> bool:
+        """Whether one entry leads on keywords clearly enough to be checked against TF-IDF alone"""
+        if not self.keyword_fast_path_enabled:
+            return False
+        _, hits, runner_up = keywords.best()
+        return hits >= self.keyword_min_hits and hits - runner_up >= self.keyword_margin
+    
+    def _stage_result(self, stage: str, match: Optional[FAQMatch]) -> Optional[FAQMatch]:
+        self._stage_hits[stage] += 1
+        return match
     
-    def _compute_tfidf_similarity(self, user_message: str) -> List[float]:
-        """Compute TF-IDF cosine similarity"""
-        user_vector = self.tfidf_vectorizer.transform([user_message])
-        similarities = cosine_similarity(user_vector, self.tfidf_matrix).flatten()
-        return similarities.tolist()
+    def match_stats(self) -> Dict[str, Any]:
+        """How many lookups each matching stage answered"""
+        scored = self._lookups - self._stage_hits['exact'] - self._stage_hits['keyword']
+        return {
+            'lookups': self._lookups,
+            'stages': dict(self._stage_hits),
+            'avg_tfidf_candidates': round(self._tfidf_candidates / scored, 1) if scored else 0.0,
+            'semantic_skipped': self._semantic_skipped,
+            'semantic_stage_ms': round(self._semantic_stage_seconds * 1000, 2),
+            'entries': len(self.index.store),
+        }
     
-    async def _compute_semantic_similarity(self, user_message: str) -> List[float]:
-        """Compute semantic similarity using embeddings"""
-        if not self.semantic_model:
+    def _compute_tfidf_similarity(self, index: FAQIndex, queries) -> List[TfidfScores]:
+        """Compute TF-IDF cosine similarity of each vectorized message against every entry in one sparse product"""
+        return index.tfidf_index.query_scores(queries)
+    
+    async def _compute_semantic_similarity(self, user_message: str, extra_indices=(),
+                                           index: Optional[FAQIndex] = None) -> Optional[Dict[int, float]]:
+        """Semantic scores for the top-k index hits plus any extra candidate indices"""
+        index = index or self.index
+        if not self.semantic_encoder or index.vector_index is None:
             return None
             
-        # Compute user message embedding
-        user_embedding = await self._compute_embeddings([user_message])
+        if self.micro_batcher:
+            return await self.micro_batcher.submit((index, user_message, extra_indices))
+        results = await self.inference_executor.run(self._semantic_search_batch, [(index, user_message, extra_indices)])
+        return results[0]
         
-        # Compute cosine similarity
-        user_embedding = user_embedding[0].unsqueeze(0)  # Add batch dimension
-        similarities = torch.nn.functional.cosine_similarity(
-            user_embedding, 
-            self.semantic_embeddings, 
-            dim=1
-        )
+    async def _compute_semantic_similarities(self, index: FAQIndex, queries: List[Tuple[str, np.ndarray]]) -> List[Optional[Dict[int, float]]]:
+        """_compute_semantic_similarity for (message, extra_indices) queries, one forward pass per chunk"""
+        if len(queries) == 1:
+            # A single message joins concurrent requests' micro-batches
+            return [await self._compute_semantic_similarity(*queries[0], index)]
+        if not self.semantic_encoder or index.vector_index is None:
+            return [None] * len(queries)
+            
+        results = []
+        for start in range(0, len(queries), self.batch_chunk_size):
+            chunk = [(index, user_message, extra_indices) for user_message, extra_indices in queries[start:start + self.batch_chunk_size]]
+            results += await self.inference_executor.run(self._semantic_search_batch, chunk)
+        return results
+    
+    def _semantic_search_batch(self, queries: List[tuple]) -> List[Dict[int, float]]:
+        """Embed (index, message, extra_indices) queries in one forward pass and search each query's index"""
+        with STAGE_LATENCY.time('embedding'):
+            user_embeddings = normalize_rows(self.semantic_encoder.encode([message for _, message, _ in queries]).numpy())
         
-        return similarities.tolist()
+        start = time.perf_counter()
+        # Queries are searched together per index snapshot (normally all share one)
+        hits = [None] * len(queries)
+        by_index: Dict[int, Tuple[FAQIndex, List[int]]] = {}
+        for position, (index, _, _) in enumerate(queries):
+            by_index.setdefault(id(index), (index, []))[1].append(position)
+        for index, positions in by_index.values():
+            for position, hit in zip(positions, index.vector_index.search_batch(user_embeddings[positions], self.semantic_top_k)):
+                hits[position] = hit
+                
+        results = []
+        for user_embedding, (scores, ids), (index, message, extra_indices) in zip(user_embeddings, hits, queries):
+            self._remember_query_embedding(message, user_embedding)
+            candidates = {int(idx): float(score) for idx, score in zip(ids, scores)}
+            
+            missing = [int(idx) for idx in extra_indices if int(idx) not in candidates]
+            if missing:
+                for idx, score in zip(missing, index.vector_index.score(user_embedding, missing)):
+                    candidates[idx] = float(score)
+                    
+            results.append(candidates)
+            
+        STAGE_LATENCY.observe(time.perf_counter() - start, 'similarity')
+        return results
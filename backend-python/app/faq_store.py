@@ -0,0 +1,249 @@
+import hashlib
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from .kb_loader import faq_key
+
+
+class StringColumn:
+    """Strings stored back to back in one UTF-8 buffer, addressed by an offsets array"""
+
+    __slots__ = ('buffer', 'offsets')
+
+    def __init__(self, buffer: bytearray, offsets: array):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.raw(index).decode('utf-8')
+
+    def raw(self, index: int) -> bytearray:
+        """UTF-8 bytes of one string, without decoding"""
+        if index < 0:
+            index += len(self)
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + len(self.offsets) * self.offsets.itemsize
+
+
+class FAQRecord(Mapping):
+    """Read-only view of one stored FAQ entry; fields are decoded on access"""
+
+    __slots__ = ('store', 'position')
+    _fields = ('question', 'response', 'intent', 'keywords')
+
+    def __init__(self, store: "FAQStore", position: int):
+        self.store = store
+        self.position = position
+
+    @property
+    def question(self) -> str:
+        return self.store.questions[self.position]
+
+    @property
+    def response(self) -> str:
+        return self.store.responses[self.position]
+
+    @property
+    def intent(self) -> str:
+        return self.store.intent_names[self.store.intent_codes[self.position]]
+
+    @property
+    def keywords(self) -> List[str]:
+        return self.store.keywords(self.position)
+
+    def __getitem__(self, field: str) -> Any:
+        if field not in self._fields:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({dict(self)!r})"
+
+
+class FAQMatch(FAQRecord):
+    """Match result from FAQMatcher.find_best_match: an entry view plus its score"""
+
+    __slots__ = ('confidence', 'match_type')
+    _fields = ('question', 'response', 'intent', 'confidence', 'match_type')
+
+    def __init__(self, store: "FAQStore", position: int, confidence: float, match_type: str):
+        super().__init__(store, position)
+        self.confidence = confidence
+        self.match_type = match_type
+
+
+class FAQStore:
+    """Compact, immutable column store of FAQ entries
+
+    Questions and responses live in one UTF-8 buffer each, intents and keywords
+    are small integer codes into shared name lists, and questions are found by a
+    sorted array of key hashes rather than a dict.
+    """
+
+    def __init__(self, questions: StringColumn, responses: StringColumn, intent_names: List[str],
+                 intent_codes: np.ndarray, keyword_names: List[str], keyword_codes: np.ndarray,
+                 keyword_offsets: array):
+        self.questions = questions
+        self.responses = responses
+        self.intent_names = intent_names
+        self.intent_codes = intent_codes
+        self.keyword_names = keyword_names
+        self.keyword_codes = keyword_codes
+        self.keyword_offsets = keyword_offsets
+
+        # Question lookup: sorted 64-bit key hashes; collisions are resolved in find()
+        hashes = np.fromiter((hash(faq_key(question)) for question in questions), dtype=np.int64, count=len(questions))
+        self._key_order = np.argsort(hashes, kind='stable').astype(np.min_scalar_type(max(len(questions), 1)))
+        self._key_hashes = hashes[self._key_order]
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Mapping]) -> "FAQStore":
+        builder = FAQStoreBuilder()
+        builder.extend(entries)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __getitem__(self, position: int) -> FAQRecord:
+        if not -len(self) <= position < len(self):
+            raise IndexError(position)
+        return FAQRecord(self, position % len(self))
+
+    def __iter__(self) -> Iterator[FAQRecord]:
+        for position in range(len(self)):
+            yield FAQRecord(self, position)
+
+    def keywords(self, position: int) -> List[str]:
+        codes = self.keyword_codes[self.keyword_offsets[position]:self.keyword_offsets[position + 1]]
+        return [self.keyword_names[code] for code in codes]
+
+    def find(self, question: str) -> Optional[int]:
+        """Position of the entry with this question (compared case-insensitively), if any"""
+        key = faq_key(question)
+        target = hash(key)
+        start = int(np.searchsorted(self._key_hashes, target))
+        for i in range(start, len(self._key_hashes)):
+            if self._key_hashes[i] != target:
+                break
+            position = int(self._key_order[i])
+            if faq_key(self.questions[position]) == key:
+                return position
+        return None
+
+    def positions_of(self, other: "FAQStore") -> np.ndarray:
+        """Position in this store of each of other's questions, or -1; one vectorized search"""
+        positions = np.full(len(other), -1, dtype=np.int64)
+        if not len(self) or not len(other):
+            return positions
+        hashes = np.empty(len(other), dtype=np.int64)
+        hashes[other._key_order] = other._key_hashes
+        candidates = np.minimum(np.searchsorted(self._key_hashes, hashes), len(self) - 1)
+        found = np.flatnonzero(self._key_hashes[candidates] == hashes)
+        positions[found] = self._key_order[candidates[found]]
+
+        for i in found:
+            # Confirm the hash match; on a collision fall back to the exact lookup
+            if faq_key(self.questions[positions[i]]) != faq_key(other.questions[i]):
+                position = self.find(other.questions[i])
+                positions[i] = -1 if position is None else position
+        return positions
+
+    def same_entry(self, position: int, other: "FAQStore", other_position: int) -> bool:
+        """Whether an entry of this store equals one of other, comparing stored bytes"""
+        return (self.questions.raw(position) == other.questions.raw(other_position)
+                and self.responses.raw(position) == other.responses.raw(other_position)
+                and self.intent_names[self.intent_codes[position]] == other.intent_names[other.intent_codes[other_position]]
+                and self.keywords(position) == other.keywords(other_position))
+
+    def content_digest(self) -> str:
+        """Hash of the stored content, for keying caches of indexes built over it"""
+        digest = hashlib.sha256()
+        for column in (self.questions, self.responses):
+            digest.update(column.buffer)
+            digest.update(column.offsets.tobytes())
+        for names, codes in ((self.intent_names, self.intent_codes), (self.keyword_names, self.keyword_codes)):
+            digest.update("\0".join(names).encode('utf-8') + b"\1")
+            digest.update(codes.astype(np.int64).tobytes())
+        digest.update(self.keyword_offsets.tobytes())
+        return digest.hexdigest()
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the store, excluding the shared name lists"""
+        return (self.questions.nbytes + self.responses.nbytes + self.intent_codes.nbytes
+                + self.keyword_codes.nbytes + len(self.keyword_offsets) * self.keyword_offsets.itemsize
+                + self._key_hashes.nbytes + self._key_order.nbytes)
+
+
+class FAQStoreBuilder:
+    """Appends entries one at a time, so a store can be built from a stream of rows"""
+
+    def __init__(self):
+        self._questions = bytearray()
+        self._question_offsets = array('q', [0])
+        self._responses = bytearray()
+        self._response_offsets = array('q', [0])
+        self._intent_codes = array('l')
+        self._intents: Dict[str, int] = {}
+        self._keyword_codes = array('l')
+        self._keyword_offsets = array('q', [0])
+        self._keywords: Dict[str, int] = {}
+
+    def append(self, faq: Mapping):
+        self._questions += faq['question'].encode('utf-8')
+        self._question_offsets.append(len(self._questions))
+        self._responses += faq['response'].encode('utf-8')
+        self._response_offsets.append(len(self._responses))
+        self._intent_codes.append(self._intents.setdefault(faq['intent'], len(self._intents)))
+        for keyword in faq.get('keywords') or ():
+            self._keyword_codes.append(self._keywords.setdefault(keyword, len(self._keywords)))
+        self._keyword_offsets.append(len(self._keyword_codes))
+
+    def append_from(self, store: FAQStore, position: int):
+        """Copy one entry of another store without decoding its text"""
+        self._questions += store.questions.raw(position)
+        self._question_offsets.append(len(self._questions))
+        self._responses += store.responses.raw(position)
+        self._response_offsets.append(len(self._responses))
+        intent = store.intent_names[store.intent_codes[position]]
+        self._intent_codes.append(self._intents.setdefault(intent, len(self._intents)))
+        for keyword in store.keywords(position):
+            self._keyword_codes.append(self._keywords.setdefault(keyword, len(self._keywords)))
+        self._keyword_offsets.append(len(self._keyword_codes))
+
+    def extend(self, entries: Iterable[Mapping]):
+        for faq in entries:
+            self.append(faq)
+
+    def build(self) -> FAQStore:
+        return FAQStore(
+            StringColumn(self._questions, self._question_offsets),
+            StringColumn(self._responses, self._response_offsets),
+            list(self._intents),
+            np.asarray(self._intent_codes, dtype=np.min_scalar_type(max(len(self._intents) - 1, 0))),
+            list(self._keywords),
+            np.asarray(self._keyword_codes, dtype=np.min_scalar_type(max(len(self._keywords) - 1, 0))),
+            self._keyword_offsets
+        )
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import random
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from .adaptive_limiter import AdaptiveConcurrencyLimiter
+from .circuit_breaker import OPEN, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+# Status codes worth retrying: throttling and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiAPIError(Exception):
+    """Raised when a Gemini call fails after all retries"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _Attempt:
+    """One HTTP attempt; failed is set once its outcome is known (None: no verdict, e.g. cancelled)"""
+
+    __slots__ = ('probe', 'started', 'failed')
+
+    def __init__(self, probe: bool, started: float):
+        self.probe = probe
+        self.started = started
+        self.failed: Optional[bool] = None
+
+
+class GeminiClient:
+    """Async Gemini REST client with a pooled connection, concurrency limit, timeouts and retries
+
+    Attempts go through a circuit breaker, which fails them fast with
+    CircuitOpenError while Gemini is failing, and an adaptive concurrency limit
+    of at most max_concurrency calls in flight.
+    """
+
+    def __init__(self, api_key: str, model_name: str, base_url: str = DEFAULT_BASE_URL,
+                 max_concurrency: int = 16, timeout_seconds: float = 20.0,
+                 max_retries: int = 2, backoff_base_seconds: float = 0.25,
+                 backoff_max_seconds: float = 4.0, breaker: Optional[CircuitBreaker] = None,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base_seconds
+        self.backoff_max = backoff_max_seconds
+        self.timeout = httpx.Timeout(timeout_seconds, connect=min(timeout_seconds, 5.0))
+
+        self.breaker = breaker
+        self.limiter = limiter or AdaptiveConcurrencyLimiter("gemini", max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'),
+            headers={'x-goog-api-key': api_key, 'Content-Type': 'application/json'},
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=max(1, max_concurrency), max_keepalive_connections=max(1, max_concurrency))
+        )
+
+    async def generate_content(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                               timeout: Optional[float] = None) -> str:
+        """Generate text for a single-turn prompt and return the candidate text"""
+        payload: Dict[str, Any] = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+        if generation_config:
+            payload['generationConfig'] = generation_config
+
+        data = await self._post(f"/models/{self.model_name}:generateContent", payload, timeout)
+        return self._extract_text(data)
+
+    async def stream_generate_content(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                                      timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Stream candidate text chunks over server-sent events
+
+        Failures before the first chunk are retried like generate_content; once
+        text has been yielded, errors propagate to the caller.
+        """
+        payload: Dict[str, Any] = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+        if generation_config:
+            payload['generationConfig'] = generation_config
+        path = f"/models/{self.model_name}:streamGenerateContent"
+        last_error: Optional[GeminiAPIError] = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                if self._circuit_open():
+                    break
+                await self._backoff(attempt)
+
+            yielded = False
+            try:
+                async with self._attempt() as call:
+                    async with self._client.stream('POST', path, params={'alt': 'sse'}, json=payload,
+                                                   timeout=timeout or self.timeout) as response:
+                        # Judged on the response headers: the stream's length is the reply's
+                        call.failed = response.status_code in RETRYABLE_STATUS_CODES
+                        if response.status_code != 200:
+                            body = (await response.aread()).decode('utf-8', 'replace')
+                            last_error = GeminiAPIError(
+                                f"Gemini returned HTTP {response.status_code}: {body[:200]}",
+                                status_code=response.status_code
+                            )
+                            if response.status_code not in RETRYABLE_STATUS_CODES:
+                                break
+                            logger.warning(f"Gemini stream attempt {attempt + 1} failed: {last_error}")
+                            continue
+
+                        async for line in response.aiter_lines():
+                            if not line.startswith('data:'):
+                                continue
+                            text = self._extract_chunk_text(json.loads(line[5:].strip()))
+                            if text:
+                                yielded = True
+                                yield text
+                        return
+
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if yielded:
+                    raise GeminiAPIError(f"Gemini stream interrupted: {e.__class__.__name__}: {e}")
+                last_error = GeminiAPIError(f"Gemini request failed: {e.__class__.__name__}: {e}")
+                logger.warning(f"Gemini stream attempt {attempt + 1} failed: {last_error}")
+
+        raise last_error
+
+    async def _post(self, path: str, payload: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+        last_error: Optional[GeminiAPIError] = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                if self._circuit_open():
+                    break
+                await self._backoff(attempt)
+
+            try:
+                async with self._attempt() as call:
+                    response = await self._client.post(path, json=payload, timeout=timeout or self.timeout)
+                    call.failed = response.status_code in RETRYABLE_STATUS_CODES
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = GeminiAPIError(f"Gemini request failed: {e.__class__.__name__}: {e}")
+                logger.warning(f"Gemini attempt {attempt + 1} failed: {last_error}")
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+
+            last_error = GeminiAPIError(
+                f"Gemini returned HTTP {response.status_code}: {response.text[:200]}",
+                status_code=response.status_code
+            )
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                break
+            logger.warning(f"Gemini attempt {attempt + 1} failed: {last_error}")
+
+        raise last_error
+
+    @asynccontextmanager
+    async def _attempt(self):
+        """Admit one attempt through the breaker and a concurrency slot, and record how it went
+
+        Timeouts and transport errors count as failures, as do throttling and
+        server error statuses (the block sets call.failed from the status).
+        """
+        probe = self.breaker.acquire() if self.breaker else False
+        try:
+            started = await self.limiter.acquire()
+        except BaseException:
+            if self.breaker:
+                self.breaker.release(probe)
+            raise
+
+        call = _Attempt(probe, started)
+        try:
+            yield call
+        except (httpx.TimeoutException, httpx.TransportError):
+            if call.failed is None:
+                call.failed = True
+            raise
+        finally:
+            if call.failed is None:
+                if self.breaker:
+                    self.breaker.release(probe)
+            elif call.failed:
+                self.limiter.on_failure(started)
+                if self.breaker:
+                    self.breaker.record_failure(probe)
+            else:
+                self.limiter.on_success(started)
+                if self.breaker:
+                    self.breaker.record_success(probe)
+            self.limiter.release()
+
+    def _circuit_open(self) -> bool:
+        """Whether retrying is pointless because the breaker has opened"""
+        return self.breaker is not None and self.breaker.state == OPEN
+
+    async def _backoff(self, attempt: int):
+        """Full jitter exponential backoff before retry number attempt"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+        await asyncio.sleep(delay)
+
+    @staticmethod
+    def _extract_text(data: Dict[str, Any]) -> str:
+        candidates = data.get('candidates') or []
+        if not candidates:
+            reason = (data.get('promptFeedback') or {}).get('blockReason', 'no candidates')
+            raise GeminiAPIError(f"Gemini returned no content ({reason})")
+
+        parts = (candidates[0].get('content') or {}).get('parts') or []
+        text = "".join(part.get('text', '') for part in parts)
+        if not text:
+            raise GeminiAPIError(f"Gemini returned empty content ({candidates[0].get('finishReason', 'unknown')})")
+        return text
+
+    @staticmethod
+    def _extract_chunk_text(data: Dict[str, Any]) -> str:
+        candidates = data.get('candidates') or []
+        if not candidates:
+            return ""
+        parts = (candidates[0].get('content') or {}).get('parts') or []
+        return "".join(part.get('text', '') for part in parts)
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -1,23 +1,166 @@
 import os
-import google.generativeai as genai
+import asyncio
+import json
+import re
 import logging
-from typing import Dict, Any, Optional, Tuple
-import hashlib
 import time
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable, AsyncIterator
 from dotenv import load_dotenv
 
+from .adaptive_limiter import AdaptiveConcurrencyLimiter
+from .cache import MemoryCacheBackend, ResponseCache
+from .cache_keys import message_key
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .sessions import EMPTY_CONTEXT, ConversationContext
+from .gemini_client import GeminiClient, DEFAULT_BASE_URL
+from .metrics import GEMINI_ERRORS, GEMINI_FALLBACKS, STAGE_LATENCY
+from .single_flight import SingleFlight
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+RESPONSE_PREFIXES = ("Assistant Response:", "Response:")
+
+
+class IncrementalResponseCleaner:
+    """Streaming counterpart of GeminiResponseGenerator._clean_response
+    
+    Leading prefixes are stripped, and text past the sentence limit is held back
+    until it is known whether the full response exceeds the length limit.
+    """
+    
+    def __init__(self, max_chars: int, max_sentences: int):
+        self.max_chars = max_chars
+        self.max_sentences = max_sentences
+        self._head = ""  # start of the response, held until prefixes are ruled out
+        self._started = False
+        self._held = ""  # text after the last allowed sentence
+        self._output = []
+        self._length = 0
+        self._sentences = 0
+        self._truncated = False
+        
+    @property
+    def text(self) -> str:
+        """Cleaned text emitted so far"""
+        return "".join(self._output)
+    
+    def feed(self, chunk: str) -> str:
+        """Add a raw chunk and return the cleaned text that can be emitted now"""
+        if self._truncated:
+            return ""
+            
+        if not self._started:
+            self._head += chunk
+            stripped = self._head.lstrip()
+            if any(prefix.startswith(stripped) for prefix in RESPONSE_PREFIXES):
+                return ""  # could still turn into a prefix
+            for prefix in RESPONSE_PREFIXES:
+                if stripped.startswith(prefix):
+                    stripped = stripped[len(prefix):]
+                    break
+            chunk = stripped.lstrip()
+            if not chunk:
+                return ""
+            self._started = True
+            
+        return self._accept(chunk)
+    
+    def finish(self) -> str:
+        """Flush whatever is left once the stream has ended"""
+        if not self._started and self._head.strip():
+            head = self._head.strip()
+            for prefix in RESPONSE_PREFIXES:
+                if head.startswith(prefix):
+                    head = head[len(prefix):].strip()
+                    break
+            self._started = True
+            emitted = self._accept(head)
+        else:
+            emitted = ""
+            
+        tail = "" if self._truncated else self._held.rstrip()
+        self._held = ""
+        if tail:
+            self._output.append(tail)
+        return emitted + tail
+    
+    def _accept(self, chunk: str) -> str:
+        self._length += len(chunk)
+        emit = chunk
+        
+        if self._sentences >= self.max_sentences:
+            self._held += chunk
+            emit = ""
+        else:
+            remaining = self.max_sentences - self._sentences
+            cut = -1
+            for position, char in enumerate(chunk):
+                if char == '.':
+                    remaining -= 1
+                    if remaining == 0:
+                        cut = position
+                        break
+            if cut == -1:
+                self._sentences += chunk.count('.')
+            else:
+                self._sentences = self.max_sentences
+                emit, self._held = chunk[:cut + 1], chunk[cut + 1:]
+                
+        if self._sentences >= self.max_sentences and self._length > self.max_chars:
+            # Too long: the response ends after the last allowed sentence
+            self._truncated = True
+            self._held = ""
+            
+        if emit:
+            self._output.append(emit)
+        return emit
+
+
+def _log_gemini_failure(call: str, error: Exception):
+    # While the circuit is open every call fails fast; one warning when it opens is enough
+    if isinstance(error, CircuitOpenError):
+        logger.debug(f"{call} skipped: {error}")
+    else:
+        logger.warning(f"{call} failed: {error}")
+
+
 class GeminiResponseGenerator:
     """Google Gemini-based response generation"""
     
-    def __init__(self):
-        self.model = None
+    def __init__(self, intent_classifier: Optional[Callable[[str], Awaitable[Optional[Tuple[str, float]]]]] = None,
+                 response_cache: Optional[ResponseCache] = None):
+        self.client = None
         self.api_key = os.getenv('GOOGLE_API_KEY')
         self.model_name = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+        self.api_base_url = os.getenv('GEMINI_API_BASE_URL', DEFAULT_BASE_URL)
+        self.max_concurrency = int(os.getenv('GEMINI_MAX_CONCURRENCY', '16'))
+        self.timeout_seconds = float(os.getenv('GEMINI_TIMEOUT_SECONDS', '20'))
+        self.max_retries = int(os.getenv('GEMINI_MAX_RETRIES', '2'))
+        
+        # Fail fast while Gemini is failing, and adapt the concurrency limit (between
+        # GEMINI_MIN_CONCURRENCY and GEMINI_MAX_CONCURRENCY) to its latency and errors
+        self.breaker = CircuitBreaker(
+            "gemini",
+            failure_rate=float(os.getenv('GEMINI_BREAKER_FAILURE_RATE', '0.5')),
+            window=int(os.getenv('GEMINI_BREAKER_WINDOW', '20')),
+            min_calls=int(os.getenv('GEMINI_BREAKER_MIN_CALLS', '10')),
+            open_seconds=float(os.getenv('GEMINI_BREAKER_OPEN_SECONDS', '10'))
+        ) if os.getenv('GEMINI_BREAKER_ENABLED', 'true').lower() == 'true' else None
+        adaptive = os.getenv('GEMINI_ADAPTIVE_CONCURRENCY', 'true').lower() == 'true'
+        self.limiter = AdaptiveConcurrencyLimiter(
+            "gemini",
+            max_limit=self.max_concurrency,
+            min_limit=int(os.getenv('GEMINI_MIN_CONCURRENCY', '2')) if adaptive else self.max_concurrency,
+            latency_tolerance=float(os.getenv('GEMINI_LATENCY_TOLERANCE', '2.0'))
+        )
+        
+        # How intent is obtained: 'separate' (extra Gemini call), 'combined' (intent and
+        # reply in one JSON completion) or 'local' (intent_classifier, run in parallel)
+        self.intent_mode = os.getenv('GEMINI_INTENT_MODE', 'combined').lower()
+        self.intent_classifier = intent_classifier
         
         # Predefined intents
         self.intent_labels = [
@@ -27,9 +170,10 @@ class GeminiResponseGenerator:
         ]
         
         # Response cache to speed up repeated queries
-        self.response_cache = {}
-        self.cache_ttl = 3600  # Cache TTL in seconds (1 hour)
-        self.max_cache_size = 500  # Max number of entries in the cache
+        self.response_cache = response_cache or ResponseCache(
+            MemoryCacheBackend(max_items=500), namespace="gemini", ttl_seconds=3600
+        )
+        self.flight = SingleFlight("gemini")
         
     async def load_models(self):
         """Initialize Gemini model"""
@@ -37,11 +181,17 @@ class GeminiResponseGenerator:
             if not self.api_key:
                 raise ValueError("GOOGLE_API_KEY not found in environment variables")
                 
-            # Configure Gemini
-            genai.configure(api_key=self.api_key)
-            
-            # Initialize the model
-            self.model = genai.GenerativeModel(self.model_name)
+            # Pooled async client: calls never block the event loop
+            self.client = GeminiClient(
+                api_key=self.api_key,
+                model_name=self.model_name,
+                base_url=self.api_base_url,
+                max_concurrency=self.max_concurrency,
+                timeout_seconds=self.timeout_seconds,
+                max_retries=self.max_retries,
+                breaker=self.breaker,
+                limiter=self.limiter
+            )
             
             logger.info(f"Gemini model {self.model_name} loaded successfully")
             
@@ -49,57 +199,177 @@ class GeminiResponseGenerator:
             logger.error(f"Failed to load Gemini model: {e}")
             raise
     
-    async def generate_response(self, user_message: str, faq_context: Optional[Dict] = None, conversation_history: Optional[list] = None) -> Dict[str, Any]:
-        """Generate response using Gemini with conversation context"""
+    def upstream_stats(self) -> Dict[str, Any]:
+        """Circuit breaker state and current concurrency limit of the Gemini calls"""
+        return {
+            'circuit_breaker': self.breaker.stats() if self.breaker else None,
+            'concurrency': self.limiter.stats(),
+        }
+    
+    async def close(self):
+        """Close the pooled Gemini connection"""
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+    
+    async def generate_response(self, user_message: str, faq_context: Optional[Dict] = None, conversation_history: Optional[list] = None,
+                                conversation: Optional[ConversationContext] = None) -> Dict[str, Any]:
+        """Generate response using Gemini with conversation context
+        
+        The conversation is either conversation_history as sent by the client or an
+        already rendered conversation (e.g. a server-side session's).
+        """
+        conversation = conversation or ConversationContext.from_history(conversation_history)
         try:
-            if not self.model:
+            if not self.client:
                 await self.load_models()
             
             # Use simple caching to speed up responses for identical questions
-            # Only use cache for messages without conversation history
+            # (in the same conversational context)
             context_info = ""
             if faq_context:
                 context_info = faq_context.get('question', '') + faq_context.get('response', '')
             
-            # Only use cache for simple queries without extensive conversation history
-            should_use_cache = not conversation_history or len(conversation_history) <= 2
+            cache_key = self._create_cache_key(user_message, context_info, conversation)
+            cached_response = await self._get_from_cache(cache_key)
             
-            if should_use_cache:
-                cache_key = self._create_cache_key(user_message, context_info)
-                cached_response = self._get_from_cache(cache_key)
-                
-                if cached_response:
-                    logger.info(f"Cache hit for message: {user_message[:30]}...")
-                    return cached_response
+            if cached_response:
+                logger.info(f"Cache hit for message: {user_message[:30]}...")
+                return cached_response
             
-            # If no cache hit, generate a new response
+            # If no cache hit, generate a new response; identical calls in flight share it
+            return await self.flight.do(
+                cache_key,
+                lambda: self._generate_uncached(user_message, faq_context, conversation, cache_key)
+            )
+            
+        except Exception as e:
+            logger.error(f"Error in Gemini response generation: {e}")
+            GEMINI_FALLBACKS.inc('fallback_response')
+            return await self._fallback_response(user_message)
+    
+    async def _generate_uncached(self, user_message: str, faq_context: Optional[Dict], conversation: ConversationContext, cache_key: Optional[str]) -> Dict[str, Any]:
+        """Classify intent and generate a reply, caching it under cache_key if given"""
+        if self.intent_mode == 'combined':
+            intent, response = await self._generate_combined_response(
+                user_message, faq_context, conversation
+            )
+        elif self.intent_mode == 'local' and self.intent_classifier:
+            # Local classification runs alongside the single Gemini call
+            intent, response = await asyncio.gather(
+                self._classify_intent_locally(user_message),
+                self._generate_contextual_response(
+                    user_message, None, faq_context, conversation
+                )
+            )
+        else:
             # Classify intent
             intent = await self._classify_intent(user_message)
             
             # Generate response with conversation context
             response = await self._generate_contextual_response(
-                user_message, intent, faq_context, conversation_history or []
+                user_message, intent, faq_context, conversation
             )
+        
+        if response is None:
+            # Gemini did not answer (error, open circuit or empty reply): a template reply, never cached
+            return {
+                'intent': intent,
+                'response': self._template_based_response(user_message, intent),
+                'confidence': 0.5,
+                'method': 'fallback'
+            }
+        
+        # Calculate confidence
+        confidence = self._calculate_confidence(user_message, intent, response)
+        
+        result = {
+            'intent': intent,
+            'response': response,
+            'confidence': confidence,
+            'method': 'gemini'
+        }
+        
+        # Cache the response if appropriate
+        if cache_key:
+            self._add_to_cache(cache_key, result)
+        
+        return result
+    
+    async def stream_response(self, user_message: str, faq_context: Optional[Dict] = None, conversation_history: Optional[list] = None,
+                              conversation: Optional[ConversationContext] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a Gemini reply as {'type': 'token'} events followed by one {'type': 'done'} event"""
+        conversation = conversation or ConversationContext.from_history(conversation_history)
+        if not self.client:
+            await self.load_models()
             
-            # Calculate confidence
-            confidence = self._calculate_confidence(user_message, intent, response)
+        context_info = ""
+        if faq_context:
+            context_info = faq_context.get('question', '') + faq_context.get('response', '')
+        
+        cache_key = self._create_cache_key(user_message, context_info, conversation)
+        cached_response = await self._get_from_cache(cache_key)
+        if cached_response:
+            logger.info(f"Cache hit for message: {user_message[:30]}...")
+            yield {'type': 'token', 'text': cached_response['response']}
+            yield {'type': 'done', **cached_response}
+            return
+        
+        # Intent is resolved concurrently; it is only needed for the final event
+        intent_task = asyncio.ensure_future(self._stream_intent(user_message))
+        try:
+            prompt = self._build_prompt(user_message, None, faq_context, conversation)
+            cleaner = IncrementalResponseCleaner(*self._response_limits(user_message))
+            complete = True
             
+            start = time.perf_counter()
+            try:
+                async for chunk in self.client.stream_generate_content(prompt):
+                    text = cleaner.feed(chunk)
+                    if text:
+                        yield {'type': 'token', 'text': text}
+            except Exception as e:
+                _log_gemini_failure("Gemini streaming", e)
+                GEMINI_ERRORS.inc('stream')
+                complete = False
+            STAGE_LATENCY.observe(time.perf_counter() - start, 'gemini_stream')
+                
+            tail = cleaner.finish()
+            if tail:
+                yield {'type': 'token', 'text': tail}
+                
+            intent = await intent_task
+            response = cleaner.text
+            method = 'gemini'
+            if not response:
+                # Nothing was streamed: answer from templates instead
+                response = self._template_based_response(user_message, intent)
+                method = 'fallback'
+                GEMINI_FALLBACKS.inc('template_reply')
+                yield {'type': 'token', 'text': response}
+                
             result = {
                 'intent': intent,
                 'response': response,
-                'confidence': confidence,
-                'method': 'gemini'
+                'confidence': self._calculate_confidence(user_message, intent, response) if method == 'gemini' else 0.5,
+                'method': method
             }
-            
-            # Cache the response if appropriate
-            if should_use_cache:
+            if complete and method == 'gemini':
                 self._add_to_cache(cache_key, result)
+                
+            yield {'type': 'done', **result}
             
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error in Gemini response generation: {e}")
-            return await self._fallback_response(user_message)
+        finally:
+            if not intent_task.done():
+                intent_task.cancel()
+    
+    async def _stream_intent(self, user_message: str) -> str:
+        """Intent for streamed replies, which cannot carry it in a combined completion"""
+        if self.intent_mode == 'separate':
+            return await self._classify_intent(user_message)
+        if self.intent_classifier:
+            return await self._classify_intent_locally(user_message)
+        return self._rule_based_intent(user_message)
     
     async def _classify_intent(self, user_message: str) -> str:
         """Classify user intent using Gemini"""
@@ -113,17 +383,21 @@ class GeminiResponseGenerator:
             Respond with only the intent name (no explanation):
             """
             
-            response = self.model.generate_content(intent_prompt)
-            intent = response.text.strip().lower()
+            with STAGE_LATENCY.time('gemini_classify'):
+                response_text = await self.client.generate_content(intent_prompt)
+            intent = response_text.strip().lower()
             
             # Validate intent
             if intent in self.intent_labels:
                 return intent
             else:
+                GEMINI_FALLBACKS.inc('rule_intent')
                 return self._rule_based_intent(user_message)
                 
         except Exception as e:
-            logger.warning(f"Gemini intent classification failed: {e}")
+            _log_gemini_failure("Gemini intent classification", e)
+            GEMINI_ERRORS.inc('classify')
+            GEMINI_FALLBACKS.inc('rule_intent')
             return self._rule_based_intent(user_message)
     
     def _rule_based_intent(self, user_message: str) -> str:
@@ -146,91 +420,152 @@ class GeminiResponseGenerator:
         else:
             return 'general'
     
-    async def _generate_contextual_response(self, user_message: str, intent: str, faq_context: Optional[Dict], conversation_history: list = None) -> str:
-        """Generate contextual response using Gemini with conversation history"""
+    async def _classify_intent_locally(self, user_message: str) -> str:
+        """Classify intent with the local classifier, falling back to rules"""
         try:
-            if conversation_history is None:
-                conversation_history = []
-                
-            # Build context-aware prompt with dynamic response length
-            if any(keyword in user_message.lower() for keyword in ['code', 'program', 'write', 'script', 'function', 'algorithm', 'example']):
-                # For programming/technical requests, allow longer responses
-                system_prompt = """You are a helpful customer support assistant with technical expertise. 
-                Provide detailed, complete, and helpful responses to customer inquiries. 
-                For code requests, provide complete working examples with explanations.
-                For complex questions, provide thorough step-by-step guidance.
-                Maintain a professional, friendly tone."""
-            else:
-                # For general support, keep responses concise
-                system_prompt = """You are a helpful customer support assistant. 
-                Provide clear, helpful responses to customer inquiries. 
-                Keep responses appropriate to the question complexity.
-                Maintain a professional, friendly tone."""
-            
-            # Build conversation context
-            context_lines = []
-            if faq_context:
-                context_lines.append(f"Related FAQ: {faq_context.get('question', '')} - {faq_context.get('response', '')}")
-            
-            if conversation_history:
-                context_lines.append("\nRecent conversation:")
-                for msg in conversation_history[-6:]:  # Last 6 messages for context
-                    # Handle both dictionary and object formats
-                    if hasattr(msg, 'role') and hasattr(msg, 'content'):
-                        # ConversationMessage object
-                        role = "Customer" if msg.role == 'user' else "Assistant"
-                        content = msg.content[:100] if msg.content else ''  # Truncate long messages
-                    else:
-                        # Dictionary format
-                        role = "Customer" if msg.get('role') == 'user' else "Assistant"
-                        content = msg.get('content', '')[:100]  # Truncate long messages
-                    context_lines.append(f"{role}: {content}")
-            
-            context = "\n".join(context_lines) if context_lines else ""
-            
-            prompt = f"""{system_prompt}
-            
-            Customer Intent: {intent}
+            with STAGE_LATENCY.time('local_classify'):
+                result = await self.intent_classifier(user_message)
+            if result:
+                return result[0]
+        except Exception as e:
+            logger.warning(f"Local intent classification failed: {e}")
+        GEMINI_FALLBACKS.inc('rule_intent')
+        return self._rule_based_intent(user_message)
+    
+    def _build_prompt(self, user_message: str, intent: Optional[str], faq_context: Optional[Dict], conversation: ConversationContext,
+                      response_instruction: str = "Assistant Response:") -> str:
+        """Build the context-aware generation prompt"""
+        # Build context-aware prompt with dynamic response length
+        if any(keyword in user_message.lower() for keyword in ['code', 'program', 'write', 'script', 'function', 'algorithm', 'example']):
+            # For programming/technical requests, allow longer responses
+            system_prompt = """You are a helpful customer support assistant with technical expertise. 
+            Provide detailed, complete, and helpful responses to customer inquiries. 
+            For code requests, provide complete working examples with explanations.
+            For complex questions, provide thorough step-by-step guidance.
+            Maintain a professional, friendly tone."""
+        else:
+            # For general support, keep responses concise
+            system_prompt = """You are a helpful customer support assistant. 
+            Provide clear, helpful responses to customer inquiries. 
+            Keep responses appropriate to the question complexity.
+            Maintain a professional, friendly tone."""
+        
+        # Build conversation context
+        context_lines = []
+        if faq_context:
+            context_lines.append(f"Related FAQ: {faq_context.get('question', '')} - {faq_context.get('response', '')}")
+        
+        if conversation.text:
+            context_lines.append(conversation.text)
+        
+        context = "\n".join(context_lines) if context_lines else ""
+        intent_line = f"Customer Intent: {intent}" if intent else ""
+        
+        return f"""{system_prompt}
+            
+            {intent_line}
             {context}
             
             Current Customer Message: "{user_message}"
             
-            Assistant Response:"""
+            {response_instruction}"""
+    
+    async def _generate_contextual_response(self, user_message: str, intent: Optional[str], faq_context: Optional[Dict], conversation: ConversationContext) -> Optional[str]:
+        """Generate contextual response using Gemini with conversation history; None if Gemini failed"""
+        try:
+            prompt = self._build_prompt(user_message, intent, faq_context, conversation)
             
-            response = self.model.generate_content(prompt)
-            generated_text = response.text.strip()
+            with STAGE_LATENCY.time('gemini_generate'):
+                response_text = await self.client.generate_content(prompt)
+            generated_text = response_text.strip()
             
             # Clean response without aggressive truncation
             return self._clean_response(generated_text, user_message)
             
         except Exception as e:
-            logger.warning(f"Gemini response generation failed: {e}")
-            return self._template_based_response(user_message, intent)
+            _log_gemini_failure("Gemini response generation", e)
+            GEMINI_ERRORS.inc('generate')
+            GEMINI_FALLBACKS.inc('template_reply')
+            return None
+    
+    async def _generate_combined_response(self, user_message: str, faq_context: Optional[Dict], conversation: ConversationContext) -> Tuple[str, Optional[str]]:
+        """Classify intent and generate the reply in a single structured Gemini call; reply None if Gemini gave none"""
+        prompt = self._build_prompt(
+            user_message, None, faq_context, conversation,
+            response_instruction=f"""Respond with a JSON object with exactly two keys:
+            "intent": one of {', '.join(self.intent_labels)}
+            "reply": your response to the customer"""
+        )
+        
+        try:
+            with STAGE_LATENCY.time('gemini_combined'):
+                response_text = await self.client.generate_content(
+                    prompt, generation_config={'responseMimeType': 'application/json'}
+                )
+        except Exception as e:
+            _log_gemini_failure("Gemini combined generation", e)
+            GEMINI_ERRORS.inc('combined')
+            GEMINI_FALLBACKS.inc('template_reply')
+            return self._rule_based_intent(user_message), None
+            
+        intent, reply = self._parse_combined_response(response_text, user_message)
+        return intent, self._clean_response(reply, user_message) if reply else None
+    
+    def _parse_combined_response(self, response_text: str, user_message: str) -> Tuple[str, Optional[str]]:
+        """Validate a combined JSON completion, falling back to rule-based intent"""
+        text = response_text.strip()
+        # Tolerate markdown code fences around the JSON
+        fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+        if fenced:
+            text = fenced.group(1)
+            
+        try:
+            data = json.loads(text)
+            if not isinstance(data, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            logger.warning(f"Could not parse combined Gemini response: {e}")
+            GEMINI_FALLBACKS.inc('rule_intent')
+            # Unstructured text is still a usable reply
+            return self._rule_based_intent(user_message), text
+            
+        intent = str(data.get('intent', '')).strip().lower()
+        if intent not in self.intent_labels:
+            GEMINI_FALLBACKS.inc('rule_intent')
+            intent = self._rule_based_intent(user_message)
+            
+        reply = data.get('reply')
+        if not isinstance(reply, str) or not reply.strip():
+            GEMINI_FALLBACKS.inc('template_reply')
+            return intent, None
+            
+        return intent, reply.strip()
     
     def _clean_response(self, response: str, user_message: str = "") -> str:
         """Clean and format the response"""
         # Remove any unwanted prefixes
-        response = response.replace("Assistant Response:", "").strip()
-        response = response.replace("Response:", "").strip()
+        for prefix in RESPONSE_PREFIXES:
+            response = response.replace(prefix, "").strip()
         
+        max_chars, max_sentences = self._response_limits(user_message)
+        if len(response) > max_chars:
+            # Keep only the first sentences of overly long responses
+            sentences = response.split('.')
+            response = '. '.join(sentences[:max_sentences]) + '.' if len(sentences) > max_sentences else response
+        
+        return response
+    
+    def _response_limits(self, user_message: str) -> Tuple[int, int]:
+        """(max characters, sentences kept when over the limit) for a response"""
         # Check if this is a programming/technical question
         is_technical = any(keyword in user_message.lower() for keyword in 
                           ['code', 'program', 'write', 'script', 'function', 'algorithm', 'example', 'how to'])
         
-        # Apply different length limits based on question type
         if is_technical:
             # Allow much longer responses for technical questions (up to 2000 characters)
-            if len(response) > 2000:
-                # For technical responses, try to keep complete code blocks
-                sentences = response.split('.')
-                response = '. '.join(sentences[:10]) + '.' if len(sentences) > 10 else response
-        else:
-            # For general support, moderate limit (up to 500 characters)
-            if len(response) > 500:
-                sentences = response.split('.')
-                response = '. '.join(sentences[:3]) + '.' if len(sentences) > 3 else response
-        
-        return response
+            return 2000, 10
+        # For general support, moderate limit (up to 500 characters)
+        return 500, 3
     
     def _template_based_response(self, user_message: str, intent: str) -> str:
         """Generate intelligent template-based responses as fallback"""
@@ -355,6 +690,16 @@ Could you provide more specific details about what you'd like to code?"""
             
         return min(confidence, 0.95)  # Cap at 95%
     
+    def local_response(self, user_message: str) -> Dict[str, Any]:
+        """Rule-based intent and template reply, for answering without waiting for Gemini"""
+        intent = self._rule_based_intent(user_message)
+        return {
+            'intent': intent,
+            'response': self._template_based_response(user_message, intent),
+            'confidence': 0.5,
+            'method': 'template'
+        }
+    
     async def _fallback_response(self, user_message: str) -> Dict[str, Any]:
         """Ultimate fallback response"""
         return {
@@ -364,37 +709,15 @@ Could you provide more specific details about what you'd like to code?"""
             'method': 'fallback'
         }
         
-    def _create_cache_key(self, user_message: str, context_info: str = "") -> str:
-        """Create a cache key from the user message and context"""
-        # Normalize the input text
-        normalized_message = user_message.lower().strip()
-        combined_str = f"{normalized_message}|{context_info}"
-        
-        # Create a hash of the message
-        return hashlib.md5(combined_str.encode('utf-8')).hexdigest()
+    def _create_cache_key(self, user_message: str, context_info: str = "",
+                          conversation: ConversationContext = EMPTY_CONTEXT) -> str:
+        """Create a cache key from the user message, the FAQ context and the conversation the prompt shows"""
+        return message_key(user_message, f"{context_info}|{conversation.key}")
     
-    def _get_from_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
+    async def _get_from_cache(self, cache_key: str) -> Optional[Dict[str, Any]]:
         """Get a response from cache if it exists and is not expired"""
-        if cache_key not in self.response_cache:
-            return None
-        
-        cached_item = self.response_cache[cache_key]
-        timestamp, response = cached_item
-        
-        # Check if the cache entry has expired
-        if time.time() - timestamp > self.cache_ttl:
-            del self.response_cache[cache_key]
-            return None
-            
-        return response
+        return await self.response_cache.get_async(cache_key)
     
     def _add_to_cache(self, cache_key: str, response: Dict[str, Any]) -> None:
         """Add a response to the cache"""
-        # If cache is full, remove the oldest entry
-        if len(self.response_cache) >= self.max_cache_size:
-            oldest_key = min(self.response_cache.keys(), 
-                           key=lambda k: self.response_cache[k][0])
-            del self.response_cache[oldest_key]
-        
-        # Add the new entry with current timestamp
-        self.response_cache[cache_key] = (time.time(), response)
\ No newline at end of file
+        self.response_cache.put_soon(cache_key, response)
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Any, Dict, Optional
+
+import numpy as np
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout or the way indexes are built changes
+CACHE_VERSION = 2
+
+VECTORIZER_FILE = "tfidf_vectorizer.pkl"
+TFIDF_MATRIX_FILE = "tfidf_matrix.npz"
+EMBEDDINGS_FILE = "embeddings.npy"
+META_FILE = "meta.json"
+
+
+class IndexCache:
+    """Versioned on-disk cache for the fitted TF-IDF vectorizer, TF-IDF matrix and embeddings"""
+
+    def __init__(self, cache_dir: str = ".index_cache"):
+        self.cache_dir = os.path.join(cache_dir, f"v{CACHE_VERSION}")
+
+    @staticmethod
+    def make_key(content_digest: str, model_name: str, vectorizer_params: Optional[Dict] = None) -> str:
+        """Hash of the knowledge base content digest, model name and vectorizer settings"""
+        digest = hashlib.sha256()
+        digest.update(content_digest.encode('utf-8'))
+        digest.update(b"\0" + model_name.encode('utf-8'))
+        if vectorizer_params:
+            digest.update(b"\0" + repr(sorted(vectorizer_params.items())).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str) -> Dict[str, Any]:
+        """Load whatever parts of the index exist for key (embeddings are memory-mapped)"""
+        entry_dir = self._entry_dir(key)
+        parts: Dict[str, Any] = {}
+        if not os.path.isdir(entry_dir):
+            return parts
+
+        try:
+            vectorizer_path = os.path.join(entry_dir, VECTORIZER_FILE)
+            matrix_path = os.path.join(entry_dir, TFIDF_MATRIX_FILE)
+            if os.path.exists(vectorizer_path) and os.path.exists(matrix_path):
+                with open(vectorizer_path, 'rb') as f:
+                    parts['vectorizer'] = pickle.load(f)
+                parts['tfidf_matrix'] = sparse.load_npz(matrix_path).tocsr()
+
+            embeddings_path = os.path.join(entry_dir, EMBEDDINGS_FILE)
+            if os.path.exists(embeddings_path):
+                # Copy-on-write mapping: zero-copy reads, private pages if ever written
+                parts['embeddings'] = np.load(embeddings_path, mmap_mode='c')
+
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable index cache entry {key[:12]}: {e}")
+            return {}
+
+        return parts
+
+    def save(self, key: str, vectorizer=None, tfidf_matrix=None, embeddings: Optional[np.ndarray] = None):
+        """Write index parts for key; each file is written to a temp path and renamed atomically"""
+        entry_dir = self._entry_dir(key)
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+
+            if vectorizer is not None and tfidf_matrix is not None:
+                self._atomic_write(entry_dir, VECTORIZER_FILE, lambda f: pickle.dump(vectorizer, f, protocol=pickle.HIGHEST_PROTOCOL))
+                self._atomic_write(entry_dir, TFIDF_MATRIX_FILE, lambda f: sparse.save_npz(f, sparse.csr_matrix(tfidf_matrix)))
+
+            if embeddings is not None:
+                embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+                self._atomic_write(entry_dir, EMBEDDINGS_FILE, lambda f: np.save(f, embeddings))
+
+            meta = {'version': CACHE_VERSION, 'key': key}
+            self._atomic_write(entry_dir, META_FILE, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+        except Exception as e:
+            logger.warning(f"Failed to write index cache entry {key[:12]}: {e}")
+
+    def prune(self, keep_key: str):
+        """Remove cache entries other than keep_key"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name != keep_key:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    @staticmethod
+    def _atomic_write(directory: str, filename: str, writer):
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{filename}.")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer(f)
+            os.replace(tmp_path, os.path.join(directory, filename))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
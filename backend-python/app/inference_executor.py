@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFullError(RuntimeError):
+    """Raised when the inference queue is at capacity"""
+
+
+class InferenceExecutor:
+    """Bounded thread pool that keeps CPU-bound model work off the asyncio event loop"""
+
+    def __init__(self, max_workers: int = 2, max_queue_size: int = 64, torch_threads: int = 0):
+        self.max_workers = max(1, max_workers)
+        self.max_queue_size = max(1, max_queue_size)
+
+        # torch releases the GIL during forward passes, so threads run inference in parallel;
+        # intra-op threads are capped so workers don't oversubscribe the CPU
+        if torch_threads > 0:
+            import torch  # deferred: only needed when capping threads
+            torch.set_num_threads(torch_threads)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._pending = 0  # submitted and not finished (queued + running)
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn on the inference pool, rejecting the call if the queue is full"""
+        with self._lock:
+            if self._pending >= self.max_queue_size:
+                self._rejected += 1
+                raise InferenceQueueFullError(f"Inference queue full ({self._pending} pending)")
+            self._pending += 1
+
+        submitted_at = time.perf_counter()
+
+        def job():
+            wait = time.perf_counter() - submitted_at
+            with self._lock:
+                self._running += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and wait-time statistics"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'max_queue_size': self.max_queue_size,
+                'queue_depth': self._pending - self._running,
+                'running': self._running,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'avg_wait_ms': round(1000 * self._total_wait / self._completed, 3) if self._completed else 0.0,
+                'max_wait_ms': round(1000 * self._max_wait, 3),
+            }
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
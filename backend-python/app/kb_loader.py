@@ -0,0 +1,180 @@
+import csv
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# CSV knowledge bases have one keywords column, with keywords separated by semicolons
+CSV_REQUIRED_COLUMNS = ('question', 'response', 'intent')
+CSV_KEYWORD_SEPARATOR = ';'
+
+# Only the first few rejected rows are logged individually
+MAX_REPORTED_ERRORS = 10
+
+
+class KnowledgeBaseFormatError(ValueError):
+    """Raised when a knowledge base file cannot be read"""
+
+
+def faq_key(question: str) -> str:
+    """Identity of an FAQ entry: its question, case-insensitively"""
+    return question.lower().strip()
+
+
+def validate_faq(entry: Any) -> Dict[str, Any]:
+    """Check an FAQ entry has the required fields and return a clean copy"""
+    if not isinstance(entry, dict):
+        raise ValueError("FAQ entry must be an object")
+    faq = {}
+    for field in ('question', 'response', 'intent'):
+        value = entry.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"FAQ entry field '{field}' must be a non-empty string")
+        faq[field] = value.strip()
+    keywords = entry.get('keywords', [])
+    if not isinstance(keywords, list) or not all(isinstance(keyword, str) for keyword in keywords):
+        raise ValueError("FAQ entry field 'keywords' must be a list of strings")
+    faq['keywords'] = keywords
+    return faq
+
+
+def detect_format(path: str) -> str:
+    """Knowledge base format from the file extension: json, jsonl or csv"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.csv':
+        return 'csv'
+    return 'json'
+
+
+class KnowledgeBaseReader:
+    """Streams validated FAQ entries from a JSON, JSON Lines or CSV file in chunks
+
+    JSON Lines and CSV are parsed row by row, so only one chunk of raw rows is in
+    memory at a time; a JSON array has to be parsed whole. Invalid rows and
+    repeated questions are skipped and counted, or raise with strict=True.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 10000, strict: bool = False):
+        self.path = path
+        self.format = detect_format(path)
+        self.chunk_size = max(1, chunk_size)
+        self.strict = strict
+        self.rows = 0
+        self.skipped = 0
+        self.errors: List[str] = []
+        self._seen: Set[str] = set()
+
+    def chunks(self) -> Iterator[List[Dict[str, Any]]]:
+        """Yield lists of up to chunk_size validated entries, in file order"""
+        chunk = []
+        for row_number, entry in self._rows():
+            self.rows += 1
+            try:
+                faq = validate_faq(entry)
+            except ValueError as e:
+                self._reject(row_number, str(e))
+                continue
+
+            key = faq_key(faq['question'])
+            if key in self._seen:
+                self._reject(row_number, f"duplicate question '{faq['question'][:80]}'")
+                continue
+            self._seen.add(key)
+
+            chunk.append(faq)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    def read_all(self) -> List[Dict[str, Any]]:
+        entries = []
+        for chunk in self.chunks():
+            entries.extend(chunk)
+        return entries
+
+    def _rows(self) -> Iterator[Tuple[int, Any]]:
+        if self.format == 'jsonl':
+            return self._jsonl_rows()
+        if self.format == 'csv':
+            return self._csv_rows()
+        return self._json_rows()
+
+    def _json_rows(self) -> Iterator[Tuple[int, Any]]:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise KnowledgeBaseFormatError(f"{self.path}: expected a JSON array of FAQ entries")
+        for index, entry in enumerate(entries):
+            yield index + 1, entry
+
+    def _jsonl_rows(self) -> Iterator[Tuple[int, Any]]:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    self.rows += 1
+                    self._reject(line_number, f"invalid JSON: {e}")
+                    continue
+                yield line_number, entry
+
+    def _csv_rows(self) -> Iterator[Tuple[int, Any]]:
+        with open(self.path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            missing = [column for column in CSV_REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise KnowledgeBaseFormatError(f"{self.path}: missing CSV columns {', '.join(missing)}")
+
+            for row in reader:
+                keywords = row.get('keywords') or ''
+                yield reader.line_num, {
+                    'question': row['question'],
+                    'response': row['response'],
+                    'intent': row['intent'],
+                    'keywords': [keyword.strip() for keyword in keywords.split(CSV_KEYWORD_SEPARATOR) if keyword.strip()],
+                }
+
+    def _reject(self, row_number: int, reason: str):
+        message = f"{self.path} row {row_number}: {reason}"
+        if self.strict:
+            raise KnowledgeBaseFormatError(message)
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+            logger.warning(f"Skipping knowledge base row: {message}")
+
+
+def write_knowledge_base(path: str, entries: Iterable[Mapping[str, Any]]):
+    """Write entries in the format implied by path, replacing the file atomically"""
+    file_format = detect_format(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            if file_format == 'jsonl':
+                for faq in entries:
+                    f.write(json.dumps(dict(faq), ensure_ascii=False) + "\n")
+            elif file_format == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(CSV_REQUIRED_COLUMNS + ('keywords',))
+                for faq in entries:
+                    writer.writerow([faq['question'], faq['response'], faq['intent'],
+                                     CSV_KEYWORD_SEPARATOR.join(faq.get('keywords', []))])
+            else:
+                json.dump([dict(faq) for faq in entries], f, indent=2)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
@@ -0,0 +1,84 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .faq_store import FAQStore
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def keyword_terms(text: str) -> List[str]:
+    """Lowercased word tokens; keywords and messages are compared on these"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class KeywordMatch:
+    """Entries sharing at least one keyword with a message, with how many they share"""
+
+    __slots__ = ('ids', 'hits')
+
+    def __init__(self, ids: np.ndarray, hits: np.ndarray):
+        self.ids = ids
+        self.hits = hits
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def best(self) -> Tuple[Optional[int], int, int]:
+        """Return (entry, hits, runner-up hits) for the entry matching the most keywords"""
+        if not len(self.ids):
+            return None, 0, 0
+        order = np.argsort(self.hits, kind='stable')[::-1][:2]
+        runner_up = int(self.hits[order[1]]) if len(order) > 1 else 0
+        return int(self.ids[order[0]]), int(self.hits[order[0]]), runner_up
+
+    def top(self, k: int) -> np.ndarray:
+        """Ids of the k entries matching the most keywords, best first"""
+        return self.ids[np.argsort(self.hits, kind='stable')[::-1][:k]]
+
+
+class KeywordIndex:
+    """Inverted index from FAQ keywords to the entries listing them
+
+    Keywords may be phrases ("money back"); a message matches one when the
+    phrase's tokens appear consecutively. Looking up a message only reads the
+    postings of the keywords it contains.
+    """
+
+    def __init__(self, store: FAQStore):
+        # Keywords that normalize to the same terms share one posting list
+        self.terms: Dict[str, int] = {}
+        term_of_code = np.empty(len(store.keyword_names), dtype=np.int64)
+        for code, keyword in enumerate(store.keyword_names):
+            term_of_code[code] = self.terms.setdefault(" ".join(keyword_terms(keyword)), len(self.terms))
+        term_count = len(self.terms)
+        self.terms.pop("", None)
+        self.max_phrase_length = max((term.count(" ") + 1 for term in self.terms), default=0)
+
+        # (term, entry) pairs, deduplicated and grouped by term
+        keyword_offsets = np.asarray(store.keyword_offsets, dtype=np.int64)
+        entries = np.repeat(np.arange(len(store), dtype=np.int64), np.diff(keyword_offsets))
+        pairs = np.unique(np.stack([term_of_code[store.keyword_codes.astype(np.int64)], entries]), axis=1)
+        self.entries = pairs[1].astype(np.min_scalar_type(max(len(store), 1)))
+        counts = np.bincount(pairs[0], minlength=term_count)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.entries.nbytes + self.offsets.nbytes
+
+    def match(self, message: str) -> KeywordMatch:
+        tokens = keyword_terms(message)
+        found = set()
+        for length in range(1, self.max_phrase_length + 1):
+            for start in range(len(tokens) - length + 1):
+                term = self.terms.get(" ".join(tokens[start:start + length]))
+                if term is not None:
+                    found.add(term)
+
+        if not found:
+            return KeywordMatch(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        postings = np.concatenate([self.entries[self.offsets[term]:self.offsets[term + 1]] for term in found])
+        ids, hits = np.unique(postings, return_counts=True)
+        return KeywordMatch(ids, hits)
@@ -1,20 +1,34 @@
-from fastapi import FastAPI, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import Depends, FastAPI, Header, HTTPException
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Annotated, Awaitable, Callable, Optional, Dict, Any, List, Literal, Tuple
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
 import uvicorn
 import os
-import time
-import hashlib
 import json
-from collections import OrderedDict
-import threading
+import secrets
+import signal
+from importlib import import_module
 
-from .faq_matcher import FAQMatcher
+from .cache import MemoryCacheBackend, ResponseCache, create_cache_backend, offload
+from .cache_keys import message_key as message_cache_key
+from .circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from .deadline import Deadline
+from .faq_matcher import FAQMatcher, faq_key
+from .inference_executor import InferenceQueueFullError
+from .metrics import HEDGED_GEMINI_CALLS, REGISTRY, REQUEST_LATENCY, RESPONSES, STAGE_LATENCY, TIER_LATENCY
+from .semantic_cache import SemanticCache
+from .sessions import EMPTY_CONTEXT, ConversationContext, Session, SessionStore
+from .single_flight import SingleFlight
+from .startup import FAILED, LOADING, PENDING, READY, StartupTracker
 from .gemini_response import GeminiResponseGenerator  # Use Gemini instead
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -24,87 +38,208 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Startup phases and component states, for the liveness and readiness probes
+startup = StartupTracker(started=_import_started)
+startup.record("import", time.perf_counter() - _import_started)
+
+# Serve TF-IDF matches while the semantic model loads in the background, instead of
+# starting only once it is loaded
+lazy_model_loading = os.getenv("LAZY_MODEL_LOADING", "true").lower() == "true"
+readiness_requires_semantic = os.getenv("READINESS_REQUIRES_SEMANTIC", "false").lower() == "true"
+
 # Global variables for models
 faq_matcher = None
 llm_generator = None
+semantic_cache = None
 
-# Simple LRU Cache for /analyze endpoint
-class ResponseCache:
-    def __init__(self, max_size=100, ttl_seconds=3600):
-        self.cache = OrderedDict()
-        self.max_size = max_size
-        self.ttl_seconds = ttl_seconds
-        self.lock = threading.RLock()
-        
+# Set by app.serve in forked workers: a matcher loaded once in the parent process
+preloaded_faq_matcher: Optional[FAQMatcher] = None
+
+# Set by app.serve in forked workers: has every worker re-read the knowledge base file (SIGHUP)
+notify_knowledge_base_changed: Optional[Callable[[], None]] = None
+
+# Response cache for /analyze endpoint, sharing one backend with the Gemini generator cache
+class AnalyzeCache(ResponseCache):
     def get(self, key):
-        """Get item from cache if it exists and is not expired"""
-        with self.lock:
-            if key not in self.cache:
-                return None
-                
-            value, timestamp = self.cache[key]
-            
-            # Check if expired
-            if time.time() - timestamp > self.ttl_seconds:
-                del self.cache[key]
-                return None
-                
-            # Move to end to mark as recently used
-            self.cache.move_to_end(key)
-            return value
-            
-    def put(self, key, value):
-        """Add item to cache with current timestamp"""
-        with self.lock:
-            if key in self.cache:
-                del self.cache[key]
-                
-            # If cache is full, remove oldest item
-            if len(self.cache) >= self.max_size:
-                self.cache.popitem(last=False)
-                
-            self.cache[key] = (value, time.time())
+        """Get cached AnalyzeResponse if it exists and is not expired"""
+        value = super().get(key)
+        return AnalyzeResponse(**{**value, 'tier': 'cache'}) if value else None
+        
+    def put(self, key, value, tags=()):
+        """Add AnalyzeResponse to cache"""
+        super().put(key, value.model_dump(), tags)
             
-    def create_key(self, request_data):
-        """Create cache key from request data"""
-        # For simplicity, we only cache requests with no conversation history
-        # or with very short conversation history
-        if len(request_data.conversation_history or []) > 2:
+    def create_key(self, message: str, conversation: ConversationContext):
+        """Create cache key for a message and the conversation its prompt shows"""
+        if not cache_enabled:
             return None
             
-        key_str = request_data.message.lower().strip()
-        return hashlib.md5(key_str.encode('utf-8')).hexdigest()
+        return message_cache_key(message, conversation.key)
+        
+    def message_key(self, message: str):
+        """Cache key of a message sent without conversation history"""
+        return self.create_key(message, EMPTY_CONTEXT)
             
 # Initialize response cache with configurable settings from environment variables
 cache_enabled = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
-cache_max_size = int(os.getenv("MAX_CACHE_ITEMS", "200"))
 cache_ttl = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # Default 1 hour TTL
 
-response_cache = ResponseCache(max_size=cache_max_size, ttl_seconds=cache_ttl)
+cache_backend = create_cache_backend()
+response_cache = AnalyzeCache(cache_backend, namespace="analyze", ttl_seconds=cache_ttl)
+
+# Coalesces concurrent identical /analyze requests into one computation
+analyze_flight = SingleFlight("analyze")
+
+# Server-side conversation sessions: a request with a conversation_id sends only its new message.
+# Sessions live in their own bounded in-process LRU, or with SESSION_BACKEND=shared in the
+# response cache backend (e.g. Redis, so that every worker sees them)
+session_shared = os.getenv("SESSION_BACKEND", "memory").lower() == "shared"
+session_store = SessionStore(
+    cache_backend if session_shared else MemoryCacheBackend(
+        max_items=int(os.getenv("SESSION_MAX_COUNT", "10000")),
+        max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(32 * 1024 * 1024)))
+    ),
+    ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "1800")),
+    window_messages=int(os.getenv("SESSION_WINDOW_MESSAGES", "6")),
+    shared_backend=session_shared
+)
+
+# Latency budget of an /analyze request (0 = none), unless the request sets deadline_ms. Gemini
+# gets what is left minus the reserve; if it has not answered by then, the best FAQ candidate or
+# a template answer goes out and Gemini's answer fills the cache once it arrives
+analyze_deadline_ms = float(os.getenv("ANALYZE_DEADLINE_MS", "0"))
+hedge_reserve_ms = float(os.getenv("ANALYZE_HEDGE_RESERVE_MS", "100"))
+
+# Gemini calls still running for requests that were already answered
+hedged_gemini_calls: set = set()
+
+# /analyze/batch: request size limit, and Gemini calls in flight per batch, leaving the
+# rest of GEMINI_MAX_CONCURRENCY to interactive traffic
+batch_max_messages = int(os.getenv("BATCH_MAX_MESSAGES", "10000"))
+batch_gemini_concurrency = max(1, int(os.getenv("BATCH_GEMINI_CONCURRENCY", "4")))
+
+# Semantic cache tier: answers paraphrases of previously answered queries
+semantic_cache_enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+
+# Runtime knowledge base updates: admin API (enabled by setting ADMIN_API_KEY) and file watching
+admin_api_key = os.getenv("ADMIN_API_KEY")
+kb_watch_enabled = os.getenv("KB_WATCH_ENABLED", "false").lower() == "true"
+kb_watch_interval = float(os.getenv("KB_WATCH_INTERVAL_SECONDS", "2"))
+kb_invalidation_similarity = float(os.getenv("KB_INVALIDATION_SIMILARITY", "0.6"))
+
+# Cached answers are tagged with the FAQ they came from; Gemini answers also get
+# FALLBACK_TAG, since a new or reworded FAQ may now answer those queries directly
+FALLBACK_TAG = "fallback"
+
+def _faq_tag(question: str) -> str:
+    return f"faq:{faq_key(question)}"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize models on startup and cleanup on shutdown"""
+    """Start the service and its background warm-up; cleanup on shutdown"""
     global faq_matcher, llm_generator
     
-    logger.info("Loading AI models...")
+    background_tasks = []
+    logger.info("Starting AI service...")
     try:
         # Initialize FAQ matcher
-        faq_matcher = FAQMatcher()
-        await faq_matcher.load_knowledge_base()
+        if preloaded_faq_matcher is not None:
+            # Model weights and indexes were loaded before the fork and are shared copy-on-write
+            faq_matcher = preloaded_faq_matcher
+            startup.set_state("knowledge_base", READY)
+            startup.set_state("semantic_model", READY if faq_matcher.semantic_ready else FAILED)
+            _enable_semantic_cache()
+            if notify_knowledge_base_changed is not None:
+                # Other workers' admin updates arrive as SIGHUP; catch up on any saved before this worker started
+                asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _sync_knowledge_base_file, background_tasks)
+                _sync_knowledge_base_file(background_tasks)
+        else:
+            faq_matcher = FAQMatcher(os.getenv("KNOWLEDGE_BASE_PATH", "app/knowledge_base.json"))
         
         # Initialize Gemini response generator
-        llm_generator = GeminiResponseGenerator()
+        startup.set_state("gemini", LOADING)
+        llm_generator = GeminiResponseGenerator(
+            intent_classifier=faq_matcher.classify_intent,
+            response_cache=ResponseCache(cache_backend, namespace="gemini", ttl_seconds=cache_ttl)
+        )
         await llm_generator.load_models()
+        startup.set_state("gemini", READY)
         
-        logger.info("All models loaded successfully!")
+        if lazy_model_loading:
+            background_tasks.append(asyncio.create_task(_warm_up(background_tasks)))
+        else:
+            await _warm_up(background_tasks)
+            if startup.state("knowledge_base") == FAILED:
+                raise RuntimeError("Knowledge base could not be loaded")
+        
+        startup.record("accepting_traffic", startup.uptime())
         yield
         
     except Exception as e:
-        logger.error(f"Failed to load models: {e}")
+        logger.error(f"Failed to start AI service: {e}")
         raise
     finally:
         logger.info("Shutting down AI service...")
+        for task in background_tasks + list(hedged_gemini_calls):
+            task.cancel()
+        if faq_matcher:
+            faq_matcher.inference_executor.shutdown()
+        if llm_generator:
+            await llm_generator.close()
+        cache_backend.close()
+
+async def _warm_up(background_tasks: list):
+    """Load the knowledge base (TF-IDF and keyword indexes), then the semantic model and embeddings
+    
+    Requests are answered from the TF-IDF path as soon as the knowledge base is
+    ready; semantic matching and the semantic cache switch on once the model is.
+    """
+    if startup.state("knowledge_base") == PENDING:
+        startup.set_state("knowledge_base", LOADING)
+        try:
+            with startup.phase("knowledge_base"):
+                await faq_matcher.load_knowledge_base(load_semantic=False)
+        except Exception as e:
+            logger.error(f"Failed to load knowledge base: {e}")
+            startup.set_state("knowledge_base", FAILED, str(e))
+            return
+        startup.set_state("knowledge_base", READY)
+        
+    if kb_watch_enabled:
+        background_tasks.append(asyncio.create_task(
+            faq_matcher.watch_knowledge_base(kb_watch_interval, on_change=_invalidate_knowledge_base_caches)
+        ))
+        
+    if startup.state("semantic_model") == PENDING:
+        startup.set_state("semantic_model", LOADING)
+        try:
+            with startup.phase("import_embeddings"):
+                # torch and transformers, timed apart from reading the weights
+                await asyncio.to_thread(import_module, ".embeddings", __package__)
+            with startup.phase("semantic_model"):
+                await faq_matcher.load_semantic_model()
+            with startup.phase("semantic_index"):
+                # Requests admitted during warm-up share the inference queue; a full one is waited out
+                await _when_inference_queue_allows("semantic index build", faq_matcher.build_semantic_index)
+        except Exception as e:
+            logger.warning(f"Failed to load semantic model, matching with TF-IDF only: {e}")
+            startup.set_state("semantic_model", FAILED, str(e))
+            return
+        _enable_semantic_cache()
+        startup.set_state("semantic_model", READY)
+        logger.info("All models loaded successfully!")
+
+def _enable_semantic_cache():
+    """Create the semantic cache once FAQ embeddings exist (its dimension is the model's)"""
+    global semantic_cache
+    if semantic_cache_enabled and semantic_cache is None and faq_matcher.semantic_embeddings is not None:
+        semantic_cache = SemanticCache(
+            dim=faq_matcher.semantic_embeddings.shape[1],
+            max_items=int(os.getenv("SEMANTIC_CACHE_MAX_ITEMS", "5000")),
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            ttl_seconds=int(os.getenv("SEMANTIC_CACHE_TTL", str(cache_ttl))),
+            audit_rate=float(os.getenv("SEMANTIC_CACHE_AUDIT_RATE", "0.05"))
+        )
 
 # FastAPI app with lifespan management
 app = FastAPI(
@@ -134,12 +269,39 @@ class ConversationMessage(BaseModel):
 class AnalyzeRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=1000, description="User message to analyze")
     conversation_history: Optional[list[ConversationMessage]] = Field(default=[], description="Recent conversation history for context")
+    conversation_id: Optional[str] = Field(default=None, pattern=r"^[A-Za-z0-9_.:-]{1,128}$", description="Server-side session to continue (or start, seeded with conversation_history); replaces sending the history")
+    deadline_ms: Optional[int] = Field(default=None, ge=1, le=120000, description="Latency budget in milliseconds; defaults to ANALYZE_DEADLINE_MS")
 
 class AnalyzeResponse(BaseModel):
     intent: str = Field(..., description="Detected intent category")
     reply: str = Field(..., description="Generated response")
     confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score")
-    source: str = Field(..., description="Response source: 'faq' or 'gemini'")
+    source: str = Field(..., description="Response source: 'faq', 'gemini' or 'fallback'")
+    conversation_id: Optional[str] = Field(default=None, description="Session the turn was recorded in, if the request named one")
+    tier: Optional[str] = Field(default=None, description="Tier that answered: 'cache', 'semantic_cache', 'faq', 'gemini', 'fallback' (Gemini failed), or when the deadline ran out first 'faq_candidate' or 'template'")
+
+class BatchAnalyzeRequest(BaseModel):
+    messages: List[Annotated[str, Field(min_length=1, max_length=1000)]] = Field(..., min_length=1, description="Messages to analyze, each without conversation history")
+    order: Literal["input", "completion"] = Field(default="input", description="Stream results in input order, or as soon as each is ready")
+
+class FAQEntry(BaseModel):
+    question: str = Field(..., min_length=1, description="FAQ question, also the entry's identity (case-insensitive)")
+    response: str = Field(..., min_length=1, description="Answer returned for matching messages")
+    intent: str = Field(..., min_length=1, description="Intent category")
+    keywords: List[str] = Field(default=[], description="Keywords for the entry")
+
+class KnowledgeBaseUpdate(BaseModel):
+    upsert: List[FAQEntry] = Field(default=[], description="Entries to add, or to update when the question exists")
+    delete: List[str] = Field(default=[], description="Questions of entries to delete")
+
+class KnowledgeBaseUpdateResponse(BaseModel):
+    version: int = Field(..., description="Knowledge base version after the update")
+    entries: int = Field(..., description="Number of FAQ entries after the update")
+    added: List[str]
+    updated: List[str]
+    deleted: List[str]
+    reembedded: int = Field(..., description="Number of questions that had to be embedded")
+    invalidated: int = Field(..., description="Number of cached responses dropped")
 
 @app.get("/")
 async def root():
@@ -151,77 +313,672 @@ async def health_check():
     """Detailed health check"""
     return {
         "status": "healthy",
-        "models_loaded": faq_matcher is not None and llm_generator is not None,
+        "models_loaded": startup.is_ready("knowledge_base", "semantic_model", "gemini"),
+        "startup": startup.snapshot(),
         "faq_entries": len(faq_matcher.knowledge_base) if faq_matcher else 0,
-        "gemini_api_configured": os.getenv('GOOGLE_API_KEY') is not None
+        "knowledge_base_version": faq_matcher.version if faq_matcher else None,
+        "gemini_api_configured": os.getenv('GOOGLE_API_KEY') is not None,
+        "inference": faq_matcher.inference_executor.stats() if faq_matcher else None,
+        "micro_batching": faq_matcher.micro_batcher.stats() if faq_matcher and faq_matcher.micro_batcher else None,
+        "matching": faq_matcher.match_stats() if faq_matcher else None,
+        "coalescing": [analyze_flight.stats()] + ([llm_generator.flight.stats()] if llm_generator else []),
+        "gemini_upstream": llm_generator.upstream_stats() if llm_generator else None,
+        "sessions": await offload(session_store.backend, session_store.stats),
+        "cache": {
+            "backend": await offload(cache_backend, cache_backend.stats),
+            "tiers": [response_cache.stats()]
+                + ([semantic_cache.stats()] if semantic_cache else [])
+                + ([llm_generator.response_cache.stats()] if llm_generator else [])
+        }
+    }
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and its event loop is responsive"""
+    return {"status": "alive", "uptime_seconds": round(startup.uptime(), 3)}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: 200 once requests can be answered, 503 before
+    
+    The semantic model is not required unless READINESS_REQUIRES_SEMANTIC is set;
+    until it is loaded, answers come from TF-IDF matching and "degraded" is true.
+    An open Gemini circuit also only degrades answers (to FAQ and template replies).
+    """
+    required = ("knowledge_base", "gemini") + (("semantic_model",) if readiness_requires_semantic else ())
+    ready = startup.is_ready(*required)
+    circuit = _gemini_circuit_state()
+    body = {
+        "ready": ready,
+        "degraded": not startup.is_ready("semantic_model") or circuit not in (None, CLOSED),
+        "gemini_circuit": circuit,
+        "components": startup.component_states(),
     }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+def _gemini_circuit_state() -> Optional[str]:
+    return llm_generator.breaker.state if llm_generator and llm_generator.breaker else None
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics of this process: stage latencies, cache tiers, answer sources, Gemini errors"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def _collect_metrics():
+    """Scrape-time metrics read from the stats the components already keep"""
+    tiers = [response_cache.stats()] + ([semantic_cache.stats()] if semantic_cache else []) \
+        + ([llm_generator.response_cache.stats()] if llm_generator else [])
+    yield "cache_hits_total", "counter", "Cache hits by tier", [({"tier": t["namespace"]}, t["hits"]) for t in tiers]
+    yield "cache_misses_total", "counter", "Cache misses by tier", [({"tier": t["namespace"]}, t["misses"]) for t in tiers]
+    yield "cache_hit_ratio", "gauge", "Hits over lookups by tier", [
+        ({"tier": t["namespace"]}, t["hits"] / (t["hits"] + t["misses"]) if t["hits"] + t["misses"] else 0.0) for t in tiers
+    ]
+    yield "hedged_gemini_calls_in_flight", "gauge", "Gemini calls still running for requests already answered", [
+        ({}, len(hedged_gemini_calls))
+    ]
+    if llm_generator:
+        upstream = llm_generator.upstream_stats()
+        breaker = upstream["circuit_breaker"]
+        if breaker:
+            yield "gemini_circuit_state", "gauge", "1 for the Gemini circuit breaker's current state", [
+                ({"state": state}, float(breaker["state"] == state)) for state in (CLOSED, OPEN, HALF_OPEN)
+            ]
+            yield "gemini_circuit_opened_total", "counter", "Times the Gemini circuit opened", [({}, breaker["opened"])]
+            yield "gemini_circuit_rejected_total", "counter", "Gemini calls failed fast by the open circuit", [({}, breaker["rejected"])]
+        concurrency = upstream["concurrency"]
+        yield "gemini_concurrency_limit", "gauge", "Current adaptive limit on concurrent Gemini calls", [({}, concurrency["limit"])]
+        yield "gemini_in_flight", "gauge", "Gemini calls in flight", [({}, concurrency["in_flight"])]
+    yield "startup_component_ready", "gauge", "1 when a component is ready", [
+        ({"component": component}, float(entry["state"] == READY)) for component, entry in startup.components.items()
+    ]
+    if faq_matcher:
+        match_stats = faq_matcher.match_stats()
+        yield "faq_match_stage_total", "counter", "FAQ lookups answered by each matching stage", [
+            ({"stage": stage}, count) for stage, count in match_stats["stages"].items()
+        ]
+        yield "faq_semantic_skipped_total", "counter", "Lookups whose semantic stage was skipped for lack of time", [
+            ({}, match_stats["semantic_skipped"])
+        ]
+        inference = faq_matcher.inference_executor.stats()
+        yield "inference_queue_depth", "gauge", "Inference jobs waiting for a worker", [({}, inference["queue_depth"])]
+        yield "inference_rejected_total", "counter", "Inference jobs rejected with a full queue", [({}, inference["rejected"])]
 
-@app.post("/analyze", response_model=AnalyzeResponse)
+REGISTRY.register_collector(_collect_metrics)
+
+def require_knowledge_base():
+    """Refuse requests until the knowledge base is loaded"""
+    if startup.state("knowledge_base") != READY:
+        raise HTTPException(status_code=503, detail="Service is starting, please retry shortly",
+                            headers={"Retry-After": "1"})
+
+def _inference_busy(rejected: str, e: InferenceQueueFullError) -> HTTPException:
+    """503 for a request whose model inference the full queue could not take"""
+    logger.warning(f"Rejecting {rejected}, inference queue is full: {e}")
+    return HTTPException(status_code=503, detail="Service is busy, please retry shortly", headers={"Retry-After": "1"})
+
+async def _when_inference_queue_allows(what: str, operation: Callable[[], Awaitable[Any]], max_delay: float = 5.0):
+    """Run operation, retrying with backoff while requests keep the inference queue full"""
+    delay = 0.1
+    while True:
+        try:
+            return await operation()
+        except InferenceQueueFullError as e:
+            logger.info(f"Inference queue is full, retrying {what} in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+@app.post("/analyze", response_model=AnalyzeResponse, dependencies=[Depends(require_knowledge_base)])
 async def analyze_message(request: AnalyzeRequest):
     """
     Analyze user message and generate appropriate response with conversation context
     
     First tries FAQ matching, falls back to Gemini if no good match found
     """
+    start = time.perf_counter()
     try:
         user_message = request.message.strip()
-        conversation_history = request.conversation_history or []
+        deadline = Deadline.after_ms(request.deadline_ms or analyze_deadline_ms)
         
         if not user_message:
             raise HTTPException(status_code=400, detail="Message cannot be empty")
         
+        session, conversation = await _load_conversation(request)
+        
         # Try to get from cache first if it's a simple question
-        cache_key = response_cache.create_key(request)
+        cache_key = response_cache.create_key(user_message, conversation)
         if cache_key:
-            cached_response = response_cache.get(cache_key)
-            if cached_response:
+            with STAGE_LATENCY.time("cache_lookup"):
+                response = await response_cache.get_async(cache_key)
+            if response:
                 logger.info(f"Cache hit for message: {user_message[:30]}...")
-                return cached_response
+            else:
+                # Identical requests already in flight share one result (and the first one's deadline)
+                response = await analyze_flight.do(
+                    cache_key,
+                    lambda: _analyze_uncached(user_message, conversation, cache_key, deadline)
+                )
+        else:
+            response = await _analyze_uncached(user_message, conversation, cache_key, deadline)
         
-        logger.info(f"Analyzing message: {user_message[:50]}... (with {len(conversation_history)} history messages)")
+        return _count_response(await _end_turn(session, user_message, response), start)
         
-        # Step 1: Try FAQ matching
-        faq_result = await faq_matcher.find_best_match(user_message)
+    except HTTPException:
+        raise
+    except InferenceQueueFullError as e:
+        raise _inference_busy("request", e)
+    except Exception as e:
+        logger.error(f"Error analyzing message: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error during message analysis")
+    finally:
+        REQUEST_LATENCY.observe(time.perf_counter() - start, "analyze")
+
+async def _load_conversation(request: AnalyzeRequest) -> Tuple[Optional[Session], ConversationContext]:
+    """The request's session (if it names one) and the conversation its prompt should show"""
+    if not request.conversation_id:
+        return None, ConversationContext.from_history(request.conversation_history)
+    session = await session_store.load_async(request.conversation_id, request.conversation_history)
+    return session, session.context()
+
+async def _end_turn(session: Optional[Session], user_message: str, response: AnalyzeResponse) -> AnalyzeResponse:
+    """Record the message and its answer in the request's session, if any"""
+    if session is None:
+        return response
+    await session_store.add_turn_async(session, user_message, response.reply, response.intent)
+    return response.model_copy(update={'conversation_id': session.conversation_id})
+
+def _count_response(response: AnalyzeResponse, start: float) -> AnalyzeResponse:
+    RESPONSES.inc(response.source)
+    TIER_LATENCY.observe(time.perf_counter() - start, response.tier)
+    return response
+
+async def _analyze_uncached(user_message: str, conversation: ConversationContext, cache_key: Optional[str],
+                            deadline: Deadline) -> AnalyzeResponse:
+    """FAQ matching, semantic cache and Gemini fallback for a request that missed the cache"""
+    logger.info(f"Analyzing message: {user_message[:50]}... (with {conversation.messages} history messages)")
+    kb_version = faq_matcher.version
+    
+    # Step 1: Try FAQ matching
+    with STAGE_LATENCY.time("faq_match"):
+        faq_result = await faq_matcher.find_best_match(user_message, deadline)
+    
+    return await _answer_from_match(user_message, conversation, cache_key, faq_result, kb_version,
+                                    deadline=deadline)
+
+async def _answer_from_match(user_message: str, conversation: ConversationContext, cache_key: Optional[str],
+                             faq_result: Optional[Dict[str, Any]], kb_version: int,
+                             gemini_slots: Optional[asyncio.Semaphore] = None,
+                             deadline: Optional[Deadline] = None) -> AnalyzeResponse:
+    """Answer from a confident FAQ match, else from the semantic cache or Gemini (at most gemini_slots at once)
+    
+    If Gemini has not answered when deadline is nearly up, the best FAQ candidate or a
+    template answer is returned instead, and Gemini's answer is cached when it arrives.
+    """
+    if faq_result and faq_result['confidence'] >= 0.7:  # High confidence FAQ match
+        logger.info(f"FAQ match found with confidence: {faq_result['confidence']:.2f}")
+        response = AnalyzeResponse(
+            intent=faq_result['intent'],
+            reply=faq_result['response'],
+            confidence=faq_result['confidence'],
+            source="faq",
+            tier="faq"
+        )
         
+        # Cache the response if appropriate
+        if cache_key:
+            _cache_response(cache_key, response, [_faq_tag(faq_result['question'])], kb_version)
+            
+        return response
+    
+    # Step 2: Try the semantic cache for paraphrases of answered queries, if there is time to embed the query
+    # (not within a conversation: the semantic cache does not know it)
+    query_embedding = None
+    if cache_key and not conversation.key and faq_matcher.semantic_fits(deadline):
+        cached_response, query_embedding = await _lookup_semantic_cache(user_message)
+        if cached_response:
+            logger.info(f"Semantic cache hit for message: {user_message[:30]}...")
+            _cache_response(cache_key, cached_response, [FALLBACK_TAG], kb_version)
+            return cached_response
+    
+    # Step 3: Fall back to Gemini with conversation context, waiting at most until the hedge point
+    logger.info("No high-confidence FAQ match, using Gemini with context...")
+    gemini_call = asyncio.ensure_future(_generate_with_gemini(user_message, conversation, faq_result, gemini_slots))
+    wait = max(0.0, deadline.remaining() - hedge_reserve_ms / 1000) if deadline and deadline.bounded else None
+    try:
+        gemini_result = await asyncio.wait_for(asyncio.shield(gemini_call), wait)
+    except asyncio.TimeoutError:
+        logger.info(f"Gemini did not answer within the deadline, answering without it: {user_message[:30]}...")
+        _cache_when_answered(gemini_call, user_message, cache_key, faq_result, query_embedding, kb_version)
+        return _hedged_response(user_message, faq_result)
+    
+    response = _gemini_response(gemini_result)
+    
+    # Cache the response if appropriate
+    if cache_key:
+        _cache_gemini_response(cache_key, user_message, response, gemini_result, faq_result, query_embedding, kb_version)
+        
+    return response
+
+async def _generate_with_gemini(user_message: str, conversation: ConversationContext, faq_result: Optional[Dict[str, Any]],
+                                gemini_slots: Optional[asyncio.Semaphore]) -> Dict[str, Any]:
+    async with gemini_slots or nullcontext():
+        return await llm_generator.generate_response(
+            user_message, 
+            faq_context=faq_result if faq_result else None,
+            conversation=conversation
+        )
+
+def _gemini_response(gemini_result: Dict[str, Any]) -> AnalyzeResponse:
+    """The answer of a generator result: a 'fallback' one if Gemini did not write it"""
+    source = "gemini" if gemini_result.get('method') == 'gemini' else "fallback"
+    return AnalyzeResponse(
+        intent=gemini_result['intent'],
+        reply=gemini_result['response'],
+        confidence=gemini_result['confidence'],
+        source=source,
+        tier=source
+    )
+
+def _cache_gemini_response(cache_key: str, user_message: str, response: AnalyzeResponse, gemini_result: Dict[str, Any],
+                           faq_result: Optional[Dict[str, Any]], query_embedding, kb_version: int):
+    if gemini_result.get('method') != 'gemini':
+        # Template and fallback replies would outlive the outage that produced them
+        return
+    _cache_response(cache_key, response, _gemini_tags(faq_result), kb_version)
+    if query_embedding is not None and faq_matcher.version == kb_version:
+        semantic_cache.put(query_embedding, user_message, response.model_dump())
+
+def _hedged_response(user_message: str, faq_result: Optional[Dict[str, Any]]) -> AnalyzeResponse:
+    """Best answer available without Gemini: the FAQ candidate if there is one, else a template reply"""
+    if faq_result:
+        return AnalyzeResponse(
+            intent=faq_result['intent'],
+            reply=faq_result['response'],
+            confidence=faq_result['confidence'],
+            source="faq",
+            tier="faq_candidate"
+        )
+    local = llm_generator.local_response(user_message)
+    return AnalyzeResponse(
+        intent=local['intent'],
+        reply=local['response'],
+        confidence=local['confidence'],
+        source="fallback",
+        tier="template"
+    )
+
+def _cache_when_answered(gemini_call: asyncio.Future, user_message: str, cache_key: Optional[str],
+                         faq_result: Optional[Dict[str, Any]], query_embedding, kb_version: int):
+    """Let a Gemini call its request stopped waiting for finish, caching its answer
+    
+    Without a cache key (caching disabled) there is nothing to fill, so the call is cancelled.
+    """
+    if not cache_key:
+        gemini_call.cancel()
+        return
+    hedged_gemini_calls.add(gemini_call)
+    
+    def done(call: asyncio.Future):
+        hedged_gemini_calls.discard(call)
+        if call.cancelled() or call.exception() is not None:
+            HEDGED_GEMINI_CALLS.inc("failed")
+            return
+        gemini_result = call.result()
+        if gemini_result.get('method') != 'gemini':
+            # Not worth caching over the answer already given
+            HEDGED_GEMINI_CALLS.inc("not_cached")
+            return
+        _cache_gemini_response(cache_key, user_message, _gemini_response(gemini_result), gemini_result,
+                               faq_result, query_embedding, kb_version)
+        HEDGED_GEMINI_CALLS.inc("cached")
+        
+    gemini_call.add_done_callback(done)
+
+def _gemini_tags(faq_result: Optional[Dict[str, Any]]) -> List[str]:
+    return [FALLBACK_TAG] + ([_faq_tag(faq_result['question'])] if faq_result else [])
+
+def _cache_response(cache_key: str, response: AnalyzeResponse, tags: List[str], kb_version: int):
+    """Cache a response unless the knowledge base changed while it was being computed
+    
+    Nothing is cached while the semantic model is loading: those answers come
+    from TF-IDF alone and would outlive the warm-up.
+    """
+    if faq_matcher.version == kb_version and startup.state("semantic_model") not in (PENDING, LOADING):
+        response_cache.put_soon(cache_key, response, tags)
+
+async def _lookup_semantic_cache(user_message: str):
+    """Return (cached AnalyzeResponse or None, query embedding) from the semantic cache"""
+    if not semantic_cache:
+        return None, None
+        
+    query_embedding = await faq_matcher.get_query_embedding(user_message)
+    if query_embedding is None:
+        return None, None
+        
+    with STAGE_LATENCY.time("semantic_cache_lookup"):
+        cached = semantic_cache.get(query_embedding, user_message)
+    return (AnalyzeResponse(**{**cached, 'tier': 'semantic_cache'}) if cached else None), query_embedding
+
+def require_admin(x_admin_key: Optional[str] = Header(default=None)):
+    """Allow admin endpoints only with the configured ADMIN_API_KEY"""
+    if not admin_api_key:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, admin_api_key):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+@app.get("/cache/semantic/audit", dependencies=[Depends(require_admin)])
+async def semantic_cache_audit():
+    """Sampled semantic cache hits, for tuning SEMANTIC_CACHE_THRESHOLD against real traffic"""
+    if not semantic_cache:
+        raise HTTPException(status_code=404, detail="Semantic cache is not enabled")
+    return {"stats": semantic_cache.stats(), "samples": semantic_cache.audit_sample()}
+
+@app.get("/sessions/{conversation_id}", dependencies=[Depends(require_admin)])
+async def get_session(conversation_id: str):
+    """What a session keeps: recent messages, the summary of older ones, and detected intents"""
+    session = await offload(session_store.backend, session_store.get, conversation_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired conversation")
+    return {
+        "conversation_id": conversation_id,
+        "messages": session.messages,
+        "window": [{"role": role, "content": content} for role, content in session.window],
+        "summary": session.summary(),
+        "intents": session.intents,
+        "updated_at": session.updated_at,
+    }
+
+@app.delete("/sessions/{conversation_id}", dependencies=[Depends(require_admin)])
+async def end_session(conversation_id: str):
+    """Forget a conversation before its TTL runs out"""
+    if not await offload(session_store.backend, session_store.delete, conversation_id):
+        raise HTTPException(status_code=404, detail="Unknown or expired conversation")
+    return {"deleted": conversation_id}
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/analyze/stream", dependencies=[Depends(require_knowledge_base)])
+async def analyze_message_stream(request: AnalyzeRequest):
+    """
+    Analyze user message and stream the response as server-sent events
+    
+    Events: 'faq' (best FAQ candidate, sent as soon as it is known), 'token'
+    (reply text chunks), 'done' (final AnalyzeResponse) or 'error'
+    """
+    user_message = request.message.strip()
+    if not user_message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+        
+    return StreamingResponse(
+        _stream_analysis(request, user_message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _stream_analysis(request: AnalyzeRequest, user_message: str):
+    start = time.perf_counter()
+    try:
+        session, conversation = await _load_conversation(request)
+        
+        cache_key = response_cache.create_key(user_message, conversation)
+        if cache_key:
+            with STAGE_LATENCY.time("cache_lookup"):
+                cached_response = await response_cache.get_async(cache_key)
+            if cached_response:
+                logger.info(f"Cache hit for message: {user_message[:30]}...")
+                yield _sse_event("token", {"text": cached_response.reply})
+                yield _sse_event("done", _count_response(await _end_turn(session, user_message, cached_response), start).model_dump())
+                return
+        
+        # The deadline only bounds matching: the Gemini reply is streamed as it is written
+        deadline = Deadline.after_ms(request.deadline_ms or analyze_deadline_ms)
+        kb_version = faq_matcher.version
+        with STAGE_LATENCY.time("faq_match"):
+            faq_result = await faq_matcher.find_best_match(user_message, deadline)
+        if faq_result:
+            yield _sse_event("faq", dict(faq_result))
+            
         if faq_result and faq_result['confidence'] >= 0.7:  # High confidence FAQ match
-            logger.info(f"FAQ match found with confidence: {faq_result['confidence']:.2f}")
             response = AnalyzeResponse(
                 intent=faq_result['intent'],
                 reply=faq_result['response'],
                 confidence=faq_result['confidence'],
-                source="faq"
+                source="faq",
+                tier="faq"
             )
-            
-            # Cache the response if appropriate
             if cache_key:
-                response_cache.put(cache_key, response)
-                
-            return response
+                _cache_response(cache_key, response, [_faq_tag(faq_result['question'])], kb_version)
+            yield _sse_event("token", {"text": response.reply})
+            yield _sse_event("done", _count_response(await _end_turn(session, user_message, response), start).model_dump())
+            return
         
-        # Step 2: Fall back to Gemini with conversation context
-        logger.info("No high-confidence FAQ match, using Gemini with context...")
-        gemini_result = await llm_generator.generate_response(
-            user_message, 
+        query_embedding = None
+        if cache_key and not conversation.key and faq_matcher.semantic_fits(deadline):
+            cached_response, query_embedding = await _lookup_semantic_cache(user_message)
+            if cached_response:
+                logger.info(f"Semantic cache hit for message: {user_message[:30]}...")
+                _cache_response(cache_key, cached_response, [FALLBACK_TAG], kb_version)
+                yield _sse_event("token", {"text": cached_response.reply})
+                yield _sse_event("done", _count_response(await _end_turn(session, user_message, cached_response), start).model_dump())
+                return
+        
+        async for event in llm_generator.stream_response(
+            user_message,
             faq_context=faq_result if faq_result else None,
-            conversation_history=conversation_history
-        )
+            conversation=conversation
+        ):
+            if event['type'] == 'token':
+                yield _sse_event("token", {"text": event['text']})
+                continue
+                
+            response = _gemini_response(event)
+            if cache_key and event['method'] == 'gemini':
+                _cache_response(cache_key, response, _gemini_tags(faq_result), kb_version)
+                if query_embedding is not None and faq_matcher.version == kb_version:
+                    semantic_cache.put(query_embedding, user_message, response.model_dump())
+            yield _sse_event("done", _count_response(await _end_turn(session, user_message, response), start).model_dump())
+            
+    except InferenceQueueFullError as e:
+        logger.warning(f"Rejecting request, inference queue is full: {e}")
+        yield _sse_event("error", {"detail": "Service is busy, please retry shortly"})
+    except Exception as e:
+        logger.error(f"Error streaming message analysis: {e}")
+        yield _sse_event("error", {"detail": "Internal server error during message analysis"})
+    finally:
+        REQUEST_LATENCY.observe(time.perf_counter() - start, "analyze_stream")
+
+@app.post("/analyze/batch", dependencies=[Depends(require_knowledge_base)])
+async def analyze_batch(request: BatchAnalyzeRequest):
+    """
+    Analyze many messages in one request, streaming one JSON object per line (NDJSON)
+    
+    Each line is an AnalyzeResponse, or {"error": ...}, plus the message's "index"
+    in the request. Identical messages (ignoring case and surrounding whitespace)
+    are answered once. FAQ matching runs over the whole batch; messages that need
+    Gemini go out at most BATCH_GEMINI_CONCURRENCY at a time.
+    """
+    if len(request.messages) > batch_max_messages:
+        raise HTTPException(status_code=413, detail=f"At most {batch_max_messages} messages per batch")
         
-        response = AnalyzeResponse(
-            intent=gemini_result['intent'],
-            reply=gemini_result['response'],
-            confidence=gemini_result['confidence'],
-            source="gemini"
-        )
+    return StreamingResponse(
+        _stream_batch(request.messages, request.order),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _stream_batch(messages: List[str], order: str):
+    start = time.perf_counter()
+    
+    # Positions of each distinct message; the first occurrence is the one answered
+    positions_by_key: Dict[str, List[int]] = {}
+    for position, message in enumerate(messages):
+        positions_by_key.setdefault(message.lower().strip(), []).append(position)
+    distinct = [(messages[positions[0]].strip(), positions) for positions in positions_by_key.values()]
+    
+    # (distinct index, AnalyzeResponse or error message) as each answer is ready
+    answers: asyncio.Queue = asyncio.Queue()
+    worker = asyncio.create_task(_answer_batch(distinct, answers))
+    
+    lines: List[Optional[str]] = [None] * len(messages)
+    next_position = 0
+    try:
+        for _ in range(len(distinct)):
+            item, answer = await answers.get()
+            ready = []
+            for position in distinct[item][1]:
+                if isinstance(answer, AnalyzeResponse):
+                    RESPONSES.inc(answer.source)
+                    line = json.dumps({"index": position, **answer.model_dump()})
+                else:
+                    line = json.dumps({"index": position, "error": answer})
+                if order == "completion":
+                    ready.append(line)
+                else:
+                    lines[position] = line
+                    
+            # In input order, a line goes out once every line before it has
+            while order == "input" and next_position < len(lines) and lines[next_position] is not None:
+                ready.append(lines[next_position])
+                lines[next_position] = None
+                next_position += 1
+                
+            if ready:
+                yield "\n".join(ready) + "\n"
+    finally:
+        worker.cancel()
+        REQUEST_LATENCY.observe(time.perf_counter() - start, "analyze_batch")
+
+async def _answer_batch(distinct: List[tuple], answers: asyncio.Queue):
+    """Answer each distinct (message, positions), putting (index, answer) on answers as each completes"""
+    answered = set()
+    
+    def put(item: int, answer):
+        answered.add(item)
+        answers.put_nowait((item, answer))
         
-        # Cache the response if appropriate
-        if cache_key:
-            response_cache.put(cache_key, response)
+    try:
+        kb_version = faq_matcher.version
+        
+        # Cached answers go out first; only the rest is matched
+        pending = []
+        for item, (message, _) in enumerate(distinct):
+            if not message:
+                put(item, "Message cannot be empty")
+                continue
+            cache_key = response_cache.message_key(message)
+            if cache_key:
+                with STAGE_LATENCY.time("cache_lookup"):
+                    cached_response = await response_cache.get_async(cache_key)
+                if cached_response:
+                    put(item, cached_response)
+                    continue
+            pending.append((item, message, cache_key))
             
-        return response
+        logger.info(f"Analyzing batch: {len(distinct)} distinct messages, {len(pending)} not cached")
+        with STAGE_LATENCY.time("batch_faq_match"):
+            matches = await faq_matcher.find_best_matches([message for _, message, _ in pending])
+            
+        gemini_slots = asyncio.Semaphore(batch_gemini_concurrency)
         
+        async def answer(item: int, message: str, cache_key: Optional[str], faq_result):
+            compute = lambda: _answer_from_match(message, EMPTY_CONTEXT, cache_key, faq_result, kb_version, gemini_slots)
+            try:
+                # Identical requests already in flight, batched or not, share one result
+                put(item, await (analyze_flight.do(cache_key, compute) if cache_key else compute()))
+            except Exception as e:
+                logger.error(f"Error analyzing batch message: {e}")
+                put(item, "Internal server error during message analysis")
+                
+        await asyncio.gather(*(answer(item, message, cache_key, faq_result)
+                               for (item, message, cache_key), faq_result in zip(pending, matches)))
+                               
     except Exception as e:
-        logger.error(f"Error analyzing message: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error during message analysis")
+        logger.error(f"Error analyzing batch: {e}")
+        detail = "Service is busy, please retry shortly" if isinstance(e, InferenceQueueFullError) \
+            else "Internal server error during message analysis"
+        for item in range(len(distinct)):
+            if item not in answered:
+                put(item, detail)
+
+def _invalidate_knowledge_base_caches(changes: Dict[str, Any]) -> int:
+    """Drop cached responses that depended on changed FAQ entries or that they may now answer"""
+    tags = [_faq_tag(question) for question in changes['updated'] + changes['deleted']]
+    if changes['added'] or changes['updated']:
+        tags.append(FALLBACK_TAG)
+    invalidated = response_cache.invalidate(tags)
+    
+    # The Gemini cache needs no invalidation: its keys include the FAQ context used
+    if semantic_cache and changes['embeddings'] is not None:
+        invalidated += semantic_cache.invalidate_near(changes['embeddings'], kb_invalidation_similarity)
+        
+    logger.info(f"Invalidated {invalidated} cached responses after knowledge base update")
+    return invalidated
+
+def _sync_knowledge_base_file(background_tasks: list):
+    """Apply knowledge base edits another worker saved to the file"""
+    task = asyncio.create_task(_reload_changed_knowledge_base())
+    background_tasks.append(task)
+    task.add_done_callback(background_tasks.remove)
+
+async def _reload_changed_knowledge_base():
+    if not faq_matcher.knowledge_base_changed():
+        return
+    try:
+        changes = await _when_inference_queue_allows("knowledge base reload", faq_matcher.reload_knowledge_base)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not apply knowledge base file edits: {e}")
+        return
+    if changes['added'] or changes['updated'] or changes['deleted']:
+        _invalidate_knowledge_base_caches(changes)
+
+def _broadcast_update(changes: Dict[str, Any]):
+    """Under app.serve, have the other workers apply a change this one saved or reloaded"""
+    if notify_knowledge_base_changed is not None and (changes['added'] or changes['updated'] or changes['deleted']):
+        notify_knowledge_base_changed()
+
+def _update_response(changes: Dict[str, Any], invalidated: int) -> KnowledgeBaseUpdateResponse:
+    return KnowledgeBaseUpdateResponse(
+        version=changes['version'],
+        entries=changes['entries'],
+        added=changes['added'],
+        updated=changes['updated'],
+        deleted=changes['deleted'],
+        reembedded=changes['reembedded'],
+        invalidated=invalidated
+    )
+
+@app.get("/admin/faqs", dependencies=[Depends(require_admin), Depends(require_knowledge_base)])
+async def list_faqs():
+    """Current FAQ entries and knowledge base version"""
+    return {"version": faq_matcher.version, "entries": [dict(faq) for faq in faq_matcher.knowledge_base]}
+
+@app.post("/admin/faqs", response_model=KnowledgeBaseUpdateResponse, dependencies=[Depends(require_admin), Depends(require_knowledge_base)])
+async def update_faqs(update: KnowledgeBaseUpdate):
+    """Add, update or delete FAQ entries without a restart; changes are saved to the knowledge base file"""
+    try:
+        changes = await faq_matcher.update_knowledge_base(
+            upserts=[entry.model_dump() for entry in update.upsert],
+            deletes=update.delete
+        )
+    except InferenceQueueFullError as e:
+        raise _inference_busy("knowledge base update", e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _broadcast_update(changes)
+    return _update_response(changes, _invalidate_knowledge_base_caches(changes))
+
+@app.post("/admin/faqs/reload", response_model=KnowledgeBaseUpdateResponse, dependencies=[Depends(require_admin), Depends(require_knowledge_base)])
+async def reload_faqs():
+    """Re-read the knowledge base file and apply whatever changed in it"""
+    try:
+        changes = await faq_matcher.reload_knowledge_base()
+    except InferenceQueueFullError as e:
+        raise _inference_busy("knowledge base reload", e)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not reload knowledge base: {e}")
+    _broadcast_update(changes)
+    return _update_response(changes, _invalidate_knowledge_base_caches(changes))
 
 if __name__ == "__main__":
     # Get host and port from environment variables with fallbacks
@@ -0,0 +1,182 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Upper bounds in seconds, from sub-millisecond index lookups to slow Gemini calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# A collector returns (name, type, help, [(labels, value), ...]) families, read at scrape time
+Sample = Tuple[Dict[str, str], float]
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with one value per label combination"""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(dict(zip(self.label_names, labels)))} {_format_value(value)}"
+                for labels, value in values]
+
+
+class _Timer:
+    __slots__ = ('_histogram', '_label_values', '_start')
+
+    def __init__(self, histogram: "Histogram", label_values: Tuple[str, ...]):
+        self._histogram = histogram
+        self._label_values = label_values
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start, *self._label_values)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets; observing is a bisect and three additions"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: [count per bucket (last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *label_values: str) -> _Timer:
+        """Context manager observing the duration of its block"""
+        return _Timer(self, label_values)
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        lines = []
+        for label_values, counts, total, count in series:
+            labels = dict(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics kept by this process, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector):
+        """Add values computed at scrape time (e.g. from existing stats()), costing nothing per request"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, metric_type, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Where /analyze spends its time: cache_lookup, semantic_cache_lookup, faq_match, keyword,
+# tfidf, embedding, similarity, gemini_classify, gemini_generate, gemini_combined, gemini_stream;
+# batch_faq_match times FAQ matching for a whole /analyze/batch request
+STAGE_LATENCY = REGISTRY.histogram(
+    "analyze_stage_duration_seconds", "Time spent in each stage of answering a message", ("stage",)
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    "analyze_request_duration_seconds", "End-to-end time to answer a message", ("endpoint",)
+)
+RESPONSES = REGISTRY.counter(
+    "analyze_responses_total", "Answers by source (faq, gemini or fallback), cached or not", ("source",)
+)
+GEMINI_ERRORS = REGISTRY.counter(
+    "gemini_errors_total", "Gemini calls that failed, by call", ("call",)
+)
+GEMINI_FALLBACKS = REGISTRY.counter(
+    "gemini_fallbacks_total", "Intents or replies produced locally because Gemini failed or gave none", ("kind",)
+)
+# Time to answer on /analyze and /analyze/stream, by the tier that answered: cache, semantic_cache, faq, gemini, fallback
+# (Gemini failed), or once the deadline left no time to wait for Gemini, faq_candidate or template
+TIER_LATENCY = REGISTRY.histogram(
+    "analyze_tier_duration_seconds", "Time to answer a message, by the tier that answered", ("tier",)
+)
+HEDGED_GEMINI_CALLS = REGISTRY.counter(
+    "hedged_gemini_calls_total", "Gemini calls that outlived their request's deadline, by outcome (cached, not_cached, failed)", ("outcome",)
+)
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .inference_executor import InferenceExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collect concurrent requests for a few milliseconds and run them as one batch
+
+    batch_fn receives a list of items and must return a list of results in the
+    same order; it runs on the inference executor.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], executor: InferenceExecutor,
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        self._batches = 0
+        self._items = 0
+        self._max_seen_batch = 0
+
+    async def submit(self, item: Any) -> Any:
+        """Queue item for the next batch and wait for its own result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        self._batches += 1
+        self._items += len(batch)
+        self._max_seen_batch = max(self._max_seen_batch, len(batch))
+
+        try:
+            results = await self.executor.run(self.batch_fn, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'batches': self._batches,
+            'items': self._items,
+            'avg_batch_size': round(self._items / self._batches, 2) if self._batches else 0.0,
+            'max_batch_size_seen': self._max_seen_batch,
+            'pending': len(self._pending),
+        }
@@ -0,0 +1,143 @@
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .vector_index import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Response cache looked up by embedding similarity instead of exact text
+
+    Embeddings live in one preallocated float32 matrix, so a lookup is a single
+    matrix-vector product. Slots are reused in LRU order and entries expire after
+    ttl_seconds. A random sample of hits is kept for auditing false hits.
+    """
+
+    def __init__(self, dim: int, max_items: int = 5000, threshold: float = 0.92, ttl_seconds: float = 3600,
+                 audit_rate: float = 0.05, audit_size: int = 100):
+        self.dim = dim
+        self.max_items = max(1, max_items)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.audit_rate = audit_rate
+
+        self._vectors = np.zeros((self.max_items, dim), dtype=np.float32)
+        self._expires_at = np.full(self.max_items, -np.inf)  # -inf marks a free slot
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # slot -> (query, value), LRU order
+        self._free_slots = list(range(self.max_items - 1, -1, -1))
+        self._lock = threading.Lock()
+        self._audit = deque(maxlen=max(1, audit_size))
+
+        self.hits = 0
+        self.misses = 0
+        self.near_misses = 0  # best match within 0.05 below the threshold
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, embedding: np.ndarray, query: str = "") -> Optional[Dict[str, Any]]:
+        """Return the cached value of the most similar live entry above the threshold"""
+        embedding = normalize_rows(embedding)
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors @ embedding
+            similarities[self._expires_at < time.monotonic()] = -np.inf
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+
+            if similarity < self.threshold:
+                self.misses += 1
+                if similarity >= self.threshold - 0.05:
+                    self.near_misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(slot)
+            matched_query, value = self._entries[slot]
+            if self.audit_rate and random.random() < self.audit_rate:
+                self._audit.append({
+                    'query': query,
+                    'matched_query': matched_query,
+                    'similarity': round(similarity, 4),
+                    'reply': value.get('reply', value.get('response', '')),
+                    'timestamp': time.time(),
+                })
+            return value
+
+    def put(self, embedding: np.ndarray, query: str, value: Dict[str, Any]):
+        """Store value for the query embedding, evicting expired or least recently used entries"""
+        embedding = normalize_rows(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if not self._free_slots:
+                self._reclaim_expired(now)
+            if not self._free_slots:
+                oldest_slot = next(iter(self._entries))
+                self._release(oldest_slot)
+                self.evictions += 1
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = embedding
+            self._expires_at[slot] = now + self.ttl_seconds
+            self._entries[slot] = (query, value)
+
+    def _reclaim_expired(self, now: float):
+        for slot in np.flatnonzero((self._expires_at < now) & np.isfinite(self._expires_at)):
+            self._release(int(slot))
+            self.expirations += 1
+
+    def _release(self, slot: int):
+        self._entries.pop(slot, None)
+        self._vectors[slot] = 0.0
+        self._expires_at[slot] = -np.inf
+        self._free_slots.append(slot)
+
+    def invalidate_near(self, embeddings: np.ndarray, min_similarity: float) -> int:
+        """Drop entries whose query is at least min_similarity to any of the embeddings"""
+        embeddings = normalize_rows(np.atleast_2d(embeddings))
+        with self._lock:
+            if not self._entries:
+                return 0
+            similarities = (self._vectors @ embeddings.T).max(axis=1)
+            slots = [int(slot) for slot in np.flatnonzero(similarities >= min_similarity) if int(slot) in self._entries]
+            for slot in slots:
+                self._release(slot)
+            self.invalidations += len(slots)
+            return len(slots)
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._release(slot)
+
+    def audit_sample(self) -> List[Dict[str, Any]]:
+        """Recent sampled hits, for checking the threshold against real traffic"""
+        with self._lock:
+            return list(self._audit)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'namespace': 'semantic',
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'near_misses': self.near_misses,
+                'threshold': self.threshold,
+                'items': len(self._entries),
+                'max_items': self.max_items,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
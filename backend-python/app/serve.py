@@ -0,0 +1,142 @@
+"""Preload-then-fork server
+
+Loads the FAQ matcher (model weights, TF-IDF and embedding indexes) once, then
+forks WEB_WORKERS uvicorn workers on one shared listening socket. Workers share
+those pages copy-on-write instead of each loading a private copy, so memory
+grows by the per-worker working set rather than a full model per worker.
+
+Knowledge base changes made through /admin/faqs are saved to the file by the
+worker that handled them; it then signals the parent (SIGHUP), which passes
+the signal on to every worker so they all re-read the file. A worker started
+later also re-reads the file if it changed since the preload.
+
+Usage: python -m app.serve
+"""
+import asyncio
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict
+
+import uvicorn
+from dotenv import load_dotenv
+
+from .faq_matcher import FAQMatcher
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is restarted with a delay
+MIN_WORKER_UPTIME_SECONDS = 5.0
+
+
+def preload() -> FAQMatcher:
+    """Load the knowledge base, model and indexes in the parent process"""
+    faq_matcher = FAQMatcher(os.getenv("KNOWLEDGE_BASE_PATH", "app/knowledge_base.json"))
+    asyncio.run(faq_matcher.load_knowledge_base())
+    faq_matcher.prepare_fork()
+    return faq_matcher
+
+
+def run_worker(faq_matcher: FAQMatcher, sock: socket.socket, host: str, port: int):
+    """Serve the app in a forked child; never returns"""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Until the app installs its own handler; it catches up on the file when it does
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    parent = os.getppid()
+    status = 0
+    try:
+        faq_matcher.after_fork()
+
+        # Imported after the fork so each worker opens its own cache backend connections
+        from . import main as service
+        service.preloaded_faq_matcher = faq_matcher
+        service.notify_knowledge_base_changed = lambda: os.kill(parent, signal.SIGHUP)
+
+        config = uvicorn.Config(service.app, host=host, port=port, log_level="info")
+        uvicorn.Server(config).run(sockets=[sock])
+    except Exception:
+        logger.exception("Worker failed")
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def main():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "5000"))
+    workers = max(1, int(os.getenv("WEB_WORKERS", "2")))
+
+    # Fast tokenizers' thread pool cannot survive a fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    if workers > 1 and os.getenv("CACHE_BACKEND", "memory").lower() == "memory":
+        logger.info("Each worker has its own response cache; set CACHE_BACKEND=sqlite or redis to share one")
+
+    start = time.perf_counter()
+    faq_matcher = preload()
+    logger.info(f"Preloaded models and indexes in {time.perf_counter() - start:.1f}s")
+
+    # Everything loaded so far lives as long as the workers; keep the cyclic GC from
+    # writing to those objects, which would copy their pages into every worker
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            run_worker(faq_matcher, sock, host, port)
+        children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reload_workers(signum, frame):
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGHUP, reload_workers)
+
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        pid, status = os.wait()
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+        if time.monotonic() - started < MIN_WORKER_UPTIME_SECONDS:
+            time.sleep(MIN_WORKER_UPTIME_SECONDS)
+        if not stopping:
+            spawn()
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from .cache import CacheBackend, offload
+from .cache_keys import RollingTurnHash, context_key
+
+logger = logging.getLogger(__name__)
+
+# The prompt shows the last WINDOW_MESSAGES messages, each cut to MESSAGE_CHARS characters
+WINDOW_MESSAGES = 6
+MESSAGE_CHARS = 100
+
+# Summary of messages older than the window: customer messages kept, their length, intents kept
+SUMMARY_TOPICS = 3
+SUMMARY_TOPIC_CHARS = 60
+SUMMARY_INTENTS = 5
+
+
+def _compact(message) -> List[str]:
+    """[role, truncated content] of a ConversationMessage or {'role', 'content'} dict"""
+    if hasattr(message, 'role') and hasattr(message, 'content'):
+        return [message.role, (message.content or '')[:MESSAGE_CHARS]]
+    return [message.get('role', ''), (message.get('content') or '')[:MESSAGE_CHARS]]
+
+
+def _line(role: str, content: str) -> str:
+    return f"{'Customer' if role == 'user' else 'Assistant'}: {content}"
+
+
+def render_context(window: Iterable[List[str]], summary: str = "") -> str:
+    """The conversation block of the prompt"""
+    lines = [f"\nEarlier in the conversation: {summary}"] if summary else []
+    lines.append("\nRecent conversation:")
+    lines.extend(_line(role, content) for role, content in window)
+    return "\n".join(lines)
+
+
+class ConversationContext:
+    """A conversation as prompts see it, rendered once and reused by every prompt built from it
+
+    key identifies the canonical form of the rendered text (a RollingTurnHash of
+    the window, plus the summary if one is shown), so answers are only shared
+    between conversations whose prompts show the same conversation. It is ""
+    when there is none.
+    """
+
+    __slots__ = ('text', 'key', 'messages')
+
+    def __init__(self, text: str = "", key: str = "", messages: int = 0):
+        self.text = text
+        self.key = key
+        # Messages in the whole conversation, including those only summarized or dropped
+        self.messages = messages
+
+    @classmethod
+    def from_history(cls, conversation_history: Optional[list]) -> "ConversationContext":
+        """Context of a conversation_history sent with the request"""
+        if not conversation_history:
+            return EMPTY_CONTEXT
+        window = [_compact(message) for message in conversation_history[-WINDOW_MESSAGES:]]
+        lines = RollingTurnHash(WINDOW_MESSAGES)
+        for role, content in window:
+            lines.push(_line(role, content))
+        return cls(render_context(window), context_key(lines), len(conversation_history))
+
+
+EMPTY_CONTEXT = ConversationContext()
+
+
+class Session:
+    """One conversation: its last window_messages messages, a summary of older ones, and its rendered context
+
+    The summary is updated as messages leave the window: the customer's first
+    message, their last few other messages, and the intents detected so far.
+    Prompts show it above the window; context() renders both once per turn and
+    is stored with the session.
+    """
+
+    def __init__(self, conversation_id: str, window_messages: int = WINDOW_MESSAGES,
+                 state: Optional[Dict[str, Any]] = None):
+        self.conversation_id = conversation_id
+        self.window_messages = max(1, window_messages)
+        state = state or {}
+        self.window: List[List[str]] = state.get('window', [])
+        self.messages: int = state.get('messages', 0)
+        self.opening: Optional[str] = state.get('opening')
+        self.earlier: List[str] = state.get('earlier', [])
+        self.intents: List[str] = state.get('intents', [])
+        self.last_intent: Optional[str] = state.get('last_intent')
+        self.window_hash = RollingTurnHash(self.window_messages, state.get('window_digests'), state.get('window_hash', 0))
+        self.updated_at: float = state.get('updated_at', time.time())
+        self._context: Optional[ConversationContext] = None
+        if 'context' in state:
+            self._context = ConversationContext(state['context'], state['context_key'], self.messages)
+
+    def add_message(self, role: str, content: str):
+        self.window.append(_compact({'role': role, 'content': content}))
+        self.window_hash.push(_line(*self.window[-1]))
+        self.messages += 1
+        while len(self.window) > self.window_messages:
+            role, content = self.window.pop(0)
+            if role != 'user':
+                continue
+            if self.opening is None:
+                self.opening = content
+            else:
+                self.earlier = (self.earlier + [content[:SUMMARY_TOPIC_CHARS]])[-SUMMARY_TOPICS:]
+        self._context = None
+
+    def add_turn(self, user_message: str, reply: str, intent: Optional[str] = None):
+        self.add_message('user', user_message)
+        self.add_message('assistant', reply)
+        if intent and intent not in self.intents:
+            self.intents = (self.intents + [intent])[-SUMMARY_INTENTS:]
+        self.last_intent = intent
+        self.updated_at = time.time()
+        self._context = None
+
+    def summary(self) -> str:
+        if self.messages <= len(self.window):
+            return ""
+        parts = [f'the customer first asked "{self.opening}"'] if self.opening else []
+        if self.earlier:
+            parts.append("then about " + "; ".join(f'"{topic}"' for topic in self.earlier))
+        if self.intents:
+            parts.append("topics so far: " + ", ".join(self.intents))
+        return ", ".join(parts) + "." if parts else ""
+
+    def context(self) -> ConversationContext:
+        """Rendered context, rebuilt only after the conversation changed"""
+        if not self.messages:
+            return EMPTY_CONTEXT
+        if self._context is None:
+            summary = self.summary()
+            self._context = ConversationContext(render_context(self.window, summary),
+                                                context_key(self.window_hash, summary), self.messages)
+        return self._context
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'window': self.window,
+            'messages': self.messages,
+            'opening': self.opening,
+            'earlier': self.earlier,
+            'intents': self.intents,
+            'last_intent': self.last_intent,
+            'window_digests': self.window_hash.digests,
+            'window_hash': self.window_hash.value,
+            'updated_at': self.updated_at,
+            'context': self.context().text,
+            'context_key': self.context().key,
+        }
+
+
+class SessionStore:
+    """Conversations by id, kept in a CacheBackend
+
+    The backend bounds their number and bytes (LRU eviction); a session expires
+    ttl_seconds after its last turn. With a shared backend (e.g. Redis) every
+    worker sees every session. Turns of concurrent requests on one conversation
+    are not ordered against each other.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float = 1800, window_messages: int = WINDOW_MESSAGES,
+                 shared_backend: bool = False):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.window_messages = window_messages
+        self.shared_backend = shared_backend
+        self.loaded = 0
+        self.created = 0
+        self.turns = 0
+
+    def _key(self, conversation_id: str) -> str:
+        return f"session:{conversation_id}"
+
+    def get(self, conversation_id: str) -> Optional[Session]:
+        value = self.backend.get(self._key(conversation_id))
+        if value is None:
+            return None
+        return Session(conversation_id, self.window_messages, json.loads(value))
+
+    def load(self, conversation_id: str, conversation_history: Optional[list] = None) -> Session:
+        """The session for conversation_id, or a new one seeded with conversation_history"""
+        session = self.get(conversation_id)
+        if session is not None:
+            self.loaded += 1
+            return session
+        self.created += 1
+        session = Session(conversation_id, self.window_messages)
+        for message in conversation_history or []:
+            session.add_message(*_compact(message))
+        return session
+
+    async def load_async(self, conversation_id: str, conversation_history: Optional[list] = None) -> Session:
+        """load() that does not block the event loop on the backend"""
+        return await offload(self.backend, self.load, conversation_id, conversation_history)
+
+    async def add_turn_async(self, session: Session, user_message: str, reply: str, intent: Optional[str] = None):
+        """add_turn() that does not block the event loop on the backend"""
+        await offload(self.backend, self.add_turn, session, user_message, reply, intent)
+
+    def add_turn(self, session: Session, user_message: str, reply: str, intent: Optional[str] = None):
+        """Append a question and its answer to the session and store it"""
+        session.add_turn(user_message, reply, intent)
+        self.turns += 1
+        self.backend.set(self._key(session.conversation_id),
+                         json.dumps(session.to_json(), separators=(',', ':')).encode('utf-8'), self.ttl_seconds)
+
+    def delete(self, conversation_id: str) -> bool:
+        key = self._key(conversation_id)
+        if self.backend.get(key) is None:
+            return False
+        self.backend.delete(key)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            'loaded': self.loaded,
+            'created': self.created,
+            'turns': self.turns,
+            'ttl_seconds': self.ttl_seconds,
+            'window_messages': self.window_messages,
+        }
+        if not self.shared_backend:
+            stats['backend'] = self.backend.stats()
+        return stats
@@ -0,0 +1,72 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Component states: pending -> loading -> ready or failed
+PENDING = 'pending'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class StartupTracker:
+    """Startup phase timings and the state of each component, as reported by the health endpoints"""
+
+    def __init__(self, started: Optional[float] = None):
+        # perf_counter() reading that uptime and "after_seconds" count from
+        self._started = time.perf_counter() if started is None else started
+        self.phases: Dict[str, float] = {}
+        self.components: Dict[str, Dict[str, Any]] = {}
+
+    def uptime(self) -> float:
+        return time.perf_counter() - self._started
+
+    def record(self, phase: str, seconds: float):
+        self.phases[phase] = round(seconds, 4)
+        logger.info(f"Startup phase {phase} took {seconds:.2f}s")
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as startup phase name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def set_state(self, component: str, state: str, error: Optional[str] = None):
+        """Move component to state; ready and failed components also record when they got there"""
+        now = time.perf_counter()
+        previous = self.components.get(component, {})
+        entry: Dict[str, Any] = {'state': state}
+        if state == LOADING:
+            entry['_loading_since'] = now
+        elif state in (READY, FAILED):
+            entry['after_seconds'] = round(now - self._started, 4)
+            if '_loading_since' in previous:
+                entry['load_seconds'] = round(now - previous['_loading_since'], 4)
+        if error:
+            entry['error'] = error
+        self.components[component] = entry
+
+    def state(self, component: str) -> str:
+        return self.components.get(component, {}).get('state', PENDING)
+
+    def is_ready(self, *components: str) -> bool:
+        return all(self.state(component) == READY for component in components)
+
+    def component_states(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            component: {key: value for key, value in entry.items() if not key.startswith('_')}
+            for component, entry in self.components.items()
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'uptime_seconds': round(self.uptime(), 3),
+            'phases': dict(self.phases),
+            'components': self.component_states(),
+        }
@@ -0,0 +1,168 @@
+import logging
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from .vector_index import top_k
+
+logger = logging.getLogger(__name__)
+
+
+def fit_tfidf(template: TfidfVectorizer, documents: Sequence[str], chunk_size: int = 50000,
+              max_fit_documents: int = 200000) -> Tuple[TfidfVectorizer, sparse.csr_matrix]:
+    """Fit a clone of template and transform documents chunk by chunk with bounded memory
+
+    The vocabulary is chosen from at most max_fit_documents evenly spaced documents;
+    document frequencies and the matrix cover every document. For corpora up to
+    max_fit_documents this gives exactly template.fit_transform(documents).
+    """
+    if not template.use_idf:
+        # Chunked weighting is built around idf; other settings are fitted directly
+        vectorizer = clone(template)
+        return vectorizer, vectorizer.fit_transform(documents).tocsr()
+
+    n_documents = len(documents)
+    chunk_size = max(1, chunk_size)
+    stride = max(1, -(-n_documents // max(1, max_fit_documents)))
+
+    count_params = CountVectorizer().get_params()
+    counter = CountVectorizer(**{
+        name: value for name, value in template.get_params().items() if name in count_params and name != 'dtype'
+    })
+    counter.fit(documents[::stride])
+    n_features = len(counter.vocabulary_)
+
+    # Raw term counts per chunk, plus document frequencies over all chunks
+    chunks = []
+    document_frequency = np.zeros(n_features, dtype=np.int64)
+    for start in range(0, n_documents, chunk_size):
+        counts = counter.transform(documents[start:start + chunk_size]).astype(np.float64)
+        counts.sum_duplicates()
+        document_frequency += np.bincount(counts.indices, minlength=n_features)
+        chunks.append(counts)
+
+    vectorizer = clone(template)
+    vectorizer.vocabulary_ = counter.vocabulary_
+    vectorizer.fixed_vocabulary_ = False
+    if template.smooth_idf:
+        idf = np.log((1 + n_documents) / (1 + document_frequency)) + 1
+    else:
+        idf = np.log(n_documents / np.maximum(document_frequency, 1)) + 1
+    vectorizer.idf_ = idf
+
+    # Weight each chunk and copy it into preallocated CSR arrays, releasing chunks as we go
+    nnz = sum(chunk.nnz for chunk in chunks)
+    data = np.empty(nnz, dtype=np.float64)
+    index_dtype = np.int32 if nnz < 2 ** 31 else np.int64
+    indices = np.empty(nnz, dtype=index_dtype)
+    indptr = np.zeros(n_documents + 1, dtype=index_dtype)
+    offset, row = 0, 0
+    for i, chunk in enumerate(chunks):
+        if template.sublinear_tf:
+            np.log(chunk.data, chunk.data)
+            chunk.data += 1
+        chunk.data *= idf[chunk.indices]
+        if template.norm:
+            chunk = normalize(chunk, norm=template.norm, copy=False)
+
+        data[offset:offset + chunk.nnz] = chunk.data
+        indices[offset:offset + chunk.nnz] = chunk.indices
+        indptr[row + 1:row + chunk.shape[0] + 1] = chunk.indptr[1:] + offset
+        offset += chunk.nnz
+        row += chunk.shape[0]
+        chunks[i] = None
+
+    matrix = sparse.csr_matrix((data, indices, indptr), shape=(n_documents, n_features))
+    return vectorizer, matrix
+
+
+class TfidfScores:
+    """Similarity of one query to every entry, stored sparsely: entries sharing no term score 0"""
+
+    __slots__ = ('ids', 'scores')
+
+    def __init__(self, ids: np.ndarray, scores: np.ndarray):
+        self.ids = ids
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, idx: int) -> float:
+        # Ids are unsorted; a vectorized scan is cheaper than sorting for the few lookups per query
+        positions = np.flatnonzero(self.ids == idx)
+        return float(self.scores[positions[0]]) if len(positions) else 0.0
+
+    def top(self, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores, ids) of the k best scoring entries, best first"""
+        best = top_k(self.scores, k)
+        return self.scores[best], self.ids[best]
+
+
+class TfidfIndex:
+    """Cosine-similarity search over TF-IDF vectors, normalized once at build time
+
+    Vectors are kept term-major (one CSR row of entries per term), so scoring a
+    query is a single sparse product that only reads the postings of its terms.
+    """
+
+    def __init__(self, vectorizer: TfidfVectorizer, matrix: sparse.spmatrix):
+        self.vectorizer = vectorizer
+        matrix = normalize(sparse.csr_matrix(matrix, dtype=np.float64), norm='l2', copy=False)
+        self.postings = matrix.T.tocsr()
+        self.postings.sort_indices()
+
+    def __len__(self) -> int:
+        return self.postings.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.postings.data.nbytes + self.postings.indices.nbytes + self.postings.indptr.nbytes
+
+    def scores(self, text: str) -> TfidfScores:
+        query = self.vectorizer.transform([text])
+        if self.vectorizer.norm != 'l2':
+            query = normalize(query, norm='l2', copy=False)
+        row = query @ self.postings
+        return TfidfScores(row.indices, row.data)
+
+    def vectorize(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        """L2-normalized query vectors of texts, one row each"""
+        queries = self.vectorizer.transform(texts).tocsr()
+        if self.vectorizer.norm != 'l2':
+            queries = normalize(queries, norm='l2', copy=False)
+        return queries
+
+    def scores_batch(self, texts: Sequence[str]) -> List[TfidfScores]:
+        """scores() for many texts with one transform and one sparse product"""
+        return self.query_scores(self.vectorize(texts))
+
+    def query_scores(self, queries: sparse.csr_matrix) -> List[TfidfScores]:
+        """scores() of vectorized queries, one sparse product for all rows"""
+        rows = (queries @ self.postings).tocsr()
+        return [
+            TfidfScores(rows.indices[rows.indptr[i]:rows.indptr[i + 1]], rows.data[rows.indptr[i]:rows.indptr[i + 1]])
+            for i in range(rows.shape[0])
+        ]
+
+    def entry_scores(self, queries: sparse.csr_matrix, ids: Sequence[int]) -> np.ndarray:
+        """Similarity of each vectorized query to one entry (ids[i] for row i), reading one posting per query term"""
+        indptr, indices, data = self.postings.indptr, self.postings.indices, self.postings.data
+        scores = np.zeros(queries.shape[0])
+        for i, idx in enumerate(ids):
+            row = slice(queries.indptr[i], queries.indptr[i + 1])
+            for term, weight in zip(queries.indices[row], queries.data[row]):
+                # Posting rows are sorted by entry
+                start, end = indptr[term], indptr[term + 1]
+                position = start + np.searchsorted(indices[start:end], idx)
+                if position < end and indices[position] == idx:
+                    scores[i] += weight * data[position]
+        return scores
+
+    def search(self, text: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores, ids) of the top-k entries for text, best first"""
+        return self.scores(text).top(k)
@@ -0,0 +1,145 @@
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows as float32 so dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+class VectorIndex:
+    """Base class for cosine-similarity search over normalized float32 vectors"""
+
+    def __init__(self, vectors: np.ndarray, assume_normalized: bool = False):
+        self.vectors = np.asarray(vectors, dtype=np.float32) if assume_normalized else normalize_rows(vectors)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores, ids) of the top-k entries for query, best first"""
+        raise NotImplementedError
+
+    def search_batch(self, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """search() for each row of queries"""
+        return [self.search(query, k) for query in queries]
+
+    def score(self, query: np.ndarray, ids: Sequence[int]) -> np.ndarray:
+        """Exact cosine similarity between query and the given entries"""
+        query = normalize_rows(query)
+        return self.vectors[np.asarray(ids, dtype=np.int64)] @ query
+
+
+class BruteForceIndex(VectorIndex):
+    """Exact search: one matrix-vector product over all entries"""
+
+    # Most query-by-entry scores computed at once by search_batch
+    max_batch_scores = 1 << 24
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        query = normalize_rows(query)
+        scores = self.vectors @ query
+        ids = top_k(scores, k)
+        return scores[ids], ids
+
+    def search_batch(self, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """One matrix-matrix product per block of queries instead of a matrix-vector product each"""
+        queries = normalize_rows(queries)
+        block = max(1, self.max_batch_scores // max(1, len(self.vectors)))
+        results = []
+        for start in range(0, len(queries), block):
+            for scores in queries[start:start + block] @ self.vectors.T:
+                ids = top_k(scores, k)
+                results.append((scores[ids], ids))
+        return results
+
+
+class IVFIndex(VectorIndex):
+    """Inverted-file ANN index: spherical k-means cells, search only the nprobe closest cells"""
+
+    def __init__(self, vectors: np.ndarray, nlist: int = 0, nprobe: int = 8,
+                 assume_normalized: bool = False, train_iterations: int = 10,
+                 max_train_points: int = 64, seed: int = 0):
+        super().__init__(vectors, assume_normalized=assume_normalized)
+        count = len(self.vectors)
+        self.nlist = max(1, min(nlist or int(np.sqrt(count)), count))
+        self.nprobe = max(1, min(nprobe, self.nlist))
+
+        self.centroids = self._train(train_iterations, max_train_points * self.nlist, seed)
+        assignments = self._assign(self.vectors)
+
+        # Entries grouped by cell: ids of cell c are list_ids[list_offsets[c]:list_offsets[c + 1]]
+        self.list_ids = np.argsort(assignments, kind='stable').astype(np.int64)
+        counts = np.bincount(assignments, minlength=self.nlist)
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    def _train(self, iterations: int, max_points: int, seed: int) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        count = len(self.vectors)
+        sample = self.vectors
+        if count > max_points:
+            sample = self.vectors[rng.choice(count, max_points, replace=False)]
+
+        centroids = sample[rng.choice(len(sample), self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(assignments, minlength=self.nlist)
+            order = np.argsort(assignments, kind='stable')
+            sums = np.zeros_like(centroids)
+            non_empty = counts > 0
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[non_empty]
+            sums[non_empty] = np.add.reduceat(sample[order], starts, axis=0)
+            empty = ~non_empty
+            # Re-seed empty cells with random points so every cell stays useful
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize_rows(sums)
+        return centroids
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assignments
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        query = normalize_rows(query)
+        cells = top_k(self.centroids @ query, self.nprobe)
+        candidate_ids = np.concatenate([
+            self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in cells
+        ])
+        scores = self.vectors[candidate_ids] @ query
+        best = top_k(scores, k)
+        return scores[best], candidate_ids[best]
+
+
+def create_vector_index(vectors: np.ndarray, index_type: str = "exact", assume_normalized: bool = False,
+                        nlist: int = 0, nprobe: int = 8) -> Optional[VectorIndex]:
+    """Build a vector index by name ('exact' or 'ivf')"""
+    if vectors is None or len(vectors) == 0:
+        return None
+
+    index_type = index_type.lower()
+    if index_type == "ivf":
+        return IVFIndex(vectors, nlist=nlist, nprobe=nprobe, assume_normalized=assume_normalized)
+    if index_type != "exact":
+        logger.warning(f"Unknown vector index type '{index_type}', using exact search")
+    return BruteForceIndex(vectors, assume_normalized=assume_normalized)
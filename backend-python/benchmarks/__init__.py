@@ -0,0 +1 @@
+# Benchmarks for the AI service. Run from backend-python, e.g. python -m benchmarks.embedding_throughput
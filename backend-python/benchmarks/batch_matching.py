@@ -0,0 +1,62 @@
+"""FAQ matching throughput: one find_best_match per message vs find_best_matches over the batch
+
+Uses a synthetic knowledge base and queries (see kb_loader_throughput) and the
+semantic model from SEMANTIC_MODEL_NAME. Both modes must return the same matches.
+
+Usage: python -m benchmarks.batch_matching [--entries 10000] [--messages 2000] [--chunk-sizes 64,256,1024]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from app.faq_matcher import FAQMatcher
+from benchmarks.kb_loader_throughput import make_rows
+
+
+def same_match(a, b) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return a['question'] == b['question'] and a['match_type'] == b['match_type'] \
+        and abs(a['confidence'] - b['confidence']) < 1e-4
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--chunk-sizes", default="64,256,1024")
+    args = parser.parse_args()
+
+    os.environ.setdefault("INDEX_CACHE_ENABLED", "false")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "kb.json")
+        with open(path, "w") as f:
+            json.dump(list(make_rows(args.entries)), f)
+        matcher = FAQMatcher(path)
+        await matcher.load_knowledge_base()
+    messages = [row["question"] for row in make_rows(args.messages, seed=1)]
+
+    start = time.perf_counter()
+    single = [await matcher.find_best_match(message) for message in messages]
+    single_s = time.perf_counter() - start
+    print(f"entries={args.entries} messages={args.messages}")
+    print(f"{'mode':>16}  {'seconds':>7}  {'msgs/s':>8}  {'speedup':>7}  {'agree':>5}")
+    print(f"{'one at a time':>16}  {single_s:>7.2f}  {len(messages) / single_s:>8.0f}  {'1.0x':>7}  {'-':>5}")
+
+    for chunk_size in [int(size) for size in args.chunk_sizes.split(",")]:
+        matcher.batch_chunk_size = chunk_size
+        start = time.perf_counter()
+        batch = await matcher.find_best_matches(messages)
+        batch_s = time.perf_counter() - start
+        agree = sum(same_match(a, b) for a, b in zip(single, batch)) / len(messages)
+        print(f"{f'batch of {chunk_size}':>16}  {batch_s:>7.2f}  {len(messages) / batch_s:>8.0f}  "
+              f"{single_s / batch_s:>6.1f}x  {agree:>5.2f}")
+
+    matcher.inference_executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""Response cache hit rate on replayed multi-turn traffic, by how cache keys use the conversation
+
+Generates --conversations seeded conversations over the bundled knowledge base:
+an optional greeting, one to three topics (a question, phrased one of several
+ways, then up to two follow-ups such as "and how long does that take?") and an
+optional thanks. Every message is replayed in order against one cache per
+keying scheme:
+
+- short history only: the previous scheme, messages keyed alone and only
+  cached with at most 2 earlier messages
+- full context: keyed by the message and the serialized conversation window
+- rendered context: AnalyzeCache.create_key, keyed by the message and what
+  the prompt shows of the session in canonical form: the rolling hash of the
+  window lines and the summary of older messages
+
+A hit is wrong when a follow-up is answered from a cache entry made for a
+follow-up about another topic. key_us is the time to build the key from the
+request, including the conversation context (sessions update it per turn;
+the full context is serialized from the history).
+
+Usage: python -m benchmarks.context_cache_replay [--conversations 5000] [--seed 0]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+
+from app.cache_keys import message_key
+from app.sessions import WINDOW_MESSAGES, Session
+
+KNOWLEDGE_BASE = os.path.join(os.path.dirname(__file__), "..", "app", "knowledge_base.json")
+
+GREETINGS = ["hi", "Hello!", "hey there", "Good morning"]
+CLOSINGS = ["thanks!", "Thank you", "ok thanks", "great, thanks"]
+FOLLOW_UPS = [
+    "and how long does that take?",
+    "Can I do that online?",
+    "what about international orders?",
+    "is there a fee for that?",
+    "why?",
+    "How do I do it?",
+]
+
+
+def phrasings(question: str):
+    bare = question.rstrip("?")
+    return [question, bare.lower(), f"{bare} ??", f"hi, {bare.lower()}"]
+
+
+def make_conversations(count: int, seed: int):
+    """Lists of (message, topic, intent, is_follow_up); topics are Zipf-distributed"""
+    rng = random.Random(seed)
+    with open(KNOWLEDGE_BASE) as f:
+        entries = json.load(f)
+    weights = [1 / (rank + 1) for rank in range(len(entries))]
+    conversations = []
+    for _ in range(count):
+        turns = []
+        if rng.random() < 0.4:
+            turns.append((rng.choice(GREETINGS), None, "greeting", False))
+        for entry in rng.choices(entries, weights, k=rng.randint(1, 3)):
+            turns.append((rng.choice(phrasings(entry["question"])), entry["question"], entry["intent"], False))
+            for follow_up in rng.sample(FOLLOW_UPS, rng.choices([0, 1, 2], [0.4, 0.4, 0.2])[0]):
+                turns.append((follow_up, entry["question"], entry["intent"], True))
+        if rng.random() < 0.5:
+            turns.append((rng.choice(CLOSINGS), None, "gratitude", False))
+        conversations.append(turns)
+    return conversations
+
+
+def short_history_key(message: str, history: list, session: Session):
+    if len(history) > 2:
+        return None
+    return hashlib.md5(message.lower().strip().encode("utf-8")).hexdigest()
+
+
+def full_context_key(message: str, history: list, session: Session):
+    return message_key(message, json.dumps(history[-WINDOW_MESSAGES:]))
+
+
+def rendered_context_key(message: str, history: list, session: Session):
+    return message_key(message, session.context().key)
+
+
+SCHEMES = [
+    ("short history only", short_history_key),
+    ("full context", full_context_key),
+    ("rendered context", rendered_context_key),
+]
+
+
+def replay(conversations, create_key):
+    cache = {}
+    row = {"requests": 0, "cacheable": 0, "hits": 0, "follow_ups": 0, "follow_up_hits": 0, "wrong_hits": 0}
+    key_seconds = 0.0
+    for turns in conversations:
+        history = []
+        session = Session("replay")
+        for message, topic, intent, is_follow_up in turns:
+            row["requests"] += 1
+            row["follow_ups"] += is_follow_up
+            start = time.perf_counter()
+            key = create_key(message, history, session)
+            key_seconds += time.perf_counter() - start
+            if key is not None:
+                row["cacheable"] += 1
+                if key in cache:
+                    row["hits"] += 1
+                    row["follow_up_hits"] += is_follow_up
+                    cached_topic, cached_follow_up = cache[key]
+                    row["wrong_hits"] += is_follow_up and cached_follow_up and cached_topic != topic
+                else:
+                    cache[key] = (topic, is_follow_up)
+            reply = f"answer about {topic or intent}"
+            history += [{"role": "user", "content": message}, {"role": "assistant", "content": reply}]
+            session.add_turn(message, reply, intent)
+    row["key_us"] = key_seconds / row["requests"] * 1e6
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    conversations = make_conversations(args.conversations, args.seed)
+    print(f"conversations={args.conversations} messages={sum(map(len, conversations))}")
+    print(f"{'scheme':>18}  {'cacheable':>9}  {'hit rate':>8}  {'follow-up hit rate':>18}  {'wrong hits':>10}  {'key_us':>6}")
+    for name, create_key in SCHEMES:
+        row = replay(conversations, create_key)
+        print(f"{name:>18}  {row['cacheable'] / row['requests']:>9.1%}  {row['hits'] / row['requests']:>8.1%}  "
+              f"{row['follow_up_hits'] / max(1, row['follow_ups']):>18.1%}  {row['wrong_hits']:>10}  {row['key_us']:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
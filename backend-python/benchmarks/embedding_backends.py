@@ -0,0 +1,150 @@
+"""Embedding backends (fp32, int8, torchscript, onnx): drift from fp32, latency and memory
+
+Each backend runs in a fresh process that loads it, embeds the FAQ questions and
+a set of customer queries, and times single-query and batched encoding. Drift is
+measured against fp32 on the FAQ set: cosine between each text's embeddings,
+the largest change in any query-to-FAQ similarity, and how often the best
+matching FAQ for a query stays the same.
+
+Usage: python -m benchmarks.embedding_backends [--backends fp32,int8,torchscript,onnx] [--kb app/knowledge_base.json]
+"""
+import argparse
+import ctypes
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+QUERIES = [
+    "when are you open", "are you open on weekends", "how do i reach support", "can i talk to someone",
+    "i want my money back", "how do returns work", "where is my package", "my order hasn't arrived",
+    "do you ship to canada", "can you deliver abroad", "i forgot my password", "can't log into my account",
+    "what payment methods do you take", "how do i cancel my subscription", "is there a warranty",
+]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def release_free_memory():
+    """Collect garbage and hand free heap pages back to the OS, so RSS shows what is retained"""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def measure(backend: str, model: str, kb: str, output: str, repeats: int) -> dict:
+    """Runs in the child process"""
+    import torch
+    from app.embeddings import load_encoder
+    from app.vector_index import normalize_rows
+    from benchmarks.embedding_throughput import make_texts
+
+    with open(kb) as f:
+        questions = [faq["question"] for faq in json.load(f)]
+
+    release_free_memory()
+    baseline = rss_mb()
+    start = time.perf_counter()
+    encoder = load_encoder(model, backend, export_dir=os.path.join(tempfile.gettempdir(), "embedding_backends"))
+    load_s = time.perf_counter() - start
+    encoder.encode(QUERIES[:2])  # warm-up (first onnx session, TorchScript profiling runs)
+    encoder.encode(QUERIES[:2])
+    release_free_memory()
+    model_mb = rss_mb() - baseline
+
+    np.save(output, normalize_rows(encoder.encode(questions + QUERIES).numpy()))
+
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        encoder.encode([QUERIES[i % len(QUERIES)]])
+        latencies.append(time.perf_counter() - start)
+
+    texts = make_texts(512)
+    start = time.perf_counter()
+    encoder.encode(texts, batch_size=32)
+    batch_s = time.perf_counter() - start
+
+    return {
+        "load_s": load_s,
+        "model_mb": model_mb,
+        "rss_mb": rss_mb(),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "texts_per_s": len(texts) / batch_s,
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def drift(embeddings: np.ndarray, baseline: np.ndarray, faq_count: int) -> dict:
+    cosine = np.sum(embeddings * baseline, axis=1)
+    similarities = embeddings[faq_count:] @ embeddings[:faq_count].T
+    baseline_similarities = baseline[faq_count:] @ baseline[:faq_count].T
+    agree = np.argmax(similarities, axis=1) == np.argmax(baseline_similarities, axis=1)
+    return {
+        "min_cosine": float(cosine.min()),
+        "max_similarity_delta": float(np.abs(similarities - baseline_similarities).max()),
+        "top1_agreement": float(agree.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", default="fp32,int8,torchscript,onnx")
+    parser.add_argument("--model", default=os.getenv("SEMANTIC_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--kb", default="app/knowledge_base.json")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--child", nargs=2, metavar=("BACKEND", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], args.model, args.kb, args.child[1], args.repeats)))
+        return
+
+    with open(args.kb) as f:
+        faq_count = len(json.load(f))
+
+    backends = args.backends.split(",")
+    if "fp32" not in backends:
+        backends.insert(0, "fp32")
+
+    print(f"model={args.model} faqs={faq_count} queries={len(QUERIES)}")
+    print(f"{'backend':>11}  {'load_s':>6}  {'model MB':>8}  {'RSS MB':>7}  {'p50_ms':>7}  {'p99_ms':>7}  "
+          f"{'texts/s':>8}  {'min cos':>7}  {'max Δsim':>8}  {'top1 agree':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for backend in backends:
+            output = os.path.join(directory, f"{backend}.npy")
+            command = [sys.executable, "-m", "benchmarks.embedding_backends", "--model", args.model, "--kb", args.kb,
+                       "--repeats", str(args.repeats), "--child", backend, output]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f"{backend:>11}  failed: {completed.stderr.strip().splitlines()[-1]}")
+                continue
+
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            embeddings = np.load(output)
+            if baseline is None:
+                baseline = embeddings
+            result.update(drift(embeddings, baseline, faq_count))
+            print(f"{backend:>11}  {result['load_s']:>6.2f}  {result['model_mb']:>8.1f}  {result['rss_mb']:>7.1f}  "
+                  f"{result['p50_ms']:>7.2f}  {result['p99_ms']:>7.2f}  {result['texts_per_s']:>8.1f}  "
+                  f"{result['min_cosine']:>7.4f}  {result['max_similarity_delta']:>8.4f}  {result['top1_agreement']:>10.2f}",
+                  flush=True)
+
+
+if __name__ == "__main__":
+    main()
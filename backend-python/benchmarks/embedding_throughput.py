@@ -0,0 +1,54 @@
+"""Embedding throughput (texts/sec) of the batched encoder at different batch sizes
+
+Usage: python -m benchmarks.embedding_throughput [--texts 2000] [--batch-sizes 1,8,32,64,128]
+"""
+import argparse
+import os
+import random
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+from app.embeddings import BatchedEncoder
+
+WORDS = (
+    "order track shipping refund return password reset account billing invoice "
+    "delivery international support contact hours open closed product warranty "
+    "payment card subscription cancel upgrade login email phone status late"
+).split()
+
+
+def make_texts(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(4, 24))) + "?" for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=os.getenv("SEMANTIC_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="1,8,16,32,64,128")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModel.from_pretrained(args.model).eval()
+    texts = make_texts(args.texts)
+
+    print(f"model={args.model} texts={len(texts)} torch_threads={torch.get_num_threads()}")
+    print(f"{'batch_size':>10}  {'seconds':>8}  {'texts/sec':>10}")
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        encoder = BatchedEncoder(tokenizer, model, batch_size=batch_size)
+        encoder.encode(texts[:batch_size])  # warm-up
+        start = time.perf_counter()
+        encoder.encode(texts)
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>10}  {elapsed:>8.2f}  {len(texts) / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Bytes per FAQ entry: list of dicts (previous representation) vs the columnar FAQStore
+
+Memory is measured with tracemalloc as the allocations still held once each
+representation is built (numpy buffers are included). Also times building a
+match result, which used to copy fields into a new dict.
+
+Usage: python -m benchmarks.faq_store_memory [--rows 1000000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from app.faq_store import FAQMatch, FAQStore
+from benchmarks.kb_loader_throughput import make_rows
+
+
+def retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows = args.rows
+    entries, dict_bytes, dict_peak = retained_bytes(lambda: list(make_rows(rows)))
+    store, store_bytes, store_peak = retained_bytes(lambda: FAQStore.from_entries(entries))
+
+    print(f"rows={rows}")
+    print(f"{'representation':>15}  {'MB':>8}  {'bytes/entry':>11}  {'build peak MB':>13}")
+    print(f"{'list of dicts':>15}  {dict_bytes / 2**20:>8.1f}  {dict_bytes / rows:>11.0f}  {dict_peak / 2**20:>13.1f}")
+    print(f"{'FAQStore':>15}  {store_bytes / 2**20:>8.1f}  {store_bytes / rows:>11.0f}  {store_peak / 2**20:>13.1f}")
+
+    positions = list(range(0, rows, max(1, rows // 100000)))
+    start = time.perf_counter()
+    for i in positions:
+        faq = entries[i]
+        result = {'question': faq['question'], 'response': faq['response'], 'intent': faq['intent'],
+                  'confidence': 0.9, 'match_type': 'tfidf'}
+        result['response']
+    dict_ns = (time.perf_counter() - start) / len(positions) * 1e9
+
+    start = time.perf_counter()
+    for i in positions:
+        result = FAQMatch(store, i, 0.9, 'tfidf')
+        result['response']
+    view_ns = (time.perf_counter() - start) / len(positions) * 1e9
+
+    start = time.perf_counter()
+    for i in positions:
+        store.find(entries[i]['question'])
+    find_ns = (time.perf_counter() - start) / len(positions) * 1e9
+
+    print(f"match result + read response: dict copy {dict_ns:.0f} ns, FAQMatch view {view_ns:.0f} ns")
+    print(f"question lookup (FAQStore.find): {find_ns:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
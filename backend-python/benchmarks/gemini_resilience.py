@@ -0,0 +1,124 @@
+"""Gemini path under injected faults, with and without the circuit breaker and adaptive concurrency
+
+Runs benchmarks.gemini_stub in-process and keeps --concurrency clients calling
+GeminiResponseGenerator.generate_response (distinct messages, so nothing is
+cached) through phases: healthy, outage (every call fails with 503), slow
+(latency x10) and recovered. Per phase it reports answer latency, how many
+replies were produced locally instead of by Gemini, how many calls reached Gemini, the most it saw at once,
+and the breaker state and concurrency limit at the end of the phase.
+
+Usage: python -m benchmarks.gemini_resilience [--concurrency 32] [--phase-seconds 5] [--intent-mode separate]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import time
+
+import httpx
+import numpy as np
+import uvicorn
+
+from app.metrics import GEMINI_FALLBACKS
+from benchmarks import gemini_stub
+
+PHASES = [
+    ("healthy", {'latency_ms': 100.0, 'error_rate': 0.0}),
+    ("outage", {'latency_ms': 100.0, 'error_rate': 1.0}),
+    ("slow", {'latency_ms': 1000.0, 'error_rate': 0.0}),
+    ("recovered", {'latency_ms': 100.0, 'error_rate': 0.0}),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def fallback_replies() -> float:
+    return GEMINI_FALLBACKS.value('template_reply') + GEMINI_FALLBACKS.value('fallback_response')
+
+
+async def run_mode(protected: bool, base_url: str, args) -> list:
+    os.environ.update(
+        GEMINI_BREAKER_ENABLED=str(protected).lower(),
+        GEMINI_ADAPTIVE_CONCURRENCY=str(protected).lower(),
+        GEMINI_BREAKER_OPEN_SECONDS=str(args.open_seconds),
+        GEMINI_MAX_CONCURRENCY=str(args.max_concurrency),
+        GEMINI_API_BASE_URL=f"{base_url}/v1beta",
+        GEMINI_INTENT_MODE=args.intent_mode,
+        GOOGLE_API_KEY="benchmark",
+    )
+    from app.gemini_response import GeminiResponseGenerator
+    generator = GeminiResponseGenerator()
+    await generator.load_models()
+
+    rows = []
+    counter = 0
+    async with httpx.AsyncClient(base_url=base_url) as stub:
+        for name, settings in PHASES:
+            await stub.post("/settings", json=settings)
+            await stub.post("/stats/reset")
+            latencies = []
+            fallbacks_before = fallback_replies()
+            phase_end = time.perf_counter() + args.phase_seconds
+
+            async def client():
+                nonlocal counter
+                while time.perf_counter() < phase_end:
+                    counter += 1
+                    start = time.perf_counter()
+                    await generator.generate_response(f"question number {counter} about my order")
+                    latencies.append(time.perf_counter() - start)
+
+            await asyncio.gather(*(client() for _ in range(args.concurrency)))
+            calls = (await stub.get("/stats")).json()
+            upstream = generator.upstream_stats()
+            rows.append({
+                "phase": name,
+                "answers": len(latencies),
+                "p50_ms": float(np.percentile(latencies, 50) * 1000),
+                "p99_ms": float(np.percentile(latencies, 99) * 1000),
+                "fallbacks": int(fallback_replies() - fallbacks_before),
+                "gemini_calls": calls['calls'],
+                "max_in_flight": calls['max_in_flight'],
+                "circuit": upstream['circuit_breaker']['state'] if upstream['circuit_breaker'] else "-",
+                "limit": upstream['concurrency']['limit'],
+            })
+    await generator.close()
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--phase-seconds", type=float, default=5.0)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--open-seconds", type=float, default=2.0)
+    # 'separate' makes two Gemini calls per answer (intent, then reply)
+    parser.add_argument("--intent-mode", default="separate")
+    args = parser.parse_args()
+
+    port = free_port()
+    gemini_stub.settings.update(jitter_ms=10.0, error_status=503)
+    server = uvicorn.Server(uvicorn.Config(gemini_stub.app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    print(f"concurrency={args.concurrency} phase_seconds={args.phase_seconds} intent_mode={args.intent_mode}")
+    print(f"{'mode':>11}  {'phase':>9}  {'answers':>7}  {'p50_ms':>7}  {'p99_ms':>7}  {'fallbacks':>9}  "
+          f"{'gemini calls':>12}  {'max in flight':>13}  {'circuit':>9}  {'limit':>5}")
+    for protected in (False, True):
+        for row in await run_mode(protected, f"http://127.0.0.1:{port}", args):
+            print(f"{'protected' if protected else 'fixed':>11}  {row['phase']:>9}  {row['answers']:>7}  "
+                  f"{row['p50_ms']:>7.0f}  {row['p99_ms']:>7.0f}  {row['fallbacks']:>9}  {row['gemini_calls']:>12}  "
+                  f"{row['max_in_flight']:>13}  {row['circuit']:>9}  {row['limit']:>5}", flush=True)
+
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
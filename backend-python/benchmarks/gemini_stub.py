@@ -0,0 +1,108 @@
+"""Local stand-in for the Gemini generateContent REST API
+
+Point the service at it with GEMINI_API_BASE_URL=http://127.0.0.1:8765/v1beta.
+Latency and failures can be injected to exercise timeouts, retries, fallbacks and
+the circuit breaker; GET /stats counts the calls that reached the stub.
+
+Usage: python -m benchmarks.gemini_stub [--port 8765] [--latency-ms 200] [--error-rate 0.1] [--error-status 503]
+"""
+import argparse
+import asyncio
+import json
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+settings = {'latency_ms': 200.0, 'jitter_ms': 50.0, 'error_rate': 0.0, 'error_status': 503}
+counters = {'calls': 0, 'failures': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+app = FastAPI(title="Gemini stub")
+
+
+def stub_reply(prompt: str, json_mode: bool = False) -> str:
+    if "Classify the following customer support message" in prompt:
+        return "general"
+    reply = "Thanks for reaching out! This is a stubbed Gemini reply for load testing."
+    if json_mode:
+        return json.dumps({'intent': 'general', 'reply': reply})
+    return reply
+
+
+async def stream_chunks(reply: str):
+    words = reply.split(" ")
+    for position in range(0, len(words), 3):
+        text = " ".join(words[position:position + 3]) + (" " if position + 3 < len(words) else "")
+        chunk = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}}]}
+        yield f"data: {json.dumps(chunk)}\r\n\r\n"
+        await asyncio.sleep(settings['latency_ms'] / 10000)
+
+
+@app.post("/v1beta/models/{model_action}")
+async def generate_content(model_action: str, request: Request):
+    payload = await request.json()
+    counters['calls'] += 1
+    counters['in_flight'] += 1
+    counters['max_in_flight'] = max(counters['max_in_flight'], counters['in_flight'])
+    latency = max(0.0, settings['latency_ms'] + random.uniform(-1, 1) * settings['jitter_ms'])
+    try:
+        await asyncio.sleep(latency / 1000)
+    finally:
+        counters['in_flight'] -= 1
+
+    if random.random() < settings['error_rate']:
+        counters['failures'] += 1
+        return JSONResponse(status_code=settings['error_status'], content={'error': {'message': 'injected failure'}})
+
+    prompt = "".join(part.get('text', '') for part in payload['contents'][-1]['parts'])
+    json_mode = (payload.get('generationConfig') or {}).get('responseMimeType') == 'application/json'
+    reply = stub_reply(prompt, json_mode)
+
+    if model_action.endswith(":streamGenerateContent"):
+        return StreamingResponse(stream_chunks(reply), media_type="text/event-stream")
+
+    return {
+        'candidates': [{
+            'content': {'role': 'model', 'parts': [{'text': reply}]},
+            'finishReason': 'STOP'
+        }]
+    }
+
+
+@app.post("/settings")
+async def update_settings(request: Request):
+    """Change latency/error injection while the stub is running"""
+    settings.update({k: v for k, v in (await request.json()).items() if k in settings})
+    return settings
+
+
+@app.get("/stats")
+async def stats():
+    """Calls received, injected failures, and concurrent calls (now and at most), since the last reset"""
+    return counters
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    counters.update(calls=0, failures=0, max_in_flight=counters['in_flight'])
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=settings['latency_ms'])
+    parser.add_argument("--jitter-ms", type=float, default=settings['jitter_ms'])
+    parser.add_argument("--error-rate", type=float, default=settings['error_rate'])
+    parser.add_argument("--error-status", type=int, default=settings['error_status'])
+    args = parser.parse_args()
+
+    settings.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                    error_rate=args.error_rate, error_status=args.error_status)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Knowledge base loading: rows/sec and peak RSS for JSON, JSON Lines and CSV files
+
+Each measurement runs in a fresh process so peak RSS is not polluted by earlier
+runs. 'json-whole' is the previous loader: read the file into one string, then
+json.loads and TfidfVectorizer.fit_transform over everything.
+
+Usage: python -m benchmarks.kb_loader_throughput [--rows 1000000] [--formats jsonl,csv,json-whole] [--no-tfidf]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+INTENTS = ["order_tracking", "return_policy", "billing", "account", "shipping_info", "product_info", "general"]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss survives exec on Linux, so it would include the parent's peak; prefer VmHWM
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def make_rows(count: int, seed: int = 0):
+    from benchmarks.embedding_throughput import WORDS  # imports torch, so kept out of the measured children
+
+    rng = random.Random(seed)
+    for i in range(count):
+        question = " ".join(rng.choices(WORDS, k=rng.randint(4, 16))) + f" #{i}?"
+        yield {
+            "question": question,
+            "response": " ".join(rng.choices(WORDS, k=rng.randint(15, 40))) + ".",
+            "intent": rng.choice(INTENTS),
+            "keywords": rng.sample(WORDS, 3),
+        }
+
+
+def write_files(directory: str, rows: int) -> dict:
+    from app.kb_loader import write_knowledge_base
+
+    paths = {name: os.path.join(directory, f"kb.{name}") for name in ("json", "jsonl", "csv")}
+    for path in paths.values():
+        write_knowledge_base(path, make_rows(rows))
+    return paths
+
+
+def measure(mode: str, path: str, tfidf: bool) -> dict:
+    """Runs in the child process"""
+    start = time.perf_counter()
+    if mode == "json-whole":
+        with open(path) as f:
+            entries = json.loads(f.read())
+        parsed = time.perf_counter()
+        if tfidf:
+            _tfidf_template().fit_transform([faq["question"] for faq in entries])
+    else:
+        from app.kb_loader import KnowledgeBaseReader
+        from app.tfidf_index import fit_tfidf
+
+        entries = KnowledgeBaseReader(path, chunk_size=10000).read_all()
+        parsed = time.perf_counter()
+        if tfidf:
+            fit_tfidf(_tfidf_template(), [faq["question"] for faq in entries])
+    end = time.perf_counter()
+
+    return {
+        "rows": len(entries),
+        "parse_s": parsed - start,
+        "total_s": end - start,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def _tfidf_template():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return TfidfVectorizer(stop_words="english", ngram_range=(1, 2), max_features=1000, lowercase=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--formats", default="jsonl,csv,json-whole")
+    parser.add_argument("--no-tfidf", action="store_true", help="only parse and validate")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], args.child[1], not args.no_tfidf)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"writing {args.rows} rows ...", flush=True)
+        paths = write_files(directory, args.rows)
+        print(f"{'format':>10}  {'MB':>7}  {'rows':>9}  {'parse rows/s':>12}  {'total rows/s':>12}  {'peak RSS MB':>11}")
+        for mode in args.formats.split(","):
+            path = paths["json" if mode == "json-whole" else mode]
+            command = [sys.executable, "-m", "benchmarks.kb_loader_throughput", "--child", mode, path]
+            if args.no_tfidf:
+                command.append("--no-tfidf")
+            result = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"{mode:>10}  {size_mb:>7.1f}  {result['rows']:>9}  {result['rows'] / result['parse_s']:>12.0f}  "
+                  f"{result['rows'] / result['total_s']:>12.0f}  {result['peak_rss_mb']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Keyword fast path precision: which answers it gives, against the full pipeline's, on the bundled knowledge base
+
+Queries are generated per entry, so the right answer is known: the question
+phrased several ways, and messages built from two or three of the entry's
+keywords, sometimes with a keyword of another entry mixed in. Every query is
+matched with the fast path off (the full pipeline), with the keyword rule
+alone (KEYWORD_FAST_PATH_MIN_TFIDF=0) and with the TF-IDF agreement check.
+
+For each mode: the share of queries the fast path answered, how many of those
+answers are right (precision) and the same as the full pipeline's (agree),
+and the accuracy over all queries. Uses the semantic model from
+SEMANTIC_MODEL_NAME.
+
+Usage: python -m benchmarks.keyword_fast_path [--queries 3000] [--seed 0] [--min-tfidf 0.4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from app.faq_matcher import FAQMatcher
+
+KNOWLEDGE_BASE = os.path.join(os.path.dirname(__file__), "..", "app", "knowledge_base.json")
+
+KEYWORD_TEMPLATES = [
+    "{}",
+    "question about {}",
+    "I need help with {}",
+    "hi, {} please",
+    "what is your policy on {}?",
+]
+
+
+def make_queries(entries, count: int, seed: int):
+    """(message, question of the entry it was made from)"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        entry = rng.choice(entries)
+        if rng.random() < 0.3:
+            bare = entry["question"].rstrip("?")
+            message = rng.choice([entry["question"], bare.lower(), f"{bare} ??", f"hi, {bare.lower()}"])
+        else:
+            keywords = rng.sample(entry["keywords"], rng.randint(2, min(3, len(entry["keywords"]))))
+            if rng.random() < 0.3:
+                other = rng.choice([e for e in entries if e is not entry])
+                keywords.insert(rng.randrange(len(keywords) + 1), rng.choice(other["keywords"]))
+            message = rng.choice(KEYWORD_TEMPLATES).format(" ".join(keywords))
+        queries.append((message, entry["question"]))
+    return queries
+
+
+async def run(matcher: FAQMatcher, queries):
+    start = time.perf_counter()
+    matches = [await matcher.find_best_match(message) for message, _ in queries]
+    return matches, (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def answer(match):
+    return match["question"] if match else None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-tfidf", type=float, default=0.4)
+    args = parser.parse_args()
+
+    with open(KNOWLEDGE_BASE) as f:
+        entries = json.load(f)
+    queries = make_queries(entries, args.queries, args.seed)
+
+    os.environ.setdefault("INDEX_CACHE_ENABLED", "false")
+    matcher = FAQMatcher(KNOWLEDGE_BASE)
+    await matcher.load_knowledge_base()
+
+    matcher.keyword_fast_path_enabled = False
+    full, full_us = await run(matcher, queries)
+    print(f"entries={len(entries)} queries={len(queries)}")
+    print(f"{'mode':>16}  {'fast path':>9}  {'precision':>9}  {'agree':>6}  {'accuracy':>8}  {'mean conf':>9}  {'us/query':>8}")
+    accuracy = sum(answer(m) == truth for m, (_, truth) in zip(full, queries)) / len(queries)
+    print(f"{'full pipeline':>16}  {'-':>9}  {'-':>9}  {'-':>6}  {accuracy:>8.1%}  {'-':>9}  {full_us:>8.0f}")
+
+    matcher.keyword_fast_path_enabled = True
+    for name, min_tfidf in [("keywords only", 0.0), (f"TF-IDF >= {args.min_tfidf}", args.min_tfidf)]:
+        matcher.keyword_min_tfidf = min_tfidf
+        matches, us = await run(matcher, queries)
+        fast = [(m, truth, baseline) for m, (_, truth), baseline in zip(matches, queries, full)
+                if m and m["match_type"] == "keyword"]
+        precision = sum(answer(m) == truth for m, truth, _ in fast) / max(1, len(fast))
+        agree = sum(answer(m) == answer(baseline) for m, _, baseline in fast) / max(1, len(fast))
+        accuracy = sum(answer(m) == truth for m, (_, truth) in zip(matches, queries)) / len(queries)
+        confidence = sum(m["confidence"] for m, _, _ in fast) / max(1, len(fast))
+        print(f"{name:>16}  {len(fast) / len(queries):>9.1%}  {precision:>9.1%}  {agree:>6.1%}  {accuracy:>8.1%}  "
+              f"{confidence:>9.2f}  {us:>8.0f}")
+
+    matcher.inference_executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
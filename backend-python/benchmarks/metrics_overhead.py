@@ -0,0 +1,71 @@
+"""Cost of the latency instrumentation: per observation, per /analyze request and per scrape
+
+An uncached /analyze that reaches Gemini records about a dozen observations
+(request, cache lookups, faq_match, keyword, tfidf, embedding, similarity,
+Gemini call, response counter); the per-request figure assumes that many.
+
+Usage: python -m benchmarks.metrics_overhead [--iterations 200000] [--threads 4]
+"""
+import argparse
+import threading
+import time
+
+from app.metrics import MetricsRegistry
+
+STAGES = ["cache_lookup", "faq_match", "keyword", "tfidf", "embedding", "similarity",
+          "semantic_cache_lookup", "gemini_combined", "gemini_generate", "gemini_classify"]
+OBSERVATIONS_PER_REQUEST = 12
+
+
+def per_call_ns(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram("stage_seconds", "stages", ("stage",))
+    counter = registry.counter("responses_total", "responses", ("source",))
+
+    baseline = per_call_ns(lambda i: None, args.iterations)
+    observe = per_call_ns(lambda i: histogram.observe(0.003, STAGES[i % len(STAGES)]), args.iterations) - baseline
+
+    def timed(i):
+        with histogram.time(STAGES[i % len(STAGES)]):
+            pass
+    timer = per_call_ns(timed, args.iterations) - baseline
+    inc = per_call_ns(lambda i: counter.inc("faq"), args.iterations) - baseline
+
+    # Same observations from several threads at once, as from the inference pool
+    def worker():
+        for i in range(args.iterations // args.threads):
+            histogram.observe(0.003, STAGES[i % len(STAGES)])
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    contended = (time.perf_counter() - start) / (args.iterations // args.threads * args.threads) * 1e9
+
+    start = time.perf_counter()
+    text = registry.render()
+    render_ms = (time.perf_counter() - start) * 1000
+
+    print(f"observe:              {observe:8.0f} ns")
+    print(f"timer (with block):   {timer:8.0f} ns")
+    print(f"counter inc:          {inc:8.0f} ns")
+    print(f"observe, {args.threads} threads:   {contended:8.0f} ns")
+    print(f"per request (~{OBSERVATIONS_PER_REQUEST} obs):  {OBSERVATIONS_PER_REQUEST * timer / 1000:8.1f} us")
+    print(f"render /metrics:      {render_ms:8.2f} ms ({len(text)} bytes, {len(STAGES)} stages)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Load benchmark for semantic FAQ matching with and without micro-batching
+
+Fires concurrent single-message queries at FAQMatcher's semantic search path and
+reports p50/p99 latency and throughput for each mode.
+
+Usage: python -m benchmarks.micro_batching_load [--concurrency 32] [--requests 2000]
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from app.faq_matcher import FAQMatcher
+from app.micro_batcher import MicroBatcher
+from benchmarks.embedding_throughput import make_texts
+
+
+async def run_load(matcher: FAQMatcher, messages: list, concurrency: int):
+    latencies = []
+    queue = asyncio.Queue()
+    for message in messages:
+        queue.put_nowait(message)
+
+    async def client():
+        while not queue.empty():
+            message = queue.get_nowait()
+            start = time.perf_counter()
+            await matcher._compute_semantic_similarity(message)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return np.array(latencies) * 1000, len(messages) / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    matcher = FAQMatcher()
+    matcher.inference_executor.max_queue_size = max(matcher.inference_executor.max_queue_size, args.concurrency)
+    await matcher.load_knowledge_base()
+    messages = make_texts(args.requests, seed=1)
+    batcher = MicroBatcher(
+        matcher._semantic_search_batch,
+        matcher.inference_executor,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms
+    )
+
+    print(f"concurrency={args.concurrency} requests={args.requests}")
+    print(f"{'mode':<12}  {'p50_ms':>8}  {'p99_ms':>8}  {'req/sec':>8}")
+    for mode, micro_batcher in (("unbatched", None), ("batched", batcher)):
+        matcher.micro_batcher = micro_batcher
+        await run_load(matcher, messages[:args.concurrency], args.concurrency)  # warm-up
+        latencies, throughput = await run_load(matcher, messages, args.concurrency)
+        print(f"{mode:<12}  {np.percentile(latencies, 50):>8.2f}  {np.percentile(latencies, 99):>8.2f}  {throughput:>8.1f}")
+    print(f"batcher: {batcher.stats()}")
+    matcher.inference_executor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
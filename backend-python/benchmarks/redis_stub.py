@@ -0,0 +1,107 @@
+"""Minimal in-memory server speaking the Redis protocol (RESP), for local cache testing
+
+Supports the commands the cache backend uses: HELLO, PING, GET, SET (EX/PX), DEL, FLUSHDB, DBSIZE, INFO.
+Point the service at it with CACHE_BACKEND=redis REDIS_URL=redis://127.0.0.1:6390/0.
+
+Usage: python -m benchmarks.redis_stub [--port 6390]
+"""
+import argparse
+import asyncio
+import time
+
+store = {}  # key -> (value, expires_at or None)
+
+
+def encode(value, resp3: bool = False) -> bytes:
+    if value is None:
+        return b"_\r\n" if resp3 else b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+" + value.encode() + b"\r\n"
+    if isinstance(value, dict):  # RESP3 map, only sent after HELLO 3
+        return b"%%%d\r\n" % len(value) + b"".join(encode(k, True) + encode(v, True) for k, v in value.items())
+    if isinstance(value, Exception):
+        return b"-ERR " + str(value).encode() + b"\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def lookup(key: bytes):
+    entry = store.get(key)
+    if entry and entry[1] is not None and time.monotonic() > entry[1]:
+        del store[key]
+        return None
+    return entry[0] if entry else None
+
+
+def execute(args):
+    command = args[0].upper()
+    if command == b"PING":
+        return "PONG"
+    if command == b"GET":
+        return lookup(args[1])
+    if command == b"SET":
+        expires_at = None
+        options = [a.upper() for a in args[3:]]
+        if b"PX" in options:
+            expires_at = time.monotonic() + int(args[3 + options.index(b"PX") + 1]) / 1000
+        elif b"EX" in options:
+            expires_at = time.monotonic() + int(args[3 + options.index(b"EX") + 1])
+        store[args[1]] = (args[2], expires_at)
+        return "OK"
+    if command == b"DEL":
+        return sum(1 for key in args[1:] if store.pop(key, None) is not None)
+    if command == b"FLUSHDB":
+        store.clear()
+        return "OK"
+    if command == b"DBSIZE":
+        return len(store)
+    if command == b"INFO":
+        # The stub never evicts
+        return b"# Stats\r\nevicted_keys:0\r\n"
+    if command == b"HELLO":
+        protocol = int(args[1]) if len(args) > 1 else 2
+        return {b"server": b"redis-stub", b"proto": protocol}
+    if command in (b"CLIENT", b"SELECT"):
+        return "OK"
+    return ValueError(f"unknown command '{command.decode()}'")
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    resp3 = False
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            count = int(line[1:].strip())
+            args = []
+            for _ in range(count):
+                length = int((await reader.readline())[1:].strip())
+                args.append((await reader.readexactly(length + 2))[:-2])
+            if args[0].upper() == b"HELLO" and len(args) > 1:
+                resp3 = args[1] == b"3"
+            writer.write(encode(execute(args), resp3))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int):
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
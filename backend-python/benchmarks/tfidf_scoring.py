@@ -0,0 +1,68 @@
+"""TF-IDF query latency: sklearn cosine_similarity + argsort vs TfidfIndex (one sparse product + argpartition)
+
+Questions are synthetic and drawn from a small vocabulary, so most entries share
+a term with every query; this is close to the worst case for the sparse path.
+
+Usage: python -m benchmarks.tfidf_scoring [--sizes 10,1000,100000,1000000] [--queries 100]
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app.tfidf_index import TfidfIndex, fit_tfidf
+from benchmarks.kb_loader_throughput import make_rows
+
+
+def previous_top3(vectorizer, matrix, query: str):
+    """What FAQMatcher did before: renormalize everything, go through a list, full argsort"""
+    scores = cosine_similarity(vectorizer.transform([query]), matrix).flatten().tolist()
+    best = int(np.argmax(scores))
+    return best, np.argsort(scores)[-3:]
+
+
+def percentiles(latencies):
+    latencies = np.array(latencies) * 1000
+    return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10,1000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    template = TfidfVectorizer(stop_words="english", ngram_range=(1, 2), max_features=1000, lowercase=True)
+    print(f"{'entries':>9}  {'build_s':>7}  {'old p50_ms':>10}  {'old p99_ms':>10}  "
+          f"{'new p50_ms':>10}  {'new p99_ms':>10}  {'speedup':>7}  {'top1 agree':>10}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        questions = [row["question"] for row in make_rows(size)]
+        queries = [row["question"].lower() for row in make_rows(args.queries, seed=1)]
+
+        vectorizer, matrix = fit_tfidf(template, questions)
+        start = time.perf_counter()
+        index = TfidfIndex(vectorizer, matrix)
+        build = time.perf_counter() - start
+
+        old, new, agree = [], [], 0
+        for query in queries:
+            start = time.perf_counter()
+            best, _ = previous_top3(vectorizer, matrix, query)
+            old.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            scores, ids = index.search(query, 3)
+            new.append(time.perf_counter() - start)
+            # Ties may be broken differently, so compare scores rather than ids
+            agree += bool(len(ids)) and np.isclose(scores[0], index.scores(query)[best])
+
+        old_p50, old_p99 = percentiles(old)
+        new_p50, new_p99 = percentiles(new)
+        print(f"{size:>9}  {build:>7.2f}  {old_p50:>10.3f}  {old_p99:>10.3f}  {new_p50:>10.3f}  "
+              f"{new_p99:>10.3f}  {old_p50 / new_p50:>6.1f}x  {agree / len(queries):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
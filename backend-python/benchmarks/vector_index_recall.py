@@ -0,0 +1,71 @@
+"""Recall@k versus query latency for exact and IVF vector indexes
+
+Uses synthetic clustered 384-dim vectors (MiniLM's embedding size) so large
+knowledge base sizes can be measured without running the model.
+
+Usage: python -m benchmarks.vector_index_recall [--sizes 1000,100000,1000000] [--nprobe 4,8,16,32]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.vector_index import BruteForceIndex, IVFIndex, normalize_rows
+
+
+def make_vectors(count: int, dim: int, rng: np.random.Generator, clusters: int = 512) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, count)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 100000):
+        chunk = labels[start:start + 100000]
+        vectors[start:start + len(chunk)] = centers[chunk] + 0.8 * rng.standard_normal((len(chunk), dim), dtype=np.float32)
+    return normalize_rows(vectors)
+
+
+def measure(index, queries: np.ndarray, k: int):
+    results = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        results.append(set(ids.tolist()))
+    return results, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", default="4,8,16,32")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'entries':>9}  {'index':<12}  {'build_s':>7}  {'recall@k':>8}  {'p50_ms':>7}  {'p99_ms':>7}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        vectors = make_vectors(size, args.dim, rng)
+        queries = make_vectors(args.queries, args.dim, rng)
+
+        start = time.perf_counter()
+        exact = BruteForceIndex(vectors, assume_normalized=True)
+        build = time.perf_counter() - start
+        truth, latencies = measure(exact, queries, args.k)
+        print(f"{size:>9}  {'exact':<12}  {build:>7.2f}  {1.0:>8.3f}  "
+              f"{np.percentile(latencies, 50):>7.3f}  {np.percentile(latencies, 99):>7.3f}")
+
+        start = time.perf_counter()
+        ivf = IVFIndex(vectors, assume_normalized=True)
+        build = time.perf_counter() - start
+        for nprobe in [int(n) for n in args.nprobe.split(",")]:
+            ivf.nprobe = min(nprobe, ivf.nlist)
+            found, latencies = measure(ivf, queries, args.k)
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+            print(f"{size:>9}  {f'ivf/{ivf.nprobe}':<12}  {build:>7.2f}  {recall:>8.3f}  "
+                  f"{np.percentile(latencies, 50):>7.3f}  {np.percentile(latencies, 99):>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Memory per worker and in total: `uvicorn --workers N` vs preload-then-fork (python -m app.serve)
+
+Starts the service in each mode, waits until it answers and memory settles,
+sends a few /analyze requests, then reads every process in the server's tree
+from /proc. RSS counts shared pages once per process; PSS splits them between
+the processes sharing them, so total PSS is what the host actually pays.
+
+Uses the service's normal settings (e.g. SEMANTIC_MODEL_NAME) from the environment.
+
+Usage: python -m benchmarks.worker_memory [--workers 1,2,4] [--modes uvicorn,preload]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+MESSAGES = ["How do I track my order?", "when are you open", "I forgot my password", "do you ship abroad"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def read_kb(pid: int, path: str, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/{path}") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree(root: int) -> list:
+    """root and all its descendants"""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except OSError:
+                continue
+    tree, frontier = [root], [root]
+    while frontier:
+        children = [pid for pid, parent in parents.items() if parent in frontier]
+        tree += children
+        frontier = children
+    return tree
+
+
+def workers_of(root: int) -> list:
+    """Server processes doing the work: children of the supervisor, minus multiprocessing helpers
+
+    `uvicorn --workers 1` serves from the root process itself.
+    """
+    workers = []
+    for pid in process_tree(root)[1:]:
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except OSError:
+            continue
+        if b"resource_tracker" not in cmdline:
+            workers.append(pid)
+    return workers or [root]
+
+
+def tree_memory_mb(root: int):
+    pids = process_tree(root)
+    rss = sum(read_kb(pid, "status", "VmRSS") for pid in pids) / 1024
+    pss = sum(read_kb(pid, "smaps_rollup", "Pss") for pid in pids) / 1024
+    return rss, pss
+
+
+def post(port: int, message: str):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/analyze", data=json.dumps({"message": message}).encode(),
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        response.read()
+
+
+def wait_until_ready(process: subprocess.Popen, port: int, workers: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as response:
+                if response.status == 200 and len(workers_of(process.pid)) >= workers:
+                    break
+        except OSError:
+            pass
+        time.sleep(0.5)
+    else:
+        raise TimeoutError("server did not become ready")
+
+    # Workers start one by one; wait until memory stops growing
+    previous = 0.0
+    while time.monotonic() < deadline:
+        time.sleep(2)
+        rss, _ = tree_memory_mb(process.pid)
+        if abs(rss - previous) < 0.01 * rss:
+            return
+        previous = rss
+
+
+def measure(mode: str, workers: int, requests: int, timeout: float) -> dict:
+    port = free_port()
+    env = dict(os.environ, HOST="127.0.0.1", PORT=str(port), WEB_WORKERS=str(workers))
+    if mode == "uvicorn":
+        command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                   "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "app.serve"]
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(process, port, workers, timeout)
+        ready = time.perf_counter() - start
+        for i in range(requests):
+            post(port, MESSAGES[i % len(MESSAGES)])
+        time.sleep(1)
+
+        pids = workers_of(process.pid)
+        per_worker_rss = [read_kb(pid, "status", "VmRSS") / 1024 for pid in pids]
+        per_worker_pss = [read_kb(pid, "smaps_rollup", "Pss") / 1024 for pid in pids]
+        total_rss, total_pss = tree_memory_mb(process.pid)
+        return {
+            "ready_s": ready,
+            "worker_rss": sum(per_worker_rss) / len(pids),
+            "worker_pss": sum(per_worker_pss) / len(pids),
+            "total_rss": total_rss,
+            "total_pss": total_pss,
+        }
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--modes", default="uvicorn,preload")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    print(f"{'mode':>8}  {'workers':>7}  {'ready_s':>7}  {'RSS/worker':>10}  {'PSS/worker':>10}  "
+          f"{'total RSS':>9}  {'total PSS':>9}   (MB)")
+    for workers in [int(w) for w in args.workers.split(",")]:
+        for mode in args.modes.split(","):
+            result = measure(mode, workers, args.requests, args.timeout)
+            print(f"{mode:>8}  {workers:>7}  {result['ready_s']:>7.1f}  {result['worker_rss']:>10.1f}  "
+                  f"{result['worker_pss']:>10.1f}  {result['total_rss']:>9.1f}  {result['total_pss']:>9.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
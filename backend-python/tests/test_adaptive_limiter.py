@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from app.adaptive_limiter import AdaptiveConcurrencyLimiter
+
+
+def test_waiters_get_released_slots_in_order():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter("test", max_limit=2, min_limit=2)
+        await limiter.acquire()
+        await limiter.acquire()
+        order = []
+
+        async def wait(name):
+            await limiter.acquire()
+            order.append(name)
+
+        waiters = [asyncio.create_task(wait("first")), asyncio.create_task(wait("second"))]
+        await asyncio.sleep(0)
+        assert order == [] and limiter.stats()["waiting"] == 2
+        limiter.release()
+        await asyncio.sleep(0)
+        assert order == ["first"]
+        limiter.release()
+        await asyncio.gather(*waiters)
+        assert order == ["first", "second"] and limiter.in_flight == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter("test", max_limit=1, min_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        limiter.release()
+        assert limiter.in_flight == 0
+        await limiter.acquire()
+        assert limiter.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_limit_grows_additively_while_saturated():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter("test", max_limit=8, min_limit=1, initial_limit=2)
+        started = [await limiter.acquire() for _ in range(2)][0]
+        # Each success at full use adds 1 / limit: 2 -> 2.5 -> 2.9 -> 3.24
+        for _ in range(3):
+            limiter.on_success(started)
+        assert limiter.limit == 3 and limiter.increases == 3
+
+    asyncio.run(scenario())
+
+
+def test_limit_does_not_grow_when_not_saturated():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter("test", max_limit=8, min_limit=1, initial_limit=2)
+        started = await limiter.acquire()
+        limiter.on_success(started)
+        assert limiter.limit == 2 and limiter.increases == 0
+
+    asyncio.run(scenario())
+
+
+def test_failure_halves_the_limit_once_per_incident():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter("test", max_limit=8, min_limit=1)
+        starts = [await limiter.acquire() for _ in range(3)]
+        limiter.on_failure(starts[0])
+        # Calls started before the decrease do not decrease it again
+        limiter.on_failure(starts[1])
+        assert limiter.limit == 4 and limiter.decreases == 1
+        limiter.on_failure(await limiter.acquire())
+        assert limiter.limit == 2
+
+    asyncio.run(scenario())
+
+
+def test_limit_never_drops_below_min_limit():
+    limiter = AdaptiveConcurrencyLimiter("test", max_limit=4, min_limit=3)
+    for _ in range(3):
+        limiter.on_failure(time.monotonic())
+    assert limiter.limit == 3
+
+
+def test_latency_rise_lowers_the_limit():
+    limiter = AdaptiveConcurrencyLimiter("test", max_limit=10, min_limit=1)
+    for _ in range(5):
+        limiter.on_success(time.monotonic() - 0.01)
+    limiter.on_success(time.monotonic() - 1.0)
+    assert limiter.limit == 9 and limiter.decreases == 1
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+from app.cache import MemoryCacheBackend, ResponseCache, SQLiteCacheBackend
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    backends = []
+
+    def make(max_items=100, max_bytes=1024 * 1024):
+        if request.param == "memory":
+            backend = MemoryCacheBackend(max_items, max_bytes)
+        else:
+            backend = SQLiteCacheBackend(str(tmp_path / f"cache{len(backends)}.sqlite3"), max_items, max_bytes)
+        backends.append(backend)
+        return backend
+
+    yield make
+    for backend in backends:
+        backend.close()
+
+
+def test_get_returns_what_was_set(make_backend):
+    backend = make_backend()
+    backend.set("a", b"1", 60)
+    assert backend.get("a") == b"1"
+    assert backend.get("missing") is None
+
+
+def test_entries_expire_after_their_ttl(make_backend):
+    backend = make_backend()
+    backend.set("short", b"1", 0.05)
+    backend.set("long", b"2", 60)
+    time.sleep(0.1)
+    assert backend.get("short") is None
+    assert backend.get("long") == b"2"
+    assert backend.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_at_max_items(make_backend):
+    backend = make_backend(max_items=2)
+    backend.set("a", b"1", 60)
+    time.sleep(0.01)
+    backend.set("b", b"2", 60)
+    time.sleep(0.01)
+    assert backend.get("a") == b"1"
+    time.sleep(0.01)
+    backend.set("c", b"3", 60)
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1" and backend.get("c") == b"3"
+    stats = backend.stats()
+    assert stats["items"] == 2 and stats["evictions"] == 1
+
+
+def test_entries_are_evicted_to_stay_within_max_bytes(make_backend):
+    # Each entry is len(key) + len(value) = 9 bytes
+    backend = make_backend(max_bytes=20)
+    for key in "abc":
+        backend.set(key, b"12345678", 60)
+        time.sleep(0.01)
+    assert backend.get("a") is None
+    stats = backend.stats()
+    assert stats["items"] == 2 and stats["bytes"] == 18 and stats["evictions"] == 1
+
+
+def test_entry_larger_than_max_bytes_is_not_stored(make_backend):
+    backend = make_backend(max_bytes=8)
+    backend.set("a", b"123456789", 60)
+    assert backend.get("a") is None
+    assert backend.stats()["items"] == 0
+
+
+def test_response_cache_invalidates_by_tag(make_backend):
+    cache = ResponseCache(make_backend(), namespace="test")
+    cache.put("k1", {"reply": 1}, tags=["faq:1"])
+    cache.put("k2", {"reply": 2}, tags=["faq:1", "fallback"])
+    cache.put("k3", {"reply": 3}, tags=["faq:2"])
+    assert cache.invalidate(["faq:1"]) == 2
+    assert cache.get("k1") is None and cache.get("k2") is None
+    assert cache.get("k3") == {"reply": 3}
+    assert cache.invalidate(["faq:1"]) == 0
+
+
+def test_response_cache_counts_hits_and_misses(make_backend):
+    cache = ResponseCache(make_backend(), namespace="test")
+    cache.put("k", {"reply": 1})
+    cache.get("k")
+    cache.get("other")
+    assert cache.stats() == {"namespace": "test", "hits": 1, "misses": 1, "hit_ratio": 0.5, "invalidations": 0}
+
+
+def test_namespaces_share_a_backend_without_colliding(make_backend):
+    backend = make_backend()
+    first, second = ResponseCache(backend, "first"), ResponseCache(backend, "second")
+    first.put("k", {"reply": 1})
+    assert second.get("k") is None
+    assert first.get("k") == {"reply": 1}
+
+
+def test_async_access_reaches_the_backend(make_backend):
+    cache = ResponseCache(make_backend(), namespace="test")
+
+    async def put_then_get():
+        cache.put_soon("k", {"reply": 1})
+        for _ in range(100):
+            value = await cache.get_async("k")
+            if value is not None:
+                return value
+            await asyncio.sleep(0.01)
+
+    assert asyncio.run(put_then_get()) == {"reply": 1}
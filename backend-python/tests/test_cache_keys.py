@@ -0,0 +1,69 @@
+import random
+
+from app.cache_keys import RollingTurnHash, canonicalize, message_key
+from app.gemini_response import GeminiResponseGenerator
+from app.sessions import EMPTY_CONTEXT, WINDOW_MESSAGES, ConversationContext, Session
+
+HISTORY = [
+    {"role": "user", "content": "my order 99812 never arrived"},
+    {"role": "assistant", "content": "sorry, let me check order 99812"},
+    {"role": "user", "content": "it was a laptop"},
+    {"role": "assistant", "content": "thanks, noted"},
+]
+
+
+def test_canonical_form_ignores_case_punctuation_and_spacing():
+    assert canonicalize("  How do I track   my ORDER?! ") == "how do i track my order"
+    assert message_key("How do I track my order?") == message_key("how do i track my order")
+
+
+def test_rolling_hash_matches_hashing_the_kept_lines_from_scratch():
+    rng = random.Random(0)
+    texts = ["Customer: where is my order", "Assistant: thanks", "Customer: can I return a laptop", "Assistant: ok"]
+    rolling = RollingTurnHash(WINDOW_MESSAGES)
+    pushed = []
+    for _ in range(200):
+        pushed.append(rng.choice(texts))
+        rolling.push(pushed[-1])
+        fresh = RollingTurnHash(WINDOW_MESSAGES)
+        for text in pushed[-WINDOW_MESSAGES:]:
+            fresh.push(text)
+        assert fresh.value == rolling.value
+
+
+def test_session_hash_is_updated_incrementally_as_the_stateless_one_is_computed():
+    session = Session("c")
+    history = []
+    for turn in range(8):
+        message = ["where is my order", "hello", "can I return it", "do you ship abroad"][turn % 4]
+        session.add_turn(message, f"answer {turn}", "general")
+        history += [{"role": "user", "content": message}, {"role": "assistant", "content": f"answer {turn}"}]
+        # The stateless context has no summary of older messages, so it is keyed by the window alone
+        assert session.window_hash.key() == ConversationContext.from_history(history).key
+
+
+def test_prompt_shows_the_window_and_the_key_covers_it():
+    generator = GeminiResponseGenerator()
+    conversation = ConversationContext.from_history(HISTORY)
+    message = "where is my order"
+    prompt = generator._build_prompt(message, None, None, conversation)
+    assert "Customer: my order 99812 never arrived" in prompt and "Assistant: sorry, let me check order 99812" in prompt
+    assert generator._create_cache_key(message, "", conversation) != generator._create_cache_key(message, "", EMPTY_CONTEXT)
+
+    # A different order number, in any turn shown, is a different key
+    other = ConversationContext.from_history([{**HISTORY[0], "content": "my order 12345 never arrived"}] + HISTORY[1:])
+    assert other.key != conversation.key
+    other = ConversationContext.from_history(HISTORY[:1] + [{**HISTORY[1], "content": "sorry, let me check order 12345"}] + HISTORY[2:])
+    assert other.key != conversation.key
+
+
+def test_conversations_shown_the_same_share_a_key():
+    conversation = ConversationContext.from_history(HISTORY)
+    same = ConversationContext.from_history([{**message, "content": message["content"].upper() + "!"} for message in HISTORY])
+    assert same.key == conversation.key
+
+    # Only the last WINDOW_MESSAGES messages reach the prompt, so older ones do not change the key
+    history = [{"role": "user", "content": "hello"}] * 3 + HISTORY
+    longer = ConversationContext.from_history(history)
+    shown = ConversationContext.from_history(history[-WINDOW_MESSAGES:])
+    assert longer.text == shown.text and longer.key == shown.key
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def make_breaker(**kwargs):
+    options = dict(failure_rate=0.5, window=4, min_calls=4, open_seconds=0.05)
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        breaker.record_failure(breaker.acquire())
+
+
+def test_stays_closed_until_min_calls_are_seen():
+    breaker = make_breaker()
+    fail(breaker, 3)
+    assert breaker.state == CLOSED
+
+
+def test_stays_closed_below_the_failure_rate():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_success(breaker.acquire())
+    fail(breaker)
+    assert breaker.state == CLOSED
+
+
+def test_opens_at_the_failure_rate_and_fails_fast():
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.record_success(breaker.acquire())
+    fail(breaker, 2)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    stats = breaker.stats()
+    assert stats["opened"] == 1 and stats["rejected"] == 1
+
+
+def test_half_open_admits_one_probe_whose_success_closes_it():
+    breaker = make_breaker()
+    fail(breaker, 4)
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    probe = breaker.acquire()
+    assert probe is True
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.record_success(probe)
+    assert breaker.state == CLOSED
+    assert breaker.acquire() is False
+
+
+def test_failed_probe_opens_it_again():
+    breaker = make_breaker()
+    fail(breaker, 4)
+    time.sleep(0.06)
+    breaker.record_failure(breaker.acquire())
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+
+
+def test_released_probe_frees_its_slot():
+    breaker = make_breaker()
+    fail(breaker, 4)
+    time.sleep(0.06)
+    breaker.release(breaker.acquire())
+    assert breaker.state == HALF_OPEN
+    assert breaker.acquire() is True
@@ -0,0 +1,128 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+
+from app.circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError
+from app.gemini_client import GeminiAPIError, GeminiClient
+from benchmarks import gemini_stub
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(gemini_stub.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}/v1beta"
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture
+def stub(stub_url):
+    gemini_stub.settings.update(latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503)
+    gemini_stub.counters.update(calls=0, failures=0, max_in_flight=0)
+    return gemini_stub
+
+
+def call(stub_url, prompt="hello", **options):
+    async def run():
+        client = GeminiClient("test-key", "test-model", base_url=stub_url, backoff_base_seconds=0.001, **options)
+        try:
+            return await client.generate_content(prompt)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_returns_the_candidate_text(stub, stub_url):
+    assert call(stub_url) == stub.stub_reply("hello")
+    assert stub.counters["calls"] == 1
+
+
+def test_retries_retryable_statuses_then_gives_up(stub, stub_url):
+    stub.settings.update(error_rate=1.0, error_status=503)
+    with pytest.raises(GeminiAPIError) as error:
+        call(stub_url, max_retries=2)
+    assert error.value.status_code == 503
+    assert stub.counters["calls"] == 3
+
+
+def test_does_not_retry_client_errors(stub, stub_url):
+    stub.settings.update(error_rate=1.0, error_status=400)
+    with pytest.raises(GeminiAPIError) as error:
+        call(stub_url, max_retries=2)
+    assert error.value.status_code == 400
+    assert stub.counters["calls"] == 1
+
+
+def test_retries_timeouts(stub, stub_url):
+    stub.settings.update(latency_ms=300.0)
+    with pytest.raises(GeminiAPIError):
+        call(stub_url, max_retries=1, timeout_seconds=0.05)
+    assert stub.counters["calls"] == 2
+
+
+def test_open_circuit_stops_retries_and_fails_fast(stub, stub_url):
+    stub.settings.update(error_rate=1.0)
+    breaker = CircuitBreaker("test", failure_rate=0.5, window=2, min_calls=2, open_seconds=60)
+    with pytest.raises(GeminiAPIError):
+        call(stub_url, max_retries=5, breaker=breaker)
+    # The breaker opened after two failed attempts; the remaining retries were not made
+    assert breaker.state == OPEN
+    assert stub.counters["calls"] == 2
+    with pytest.raises(CircuitOpenError):
+        call(stub_url, breaker=breaker)
+    assert stub.counters["calls"] == 2
+
+
+def test_probe_closes_the_circuit_once_the_upstream_recovers(stub, stub_url):
+    stub.settings.update(error_rate=1.0)
+    breaker = CircuitBreaker("test", failure_rate=0.5, window=2, min_calls=2, open_seconds=0.05)
+    with pytest.raises(GeminiAPIError):
+        call(stub_url, max_retries=1, breaker=breaker)
+    assert breaker.state == OPEN
+    stub.settings.update(error_rate=0.0)
+    time.sleep(0.06)
+    assert call(stub_url, breaker=breaker) == stub.stub_reply("hello")
+    assert breaker.stats()["state"] == "closed"
+
+
+@pytest.mark.parametrize("intent_mode", ["combined", "separate"])
+def test_failed_gemini_calls_give_uncached_fallback_replies(stub, stub_url, monkeypatch, intent_mode):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setenv("GEMINI_API_BASE_URL", stub_url)
+    monkeypatch.setenv("GEMINI_MAX_RETRIES", "0")
+    monkeypatch.setenv("GEMINI_BREAKER_ENABLED", "false")
+    monkeypatch.setenv("GEMINI_INTENT_MODE", intent_mode)
+    from app.gemini_response import GeminiResponseGenerator
+    from app.main import _gemini_response
+
+    async def scenario():
+        generator = GeminiResponseGenerator()
+        await generator.load_models()
+        try:
+            stub.settings.update(error_rate=1.0)
+            during_outage = await generator.generate_response("where is my parcel")
+            stub.settings.update(error_rate=0.0)
+            recovered = await generator.generate_response("where is my parcel")
+        finally:
+            await generator.close()
+        return during_outage, recovered
+
+    during_outage, recovered = asyncio.run(scenario())
+    assert during_outage["method"] == "fallback" and during_outage["confidence"] == 0.5
+    assert recovered["method"] == "gemini"
+    # /analyze counts the template reply as a fallback, not as a Gemini answer
+    assert _gemini_response(during_outage).source == "fallback"
+    assert _gemini_response(recovered).source == "gemini"
+    assert recovered["response"] == stub.stub_reply("", json_mode=False)
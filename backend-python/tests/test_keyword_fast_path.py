@@ -0,0 +1,51 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from app.faq_matcher import FAQMatcher
+
+KNOWLEDGE_BASE = os.path.join(os.path.dirname(__file__), "..", "app", "knowledge_base.json")
+
+
+@pytest.fixture
+def matcher(monkeypatch):
+    monkeypatch.setenv("INDEX_CACHE_ENABLED", "false")
+    matcher = FAQMatcher(KNOWLEDGE_BASE)
+    asyncio.run(matcher.load_knowledge_base(load_semantic=False))
+    yield matcher
+    matcher.inference_executor.shutdown()
+
+
+def test_fast_path_is_off_by_default(matcher):
+    match = asyncio.run(matcher.find_best_match("track order status"))
+    assert match["match_type"] != "keyword"
+    assert matcher.match_stats()["stages"]["keyword"] == 0
+
+
+def test_fast_path_reports_the_tfidf_score_it_was_checked_against(matcher):
+    matcher.keyword_fast_path_enabled = True
+    message = "track order status"
+    match = asyncio.run(matcher.find_best_match(message))
+    assert match["match_type"] == "keyword"
+    index = matcher.index
+    expected = index.tfidf_index.scores(message)[index.store.find(match["question"])]
+    assert match["confidence"] == pytest.approx(expected) and expected >= matcher.keyword_min_tfidf
+
+
+def test_keyword_leads_tfidf_disagrees_with_go_to_full_scoring(matcher):
+    matcher.keyword_fast_path_enabled = True
+    matcher.keyword_min_tfidf = 1.1
+    match = asyncio.run(matcher.find_best_match("track order status"))
+    assert match is None or match["match_type"] != "keyword"
+    assert matcher.match_stats()["stages"]["keyword"] == 0
+
+
+def test_entry_scores_match_scoring_every_entry(matcher):
+    index = matcher.index.tfidf_index
+    messages = ["track my order", "reset password", "do you ship worldwide", "gift cards"]
+    full = index.scores_batch(messages)
+    for entry in range(len(matcher.index.store)):
+        scores = index.entry_scores(index.vectorize(messages), [entry] * len(messages))
+        assert np.allclose(scores, [message_scores[entry] for message_scores in full])
@@ -0,0 +1,99 @@
+import json
+import time
+
+from app.cache import MemoryCacheBackend
+from app.sessions import SUMMARY_TOPICS, ConversationContext, Session, SessionStore
+
+
+def make_store(**kwargs):
+    backend = MemoryCacheBackend(max_items=kwargs.pop("max_items", 100), max_bytes=kwargs.pop("max_bytes", 1024 * 1024))
+    return SessionStore(backend, **kwargs)
+
+
+def test_window_keeps_only_the_last_messages():
+    session = Session("c", window_messages=4)
+    for turn in range(3):
+        session.add_turn(f"question {turn}", f"answer {turn}")
+    assert session.messages == 6
+    assert session.window == [["user", "question 1"], ["assistant", "answer 1"],
+                              ["user", "question 2"], ["assistant", "answer 2"]]
+
+
+def test_summary_covers_messages_that_left_the_window():
+    session = Session("c", window_messages=2)
+    session.add_turn("my order is late", "sorry to hear that", "order_tracking")
+    assert session.summary() == ""
+    session.add_turn("can I get a refund", "yes, within 30 days", "returns")
+    assert session.summary() == 'the customer first asked "my order is late", topics so far: order_tracking, returns.'
+    for turn in range(SUMMARY_TOPICS + 1):
+        session.add_turn(f"question {turn}", "answer")
+    summary = session.summary()
+    assert summary.startswith('the customer first asked "my order is late", then about ')
+    # Only the last SUMMARY_TOPICS later questions are kept
+    assert '"can I get a refund"' not in summary and '"question 0"' in summary
+
+
+def test_context_matches_the_history_it_was_seeded_with():
+    history = [{"role": "user", "content": "hello"}, {"role": "assistant", "content": "hi, how can I help"},
+               {"role": "user", "content": "my parcel is lost"}]
+    context = make_store().load("c", history).context()
+    stateless = ConversationContext.from_history(history)
+    assert context.text == stateless.text and "Assistant: hi, how can I help" in context.text
+    assert context.key == stateless.key
+
+
+def test_prompt_context_shows_the_summary_above_the_window_and_is_rendered_once_per_turn():
+    session = Session("c", window_messages=2)
+    session.add_turn("my order 99812 never arrived", "sorry to hear that", "order_tracking")
+    session.add_turn("can I get a refund", "yes, within 30 days", "returns")
+    context = session.context()
+    assert context.text.startswith(f"\nEarlier in the conversation: {session.summary()}")
+    assert "Customer: can I get a refund\nAssistant: yes, within 30 days" in context.text
+    assert session.context() is context
+    without_summary = ConversationContext.from_history([{"role": "user", "content": "can I get a refund"},
+                                                        {"role": "assistant", "content": "yes, within 30 days"}])
+    assert context.key != without_summary.key
+
+    session.add_turn("how long does it take", "5 days", "returns")
+    assert session.context() is not context
+    assert '"can I get a refund"' in session.context().text and session.context().key != context.key
+
+
+def test_store_round_trips_sessions():
+    store = make_store()
+    session = store.load("c")
+    store.add_turn(session, "my order is late", "sorry to hear that", "order_tracking")
+    loaded = store.load("c")
+    assert loaded.window == session.window and loaded.intents == ["order_tracking"]
+    assert loaded.context().key == session.context().key
+    assert loaded.context().text == session.context().text
+    assert store.stats()["created"] == 1 and store.stats()["loaded"] == 1
+
+
+def test_sessions_expire_after_their_ttl():
+    store = make_store(ttl_seconds=0.05)
+    store.add_turn(store.load("c"), "hello", "hi")
+    assert store.get("c") is not None
+    time.sleep(0.1)
+    assert store.get("c") is None
+    assert store.load("c").messages == 0
+
+
+def test_byte_bound_evicts_least_recently_used_sessions():
+    session = Session("probe")
+    session.add_turn("x" * 50, "y" * 50)
+    size = len(json.dumps(session.to_json(), separators=(",", ":"))) + len("session:a")
+    store = make_store(max_bytes=int(size * 2.5))
+    for conversation_id in "abc":
+        store.add_turn(store.load(conversation_id), "x" * 50, "y" * 50)
+    assert store.get("a") is None
+    assert store.get("b") is not None and store.get("c") is not None
+    assert store.backend.stats()["evictions"] == 1
+
+
+def test_delete_ends_a_session():
+    store = make_store()
+    store.add_turn(store.load("c"), "hello", "hi")
+    assert store.delete("c") is True
+    assert store.get("c") is None
+    assert store.delete("c") is False